@@ -18,10 +18,6 @@ along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
 import zipfile
-from email.mime.application import MIMEApplication
-from email.encoders import encode_7or8bit
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
 from cStringIO import StringIO
 
 
@@ -30,6 +26,8 @@ class HTTPRequest(object):
     Builds an HTTP GET or POST request that ORACC's server understands to send
     and retrieve ATF data.
     '''
+    boundary = '==========boundary========'
+
     def __init__(self, url, method, **kwargs):
         self.method = method
         self.url = url
@@ -45,23 +43,44 @@ class HTTPRequest(object):
         """
         Send attachment to server containing ATF file and necessary data to
         run given command (validate, lemmatise, etc).
+        The multipart/related MTOM body is written directly, with the SOAP
+        envelope as root part and the zipped ATF as binary attachment, so its
+        length is known before the headers are created.
         """
-        self.mtompkg = MIMEMultipart('related')
-        self.set_multipart_params()
         self.set_soap_envelope(command=command,
                                keys=keys,
                                atf_basename=atf_basename,
                                atf_text=atf_text)
-        self.rootpkg = MIMEApplication(self.envelope,
-                                       'xop+xml',
-                                       encode_7or8bit)
-        self.set_multipart_payload()
-        self.document = MIMEBase('*', '*')
-        self.set_document_payload(atf_basename, atf_text)
-
-        # The headers can't be created until the body is finished since they
-        # need it to populate the Content-Length header
-        self.set_multipart_headers()
+        delimiter = '--' + self.boundary
+        # The server needs \r\n line endings everywhere but inside the zip
+        self.chunks = [delimiter,
+                       '\r\nMIME-Version: 1.0'
+                       '\r\nContent-ID: <SOAP-ENV:Envelope>'
+                       '\r\nContent-Transfer-Encoding: binary'
+                       '\r\nContent-Type: application/xop+xml; '
+                       'charset="utf-8"; type="application/soap+xml"'
+                       '\r\n\r\n',
+                       self.crlf(self.envelope),
+                       '\r\n', delimiter,
+                       '\r\nContent-Type: */*'
+                       '\r\nMIME-Version: 1.0'
+                       '\r\nContent-ID: <request_zip>'
+                       '\r\nContent-Transfer-Encoding: binary'
+                       '\r\n\r\n',
+                       self.zip_atf(atf_basename, atf_text),
+                       '\r\n', delimiter, '--\r\n']
+        self.body = None
+        self.headers = {'Content-Type': 'multipart/related; '
+                                        'charset="utf-8"; '
+                                        'type="application/xop+xml"; '
+                                        'start="<SOAP-ENV:Envelope>"; '
+                                        'start-info="application/soap+xml"; '
+                                        'boundary="{}"'.format(self.boundary),
+                        'MIME-Version': '1.0',
+                        'Host': self.url,
+                        'Content-Length': str(sum(len(chunk) for chunk
+                                                  in self.chunks)),
+                        'Connection': 'close'}
 
     def create_response_message(self, keys):
         """
@@ -69,70 +88,29 @@ class HTTPRequest(object):
         validated/lemmatised/etc ATF file.
         """
         self.set_soap_envelope(keys=keys)
-        self.mtompkg = MIMEApplication(self.envelope,
-                                       'soap+xml',
-                                       encode_7or8bit)
-        self.mtompkg.add_header("Host", self.url)
-
-    def set_response_headers(self):
-        del(self.mtompkg['Content-Transfer-Encoding'])
-        headers = ['Host', 'Content-Length', 'Connection']
-        values = [self.url, '623', 'close']
-        for header, value in zip(headers, values):
-            self.mtompkg.add_header(header, value)
-
-    def set_response_params(self):
-        self.mtompkg.set_param('charset', 'utf-8')
-
-    def set_multipart_payload(self):
-        self.set_payload_headers()
-        self.set_payload_params()
-        self.mtompkg.attach(self.rootpkg)
-
-    def set_document_payload(self, atf_basename, atf_text):
-        self.set_document_headers()
+        self.chunks = [self.crlf(self.envelope)]
+        self.body = None
+        self.headers = {'Content-Type': 'application/soap+xml',
+                        'MIME-Version': '1.0',
+                        'Content-Transfer-Encoding': '7bit',
+                        'Host': self.url}
+
+    @staticmethod
+    def crlf(text):
+        """
+        Make all line endings \r\n, without turning \r\n into \r\r\n.
+        """
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        return text.replace('\r\n', '\n').replace('\n', '\r\n')
 
+    @staticmethod
+    def zip_atf(atf_basename, atf_text):
         mem_data = StringIO()
         mem_zip = zipfile.ZipFile(mem_data, "w", zipfile.ZIP_DEFLATED, False)
         mem_zip.writestr("00atf/"+atf_basename, atf_text)
         mem_zip.close()
-        mem_data.seek(0)
-
-        self.document.set_payload(mem_data.getvalue())
-        self.mtompkg.attach(self.document)
-
-    def set_document_headers(self):
-        headers = ['Content-ID', 'Content-Transfer-Encoding']
-        values = ['<request_zip>', 'binary']
-        for header, value in zip(headers, values):
-            self.document.add_header(header, value)
-
-    def set_payload_params(self):
-        params = ['charset', 'type']
-        values = ['utf-8', 'application/soap+xml']
-        for param, value in zip(params, values):
-            self.rootpkg.set_param(param, value)
-
-    def set_payload_headers(self):
-        # Content-Transfer-Encoding is set to 7bit by default
-        del(self.rootpkg['Content-Transfer-Encoding'])
-        headers = ['Content-ID', 'Content-Transfer-Encoding']
-        values = ['<SOAP-ENV:Envelope>', 'binary']
-        for header, value in zip(headers, values):
-            self.rootpkg.add_header(header, value)
-
-    def set_multipart_headers(self):
-        headers = ['Host', 'Content-Length', 'Connection']
-        values = [self.url, str(len(self.get_body())), 'close']
-        for header, value in zip(headers, values):
-            self.mtompkg.add_header(header, value)
-
-    def set_multipart_params(self):
-        params = ['charset', 'type', 'start', 'start-info', 'boundary']
-        values = ['utf-8', 'application/xop+xml', '<SOAP-ENV:Envelope>',
-                  'application/soap+xml', '==========boundary========']
-        for param, value in zip(params, values):
-            self.mtompkg.set_param(param, value)
+        return mem_data.getvalue()
 
     def set_soap_envelope(self, **kwargs):
         """
@@ -190,44 +168,15 @@ class HTTPRequest(object):
         """
         Return dict with message headers - ready to use by requests module.
         """
-        return dict(self.mtompkg.items())
+        return dict(self.headers)
 
     def get_body(self):
         """
         Returns the body of the HTTP POST request containing the soap envelope
         including the encoded compressed ATF.
         """
-        # Header and body on a HTTP SOAP/MTOM message is separated by \n\n
-        body = self.mtompkg.as_string().split('\n\n', 1)[1]
-
-        # This returns the randomly created boundary string, which separates
-        # the different elements in the request (document, envelope and
-        # payload)
-        bound = self.mtompkg.get_boundary()
-
-        # There's two different kinds of SOAP HTTP POST requests handled, due
-        # to the communication with the server being asynchronous:
-        # * One that contains an ATF attachment submitted for validation/lemm
-        # * One that contains only a request ID to ask for the validated/lemm'd
-        #   ATF.
-        # The boundary will be empty in the second case.
-        if bound is not None:
-            # Encoded zip files start with "\n\nPK" and end with a new line
-            # follwed by the ending boundary (in the form "--random_boundary--"
-            attachment = body.split("\n\nPK")[1].split("\n--" + str(bound))[0]
-            # Some line endings are \n and some are \r\n. The email module
-            # automatically replaces some of them causing the server not to
-            # understand line endings correctly. For this, we need to first
-            # make sure all of the line endings are \n, then convert them all
-            # to \r\n (to avoid having '\r\n' converted to '\r\r\n'.
-            # Note the encoding of the zipped ATF might coincidentally contain
-            # a '\n' substring. We have to avoid replacing those, otherwise
-            # the zipped ATF will be corrupt and imposible to open by the
-            # server.
-            body = body.replace(attachment, '<attachment>')
-            body = body.replace('\r\n', '\n').replace('\n', '\r\n')
-            body = body.replace("<attachment>", attachment)
-        else:
-            body = body.replace('\r\n', '\n').replace('\n', '\r\n')
-
-        return body
+        # Joined only once, the first time it's needed
+        if self.body is None:
+            self.body = ''.join(self.chunks)
+            self.chunks = None
+        return self.body
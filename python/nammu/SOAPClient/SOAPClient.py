@@ -18,7 +18,6 @@ along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
 
-import StringIO
 import re
 import os
 import logging
@@ -26,7 +25,8 @@ import logging.config
 import requests
 import urllib
 from java.lang import System, ClassLoader
-from zipfile import ZipFile
+from zipfile import ZipFile, BadZipfile
+from cStringIO import StringIO
 from logging import Formatter
 from requests.exceptions import RequestException, ConnectTimeout
 from HTTPRequest import HTTPRequest
@@ -37,11 +37,18 @@ class SOAPClient(object):
     """
     Sends and retrieves information to and from the ORACC SOAP server.
     """
-    def __init__(self, url, port, url_dir, method):
+    boundary_re = re.compile(r'boundary="?([^";]+)"?')
+    # Files returned by the server bigger than this are truncated in the logs
+    max_logged_size = 10000
+
+    def __init__(self, url, port, url_dir, method, status_port=None):
         self.url = url
         self.port = port
         self.url_dir = url_dir
         self.method = method
+        # ORACC servers answer status polls on the default HTTP port, but
+        # local stand-in servers use the same port for everything.
+        self.status_port = status_port
         # TODO: Create logger in this module that reuses nammu controller's
         # logger configuration so output is in same file, but tells us it was
         # produced in this module.
@@ -61,7 +68,9 @@ class SOAPClient(object):
         body = self.request.get_body()
         self.logger.debug("Sending request to server at %s.", url)
         self.logger.debug("HTTP request headers sent: %s", headers)
-        self.logger.debug("HTTP request body sent: %s", body)
+        # The body can hold a large binary zip, so only log its envelope
+        self.logger.debug("HTTP request body sent (%d bytes) with envelope: "
+                          "%s", len(body), self.request.get_soap_envelope())
         try:
             self.response = requests.post(url, data=body, headers=headers,
                                           timeout=5)
@@ -70,6 +79,27 @@ class SOAPClient(object):
                               'request.')
             raise
 
+    def run_command(self, command, project, atf_basename, atf_text):
+        """
+        Send a validation ("atf") or lemmatisation ("lem") request for the
+        given ATF text, wait for the server to process it and fetch the
+        results. Returns the same as get_server_logs.
+        Requests exceptions are raised if the server can't be reached.
+        """
+        # Remove spaces from filename which make the server confused
+        atf_basename = atf_basename.replace(' ', '')
+        self.create_request(command=command,
+                            keys=[project, '00atf/' + atf_basename],
+                            atf_basename=atf_basename,
+                            atf_text=atf_text)
+        self.send()
+        server_id = self.get_response_id()
+        self.logger.debug("Request sent OK with ID %s", server_id)
+        self.wait_for_response(server_id)
+        self.create_request(keys=[server_id])
+        self.send()
+        return self.get_server_logs()
+
     def get_response_text(self):
         return self.response.text
 
@@ -91,7 +121,11 @@ class SOAPClient(object):
                     it)
         *  "err_stat\n" (something bad happened and we have to mail Steve)
         """
-        url = "{}/{}/{}".format(self.url, self.url_dir, request_id)
+        if self.status_port:
+            url = "{}:{}/{}/{}".format(self.url, self.status_port,
+                                       self.url_dir, request_id)
+        else:
+            url = "{}/{}/{}".format(self.url, self.url_dir, request_id)
         # Try 10 times to get response from server
         attempt = 0
         while attempt < 10:
@@ -121,36 +155,69 @@ class SOAPClient(object):
         """
         Manipulate response to substract the content of oracc.log that is in
         the returned binary-coded zip file.
+        Raises IndexError if the response doesn't contain the zip file.
         """
-        self.response.content
-        binary_body = re.split('--==.*==',
-                               self.response.content)[2].split('\r\n')[5]
-
-        f = StringIO.StringIO()
-        f.write(bytearray(binary_body))
-
-        memory_zip = ZipFile(f)
-        namelist = memory_zip.namelist()
-        zip_content = {name: memory_zip.read(name) for name in namelist}
-        oracc_log = zip_content['oracc.log']
-        request_log = zip_content['request.log']
-
-        # Check if server returns a lemmatised file
-        autolem = None
-        for key, value in zip_content.iteritems():
-            if key.endswith("autolem.atf"):
-                autolem = value
-
+        try:
+            memory_zip = ZipFile(StringIO(self.get_attachment()))
+            namelist = memory_zip.namelist()
+        except BadZipfile:
+            raise IndexError("The server response has no valid zip file.")
         self.logger.debug("The returned file from server contains: %s",
-                          zip_content.keys())
+                          namelist)
 
-        for file in zip_content.keys():
-            self.logger.debug("These are the contents of %s: \n%s",
-                              file,
-                              zip_content[file])
+        # Only read the files Nammu uses. The server might return a
+        # lemmatised file as well.
+        autolem = None
+        for name in namelist:
+            if name.endswith("autolem.atf"):
+                autolem = self.read_member(memory_zip, name)
+        try:
+            oracc_log = self.read_member(memory_zip, 'oracc.log')
+            request_log = self.read_member(memory_zip, 'request.log')
+        except KeyError as e:
+            raise IndexError(str(e))
 
         return oracc_log, request_log, autolem
 
+    def get_attachment(self):
+        """
+        Returns the zip file attached to the multipart/related response,
+        which is the part that follows the SOAP envelope. The boundary between
+        parts is taken from the Content-Type header, or else from the first
+        line of the body.
+        """
+        content = self.response.content
+        match = self.boundary_re.search(
+                            self.response.headers.get('Content-Type', ''))
+        if match:
+            delimiter = '--' + match.group(1)
+        else:
+            delimiter = content[:content.find('\r\n')]
+            if not delimiter.startswith('--'):
+                raise IndexError("The server response is not multipart.")
+        envelope_start = content.find(delimiter)
+        attachment_start = content.find('\r\n' + delimiter,
+                                        envelope_start + len(delimiter))
+        if envelope_start < 0 or attachment_start < 0:
+            raise IndexError("The server response has no attachment.")
+        # Part headers and body are separated by an empty line
+        body_start = content.find('\r\n\r\n', attachment_start + 2)
+        body_end = content.find('\r\n' + delimiter, body_start)
+        if body_start < 0 or body_end < 0:
+            raise IndexError("The server response attachment is incomplete.")
+        return content[body_start + 4:body_end]
+
+    def read_member(self, memory_zip, name):
+        content = memory_zip.read(name)
+        if len(content) > self.max_logged_size:
+            self.logger.debug("These are the first %d bytes of %s (%d bytes):"
+                              " \n%s", self.max_logged_size, name,
+                              len(content), content[:self.max_logged_size])
+        else:
+            self.logger.debug("These are the contents of %s: \n%s", name,
+                              content)
+        return content
+
     def setup_logger(self):
         """
         Creates logger for Nammu's functionality as well as to debug HTTP
@@ -0,0 +1,277 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import collections
+import logging
+import Queue
+import threading
+import time
+
+import requests
+from requests.exceptions import RequestException
+
+
+class ServerStats(object):
+    '''
+    Health and latency measurements of one ORACC server.
+    '''
+    def __init__(self, samples):
+        # Seconds taken to answer the last probes
+        self.latencies = collections.deque(maxlen=samples)
+        # Seconds taken by the last commands, from submission to results
+        self.durations = collections.deque(maxlen=samples)
+        # None until the server is first probed or used
+        self.healthy = None
+        self.failures = 0
+        self.last_error = None
+
+    @staticmethod
+    def percentile(values, percent):
+        if not values:
+            return None
+        values = sorted(values)
+        index = int(round((len(values) - 1) * percent / 100.0))
+        return values[index]
+
+    def get_latency(self):
+        return self.percentile(self.latencies, 50)
+
+
+class ServerPool(object):
+    '''
+    The ORACC servers listed in the settings, measured regularly in the
+    background so each command goes to the fastest healthy one.
+    If the command fails on one server it's sent to the next one, and if
+    `hedge` is on, slow commands are also sent to the next server once they
+    take longer than the `hedge_percentile` of that server's earlier
+    commands. The first results to arrive are used.
+    '''
+    def __init__(self, servers, default=None, probe_interval=300, hedge=True,
+                 hedge_percentile=90, hedge_delay=15, samples=20):
+        self.servers = servers
+        self.default = default
+        self.probe_interval = probe_interval
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        # Seconds to wait before hedging until there are enough samples
+        self.hedge_delay = hedge_delay
+        self.stats = dict((name, ServerStats(samples)) for name in servers)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        # Called with the server name when a server becomes reachable
+        self.listeners = []
+        self.logger = logging.getLogger("NammuController")
+
+    @classmethod
+    def from_config(cls, config):
+        '''
+        Returns a pool of the servers in the settings. If the pool is disabled
+        in the "server_pool" settings, it only has the default server.
+        '''
+        servers = dict((name, settings) for name, settings
+                       in config['servers'].items() if name != 'default')
+        default = config['servers'].get('default')
+        settings = config.get('server_pool') or {}
+        if not settings.get('enabled', True):
+            return cls({default: servers[default]}, default, hedge=False)
+        return cls(servers, default,
+                   probe_interval=settings.get('probe_interval', 300),
+                   hedge=settings.get('hedge', True),
+                   hedge_percentile=settings.get('hedge_percentile', 90),
+                   hedge_delay=settings.get('hedge_delay', 15))
+
+    def start(self):
+        '''
+        Probe the servers regularly in a background thread. Nothing is
+        probed if there's only one server to choose from.
+        '''
+        if len(self.servers) > 1 and self.thread is None:
+            self.thread = threading.Thread(target=self.probe_loop,
+                                           name="ServerPool")
+            self.thread.setDaemon(True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def probe_loop(self):
+        while not self.stopped.is_set():
+            self.probe_all()
+            self.stopped.wait(self.probe_interval)
+
+    def probe_all(self):
+        for name in self.servers:
+            self.probe(name)
+
+    def probe(self, name, timeout=5):
+        '''
+        Time how long the server takes to answer an HTTP request. Any answer
+        means it's up, even an HTTP error, since the SOAP port only
+        understands POST requests.
+        '''
+        settings = self.servers[name]
+        url = "{}:{}".format(settings['url'], settings['port'])
+        start_time = time.time()
+        try:
+            requests.get(url, timeout=timeout)
+        except RequestException as e:
+            self.record_failure(name, e)
+            return None
+        latency = time.time() - start_time
+        with self.lock:
+            stats = self.stats[name]
+            stats.latencies.append(latency)
+            was_healthy = stats.healthy
+            stats.healthy = True
+        if not was_healthy:
+            for listener in self.listeners:
+                listener(name)
+        return latency
+
+    def record_failure(self, name, error):
+        with self.lock:
+            stats = self.stats[name]
+            stats.healthy = False
+            stats.failures += 1
+            stats.last_error = str(error)
+
+    def record_success(self, name, duration):
+        with self.lock:
+            stats = self.stats[name]
+            stats.durations.append(duration)
+            stats.healthy = True
+
+    def get_ranked(self):
+        '''
+        Returns the server names, healthy servers first from the fastest,
+        then the ones not measured yet and the unhealthy ones last. The
+        default server goes first among equals.
+        '''
+        def rank(name):
+            stats = self.stats[name]
+            latency = stats.get_latency()
+            if stats.healthy is False:
+                group = 2
+            elif latency is None:
+                group = 1
+            else:
+                group = 0
+            return (group, latency, name != self.default, name)
+        with self.lock:
+            return sorted(self.servers, key=rank)
+
+    def get_hedge_delay(self, name):
+        with self.lock:
+            durations = list(self.stats[name].durations)
+        if len(durations) < 5:
+            return self.hedge_delay
+        return ServerStats.percentile(durations, self.hedge_percentile)
+
+    def run(self, attempt):
+        '''
+        Call `attempt(name, settings)` with the best server and return the
+        server name and what `attempt` returned. The next server is tried if
+        `attempt` raises an exception, or in parallel if hedging and it's
+        slow. The last exception is raised if all servers fail.
+        '''
+        candidates = self.get_ranked()
+        if not candidates:
+            raise Exception("There are no ORACC servers in the settings.")
+        results = Queue.Queue()
+
+        def call(name):
+            start_time = time.time()
+            try:
+                result = attempt(name, self.servers[name])
+            except Exception as e:
+                self.record_failure(name, e)
+                results.put((name, None, e))
+            else:
+                self.record_success(name, time.time() - start_time)
+                results.put((name, result, None))
+
+        def start(name):
+            self.logger.debug("Sending request to ORACC server %s.", name)
+            thread = threading.Thread(target=call, args=(name,))
+            thread.setDaemon(True)
+            thread.start()
+
+        current = candidates.pop(0)
+        start(current)
+        pending = 1
+        hedged = False
+        error = None
+        while pending:
+            timeout = None
+            if self.hedge and not hedged and candidates:
+                timeout = self.get_hedge_delay(current)
+            try:
+                name, result, error = results.get(True, timeout)
+            except Queue.Empty:
+                self.logger.debug("Server is slow, hedging request with %s.",
+                                  candidates[0])
+                hedged = True
+                current = candidates.pop(0)
+                start(current)
+                pending += 1
+                continue
+            pending -= 1
+            if error is None:
+                return name, result
+            # Only logged at debug level: this can run in background threads,
+            # and the caller reports the outcome once
+            self.logger.debug("ORACC server %s failed: %s", name, error)
+            if candidates:
+                self.logger.debug("Trying ORACC server %s instead.",
+                                  candidates[0])
+                current = candidates.pop(0)
+                start(current)
+                pending += 1
+        raise error
+
+    def get_summary(self):
+        '''
+        Returns a line of text per server with its health and latencies.
+        '''
+        lines = []
+        for name in self.get_ranked():
+            with self.lock:
+                stats = self.stats[name]
+                latencies = list(stats.latencies)
+                durations = list(stats.durations)
+                healthy, failures = stats.healthy, stats.failures
+                last_error = stats.last_error
+            state = {True: 'up', False: 'down', None: 'not checked'}[healthy]
+            line = "{}{} ({}): {}".format(
+                        name, ' [default]' if name == self.default else '',
+                        self.servers[name]['url'], state)
+            if latencies:
+                line += ", latency {:.0f} ms (p90 {:.0f} ms)".format(
+                        ServerStats.percentile(latencies, 50) * 1000,
+                        ServerStats.percentile(latencies, 90) * 1000)
+            if durations:
+                line += ", {} commands, median {:.1f} s".format(
+                        len(durations),
+                        ServerStats.percentile(durations, 50))
+            if failures:
+                line += ", {} failures (last: {})".format(failures,
+                                                          last_error)
+            lines.append(line)
+        return lines
@@ -0,0 +1,238 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import argparse
+import codecs
+import json
+import logging
+import os
+import sys
+import time
+
+from pyoracc.atf.atffile import AtfFile
+from pyoracc.atf.atflex import AtfLexer
+from pyoracc.model.composite import Composite
+
+from .SOAPClient.SOAPClient import SOAPClient
+from .utils import get_yaml_config
+from .utils.CorpusIndex import CorpusIndex
+from .utils.ValidationCache import ValidationCache
+from .utils.ValidationReport import ValidationReport
+
+'''
+Headless command line interface, so Nammu can be run on servers and CI
+runners, e.g.:
+
+    java -jar nammu.jar validate file1.atf file2.atf
+
+No Swing components are created. Each file produces one JSON object written
+to stdout as soon as it's processed, and logging goes to stderr.
+'''
+
+commands = ('validate', 'lemmatise', 'parse', 'stats')
+
+
+def main(argv):
+    '''
+    Run the command given in `argv` (without the program name) on each of the
+    files given. Returns 0 if all files were processed without errors, 1
+    otherwise.
+    '''
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(stream=sys.stderr,
+                        format='%(levelname)s: %(message)s',
+                        level=logging.DEBUG if args.verbose
+                        else logging.WARNING)
+    if args.command in ('validate', 'lemmatise'):
+        runner = ServerCommand(args.command, args.server, args.project,
+                               not args.no_cache)
+    elif args.command == 'parse':
+        runner = parse_file
+    else:
+        runner = FileStats()
+    status = 0
+    for filename in args.files:
+        start_time = time.time()
+        try:
+            text = codecs.open(filename, encoding='utf-8').read()
+        except (IOError, UnicodeDecodeError) as e:
+            result = {'ok': False, 'error': str(e)}
+        else:
+            result = runner(filename, text)
+        result['file'] = filename
+        result['command'] = args.command
+        result['seconds'] = round(time.time() - start_time, 3)
+        if not result['ok']:
+            status = 1
+        write_result(result)
+    return status
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+                        prog='nammu',
+                        description='Validate, lemmatise, parse or get '
+                                    'statistics of ATF files without opening '
+                                    "Nammu's window. Results are printed as "
+                                    'one JSON object per line.')
+    parser.add_argument('command', choices=commands)
+    parser.add_argument('files', nargs='+', metavar='FILE')
+    parser.add_argument('--server',
+                        help='ORACC server to send files to, as named in the '
+                             'settings (default: the one chosen in Nammu)')
+    parser.add_argument('--project',
+                        help='project to validate against, if not given in '
+                             'the file')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always send files to the server, even if they '
+                             'are unchanged since last time')
+    parser.add_argument('--verbose', action='store_true',
+                        help='log debug messages to stderr')
+    return parser
+
+
+def write_result(result):
+    sys.stdout.write(json.dumps(result, sort_keys=True) + '\n')
+    sys.stdout.flush()
+
+
+def get_project(text):
+    '''
+    Get the project from the "#project:" line, without parsing the whole text.
+    '''
+    try:
+        return text.split("#project:")[1].split()[0]
+    except IndexError:
+        return None
+
+
+def parse_oracc_log(oracc_log):
+    '''
+    Split the validation log returned by the server into a list of errors,
+    one per line with a line number, and the summary line.
+    '''
+    report = ValidationReport.parse(oracc_log)
+    return [error.to_dict() for error in report], report.summary
+
+
+def parse_file(filename, text):
+    '''
+    Parse the text with pyoracc and describe the texts found in it.
+    '''
+    try:
+        parsed = AtfFile(text)
+    except SyntaxError as e:
+        return {'ok': False,
+                'error': {'line': e.lineno,
+                          'offset': e.offset,
+                          'text': e.text.strip('\n') if e.text else None}}
+    if isinstance(parsed.text, Composite):
+        texts = list(parsed.text.texts)
+    else:
+        texts = [parsed.text]
+    return {'ok': True,
+            'texts': [{'code': atf_text.code,
+                       'description': atf_text.description,
+                       'project': getattr(atf_text, 'project', None),
+                       'language': getattr(atf_text, 'language', None),
+                       'objects': len(atf_text.children)}
+                      for atf_text in texts]}
+
+
+class FileStats(object):
+    '''
+    Counts the text codes, line labels, words, signs and lemmas in a file,
+    using the same lexer pass as the corpus index. Each kind gets the number
+    of distinct keys and the number of lines they appear in.
+    '''
+    def __init__(self):
+        self.lexer = AtfLexer(skipinvalid=True).lexer
+
+    def __call__(self, filename, text):
+        entries = CorpusIndex.tokenize(self.lexer, text)
+        stats = dict((kind, {'distinct': len(entries.get(kind, {})),
+                             'lines': sum(len(lines) for lines
+                                          in entries.get(kind, {}).values())})
+                     for kind in CorpusIndex.kinds)
+        return {'ok': True,
+                'lines': text.count('\n') + 1 if text else 0,
+                'stats': stats}
+
+
+class ServerCommand(object):
+    '''
+    Sends files to the ORACC server for validation or lemmatisation, using
+    the server settings of the GUI unless another server is given. Results
+    of unchanged files are shared with the GUI through the validation cache.
+    '''
+    def __init__(self, command, server=None, project=None, use_cache=True):
+        self.command = 'atf' if command == 'validate' else 'lem'
+        self.project = project
+        config = get_yaml_config('settings.yaml')
+        servers = config['servers']
+        self.server = server or servers['default']
+        if self.server not in servers:
+            raise SystemExit("Unknown server {}. Choose from {}.".format(
+                             self.server,
+                             ', '.join(name for name in servers
+                                       if name != 'default')))
+        self.settings = servers[self.server]
+        self.cache = ValidationCache.from_config(config) if use_cache else None
+
+    def __call__(self, filename, text):
+        project = self.project or get_project(text)
+        if not project:
+            return {'ok': False,
+                    'error': 'No project found in file. Add project and '
+                             'retry, or use --project.'}
+        atf_basename = os.path.basename(filename).replace(' ', '')
+        atf_text = text.encode('utf-8')
+        results = None
+        if self.cache:
+            cache_key = ValidationCache.get_key(atf_text, atf_basename,
+                                                project, self.command,
+                                                self.settings['url'])
+            results = self.cache.get(cache_key)
+        if results:
+            oracc_log, request_log, autolem = results
+        else:
+            client = SOAPClient(self.settings['url'], self.settings['port'],
+                                self.settings['dir'], method='POST')
+            try:
+                oracc_log, request_log, autolem = client.run_command(
+                                                self.command,
+                                                project,
+                                                atf_basename,
+                                                atf_text)
+            except Exception as e:
+                # Connection problems, server errors and unreadable responses
+                # only fail this file
+                return {'ok': False, 'server': self.server, 'error': str(e)}
+            if self.cache:
+                self.cache.put(cache_key, oracc_log, request_log, autolem)
+        errors, summary = parse_oracc_log(oracc_log or '')
+        result = {'ok': not errors,
+                  'server': self.server,
+                  'cached': bool(results),
+                  'project': project,
+                  'errors': errors,
+                  'summary': summary}
+        if self.command == 'lem' and autolem and not errors:
+            result['lemmatised'] = autolem.decode('utf-8')
+        return result
@@ -19,12 +19,14 @@ along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 
 from javax.swing.undo import CannotUndoException, CannotRedoException
 from javax.swing import JTextPane
-from java.awt import Color
+from javax.swing.text import DefaultEditorKit
 
 from ..view.AtfAreaView import AtfAreaView
 from ..view.AtfEditArea import AtfEditArea
 from ..view.SyntaxHighlighter import SyntaxHighlighter
 import TextLineNumber
+import bisect
+import difflib
 import re
 
 from ..utils import set_font
@@ -34,6 +36,13 @@ class AtfAreaController(object):
     '''
     Creates the ATF area (edit/object) view and handles its actions.
     '''
+    # Header of a translation into a right to left language. Add values to
+    # the groups if we need to support other translation styles or right to
+    # left languages in the future. The header has to be followed by the rest
+    # of its line.
+    arabic_header = re.compile(r'@translation\s(parallel|labeled|unitary)'
+                               r'\s(ar|fa|ku)\s.*\n')
+
     def __init__(self, mainControler):
         # Will also need delegating to parent presenter
         self.controller = mainControler
@@ -57,6 +66,12 @@ class AtfAreaController(object):
         self.undo_manager = self.view.undo_manager
         # Initialise validation errors
         self.validation_errors = {}
+        # Sorted lines of validation_errors, and the dict they belong to
+        self.error_lines = []
+        self.error_lines_source = None
+        # Set while a batch of edits is being applied, so the document
+        # listener leaves the error lines to apply_edits
+        self.applying_edits = False
         # Needed by syntax highlighter
         self.edit_area_styledoc = self.edit_area.getStyledDocument()
         # Synch content of split editor panes
@@ -88,6 +103,110 @@ class AtfAreaController(object):
         self.view.edit_area.setText(text)
         self.view.edit_listener.force_stop_compound()
 
+    def apply_edits(self, edits):
+        '''
+        Replace the text between the start and end caret positions of each
+        (start, end, text) tuple in `edits` with the given text, all in a
+        single undoable edit. Edits must be sorted and must not overlap.
+        Validation errors outside the edited lines are kept and only the
+        edited lines are highlighted again.
+        '''
+        if not edits:
+            return
+        if self.validation_errors:
+            self.validation_errors = self.shift_error_lines(edits)
+        doc = self.edit_area_styledoc
+        self.applying_edits = True
+        self.view.edit_listener.force_start_compound()
+        try:
+            # Going backwards so the positions of the pending edits don't
+            # change
+            for start, end, text in reversed(edits):
+                if end > start:
+                    doc.remove(start, end - start)
+                if text:
+                    doc.insertString(start, text, None)
+        finally:
+            self.view.edit_listener.force_stop_compound()
+            self.applying_edits = False
+        shift = sum(len(text) - (end - start) for start, end, text in edits)
+        self.highlight_range(edits[0][0], edits[-1][1] + shift)
+
+    def merge_text(self, text):
+        '''
+        Turn the ATF area text into `text` by replacing only the lines that
+        differ, e.g. the "#lem:" lines added by the lemmatiser, all in a
+        single undoable edit. The caret, scroll position and highlighting of
+        the unchanged lines are kept.
+        '''
+        old_lines = self.split_lines(self.getAtfAreaText())
+        new_lines = self.split_lines(text.replace('\r\n', '\n'))
+        # Caret position of the start of each line
+        starts = [0]
+        for line in old_lines:
+            starts.append(starts[-1] + len(line))
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, False)
+        edits = [(starts[i1], starts[i2], u''.join(new_lines[j1:j2]))
+                 for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+                 if tag != 'equal']
+        self.apply_edits(edits)
+
+    @staticmethod
+    def split_lines(text):
+        '''
+        Split the text in lines keeping their line breaks. Only "\n" counts
+        as a line break, like in the ATF area.
+        '''
+        lines = [line + u'\n' for line in text.split(u'\n')]
+        lines[-1] = lines[-1][:-1]
+        return lines if lines[-1] else lines[:-1]
+
+    def shift_error_lines(self, edits):
+        '''
+        Return a copy of self.validation_errors with the line numbers updated
+        to where the lines will be after applying the given edits (see
+        apply_edits). Errors on lines removed or rewritten by an edit are
+        dropped.
+        '''
+        root = self.edit_area_styledoc.getDefaultRootElement()
+
+        def at_line_start(offset):
+            index = root.getElementIndex(offset)
+            return root.getElement(index).getStartOffset() == offset
+
+        # (last line kept, last line removed or rewritten, line change) of
+        # each edit
+        spans = []
+        for start, end, text in edits:
+            first = root.getElementIndex(start) + 1
+            # An edit ending at the start of a line doesn't touch that line
+            if end > start and at_line_start(end):
+                last = root.getElementIndex(end - 1) + 1
+            else:
+                last = root.getElementIndex(end) + 1
+            if (at_line_start(start) and (end == start or at_line_start(end))
+                    and (not text or text.endswith('\n'))):
+                # Whole lines are inserted, removed or replaced, so the line
+                # the edit starts at isn't kept either
+                first -= 1
+                if end == start:
+                    last = first
+            spans.append((first, last, text.count('\n') - (last - first)))
+        shifted = {}
+        index = 0
+        shift = 0
+        for line in sorted(int(key) for key in self.validation_errors):
+            # Add up the line changes of the edits above this line
+            while index < len(spans) and spans[index][1] < line:
+                shift += spans[index][2]
+                index += 1
+            # Lines inside an edit are gone or have been rewritten
+            if (index < len(spans) and
+                    spans[index][0] < line <= spans[index][1]):
+                continue
+            shifted[str(line + shift)] = self.validation_errors[str(line)]
+        return shifted
+
     def getAtfAreaText(self):
         '''
         Short hand for getting Nammu's text area's content.
@@ -156,7 +275,14 @@ class AtfAreaController(object):
                     self.arabic_area.requestFocusInWindow()
                 elif editDoc == self.edit_area.getStyledDocument():
                     self.edit_area.requestFocusInWindow()
-                self.syntax_highlight()
+                # Only the text touched by an edit of the ATF area needs
+                # restyling. Its offsets don't apply to other panes, so the
+                # whole text is highlighted again for those, as before.
+                affected = currentEdit.affected_range()
+                if editDoc == self.edit_area.getStyledDocument() and affected:
+                    self.highlight_range(*affected)
+                else:
+                    self.syntax_highlight()
 
     def undo(self):
         '''
@@ -166,10 +292,12 @@ class AtfAreaController(object):
         INSERT/REMOVE happens, we won't be able until it's been explicitly
         ended.
         '''
-        self.view.edit_listener.current_compound.end()
+        self.view.edit_listener.end_compound()
         self.undoOrRedo(forward=False)
 
     def redo(self):
+        # Typing after a redo shouldn't be merged with the redone edit
+        self.view.edit_listener.end_compound()
         self.undoOrRedo(forward=True)
 
     def __getattr__(self, name):
@@ -344,6 +472,59 @@ class AtfAreaController(object):
         else:
             self.syntax_highlighter.syntax_highlight()
 
+    def highlight_viewports(self):
+        '''
+        Syntax highlight the text on screen. In a split editor each pane's
+        viewport is highlighted separately.
+        '''
+        extents = []
+        for top_caret, bottom_caret in self.view.get_viewport_ranges():
+            top_line, bottom_line = self.get_viewport_top_bottom(top_caret,
+                                                                 bottom_caret)
+            extents.append((top_line, bottom_line, top_caret, bottom_caret))
+        self.syntax_highlighter.syntax_highlight_extents(extents)
+
+    def highlight_range(self, start, end):
+        '''
+        Syntax highlight the lines between caret positions `start` and `end`.
+        Only the part of those lines that is on screen is restyled, the rest
+        will be highlighted when scrolled into view.
+        '''
+        for top, bottom in self.view.get_viewport_ranges():
+            self._highlight_lines(max(start, top), min(end, bottom))
+
+    def _highlight_lines(self, start, end):
+        if start > end:
+            return
+        doc = self.edit_area_styledoc
+        root = doc.getDefaultRootElement()
+        # Start lexing from the closest header so the lexer is in the right
+        # state, and finish at the end of the last affected line.
+        start = self.header_offset_above(start)
+        end_line = root.getElement(root.getElementIndex(end))
+        end = min(end_line.getEndOffset(), doc.getLength())
+        self.syntax_highlighter.highlight_range(
+                                            root.getElementIndex(start) + 1,
+                                            root.getElementIndex(end) + 1,
+                                            start,
+                                            end)
+
+    def header_offset_above(self, offset):
+        '''
+        Return the caret position at the start of the closest header line
+        ("&...") above the given caret position, or the start of the line
+        containing it if there are no headers above.
+        '''
+        doc = self.edit_area_styledoc
+        root = doc.getDefaultRootElement()
+        index = root.getElementIndex(offset)
+        for line_index in xrange(index, -1, -1):
+            line_start = root.getElement(line_index).getStartOffset()
+            if (line_start < doc.getLength() and
+                    doc.getText(line_start, 1) == '&'):
+                return line_start
+        return root.getElement(index).getStartOffset()
+
     def highlight_matches(self, matches, offset, current_match=None):
         self.syntax_highlighter.highlight_matches(matches,
                                                   offset,
@@ -367,10 +548,56 @@ class AtfAreaController(object):
         '''
         Turn off syntax highlight of matches.
         '''
-        length = len(self.getAtfAreaText())
-        self.syntax_highlighter._highlight_match(0, length, Color.white)
+        self.syntax_highlighter.clear_matches()
         self.syntax_highlighter.syntax_highlight()
 
+    def go_to_line(self, line_num):
+        '''
+        Move the caret to the start of the given line and focus the ATF area.
+        '''
+        root = self.edit_area_styledoc.getDefaultRootElement()
+        index = min(max(line_num - 1, 0), root.getElementCount() - 1)
+        offset = root.getElement(index).getStartOffset()
+        self.edit_area.setCaretPosition(offset)
+        # The caret only scrolls the view when it moves, so make sure the
+        # line is visible even if the caret was already there
+        rect = self.edit_area.modelToView(offset)
+        if rect is not None:
+            self.edit_area.scrollRectToVisible(rect)
+        self.edit_area.requestFocusInWindow()
+
+    def get_error_lines(self):
+        '''
+        Returns the sorted line numbers with validation errors. They're only
+        sorted again when validation_errors is replaced, i.e. after a
+        validation or an edit that moves them.
+        '''
+        if self.error_lines_source is not self.validation_errors:
+            self.error_lines = sorted(int(line) for line
+                                      in self.validation_errors)
+            self.error_lines_source = self.validation_errors
+        return self.error_lines
+
+    def go_to_error(self, forward=True):
+        '''
+        Move the caret to the next or previous line with validation errors,
+        starting again from the other end of the file when there aren't any
+        more. Returns the line number, or None if there are no errors.
+        '''
+        error_lines = self.get_error_lines()
+        if not error_lines:
+            return None
+        root = self.edit_area_styledoc.getDefaultRootElement()
+        current = root.getElementIndex(self.edit_area.getCaretPosition()) + 1
+        if forward:
+            index = bisect.bisect_right(error_lines, current)
+            line_num = error_lines[index % len(error_lines)]
+        else:
+            index = bisect.bisect_left(error_lines, current)
+            line_num = error_lines[index - 1]
+        self.go_to_line(line_num)
+        return line_num
+
     def getPositionFromLine(self, text, line_num):
         '''
         Given a block of text and a line number, return the caret position
@@ -418,18 +645,10 @@ class AtfAreaController(object):
         '''
         Returns the caret position of the beginning of the arabic block, if one
         is found. Otherwise returns None.
-
-        Add additional values to lang_codes or trans_types if we need to
-        support other translation styles or right to left langages in the
-        future
+        The header pattern has no nested repetition, so this is linear in the
+        length of the text.
         '''
-        lang_codes = '|'.join(['ar', 'fa', 'ku'])
-        trans_types = '|'.join(['parallel', 'labeled', 'unitary'])
-
-        regex = r'@translation(\s({}))(\s({})\s)(.*\n)+?'.format(trans_types,
-                                                                 lang_codes)
-        comp = re.compile(regex)
-        search = comp.search(text, re.MULTILINE)
+        search = self.arabic_header.search(text)
         if search:
             return search.start()
         else:
@@ -439,6 +658,29 @@ class AtfAreaController(object):
         '''
         Convienience method to get the text from the main text pane and the
         arabic pane and join them together so files can be saved properly.
+        The arabic block is kept in its own document, so it always starts
+        right after the end of the main pane's text and doesn't need to be
+        looked for again.
+        '''
+        return u''.join([self.get_document_text(self.edit_area),
+                         self.get_document_text(self.arabic_area)])
+
+    def has_arabic_translation(self):
+        '''
+        Only the arabic pane needs to be checked for a translation block.
+        '''
+        text = self.get_document_text(self.arabic_area)
+        return self.findArabic(text) is not None
+
+    def get_document_text(self, area):
+        '''
+        Get the text of the given area straight from its document, rather
+        than writing it out through the editor kit like JTextPane.getText
+        does. Line endings are converted the same way.
         '''
-        return u'{}{}'.format(self.edit_area.getText(),
-                              self.arabic_area.getText())
+        doc = area.getDocument()
+        text = doc.getText(0, doc.getLength())
+        end_of_line = doc.getProperty(DefaultEditorKit.EndOfLineStringProperty)
+        if end_of_line and end_of_line != '\n':
+            text = text.replace('\n', end_of_line)
+        return text
@@ -0,0 +1,108 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import logging
+import os
+import threading
+import time
+from swingutils.threads.swing import runSwingLater
+from ..utils.CorpusIndex import CorpusIndex
+from ..view.CorpusSearchView import CorpusSearchView
+
+
+class CorpusSearchController(object):
+    '''
+    Looks up lemmas, signs, words, line labels and texts in the corpus index
+    of the working directory. The index is brought up to date in the
+    background every time the search window is opened.
+    '''
+    # Options shown to the user and the index kinds they correspond to
+    kinds = [("All", None),
+             ("Lemma", 'lemma'),
+             ("Sign", 'sign'),
+             ("Word", 'word'),
+             ("Line label", 'label'),
+             ("Text", 'text')]
+
+    def __init__(self, maincontroller):
+        self.logger = logging.getLogger("NammuController")
+        self.controller = maincontroller
+        self.config = self.controller.config
+        self.results = []
+        directory = os.path.abspath(self.controller.get_working_dir())
+        index = self.controller.corpus_index
+        if index is None or index.directory != directory:
+            index = CorpusIndex(directory)
+            self.controller.corpus_index = index
+        self.index = index
+        self.view = CorpusSearchView(self)
+        self.view.display()
+        self.update_index()
+
+    def update_index(self):
+        '''
+        Index new and modified files in a background thread.
+        '''
+        self.view.set_status("Updating index of {}...".format(
+                                                        self.index.directory))
+        thread = threading.Thread(target=self._update_index,
+                                  args=(self.index,))
+        thread.setDaemon(True)
+        thread.start()
+
+    def search(self, query, kind):
+        '''
+        Show the places where the given key appears in the corpus.
+        '''
+        start_time = time.time()
+        self.results = self.index.lookup(query.strip(), kind)
+        self.view.show_results([self.format_result(result)
+                                for result in self.results])
+        self.view.set_status("{} results found in {:.1f} ms.".format(
+                                        len(self.results),
+                                        (time.time() - start_time) * 1000))
+
+    def open_result(self, index):
+        '''
+        Open the file of the chosen result and move the caret to its line.
+        '''
+        filename, line_num, kind = self.results[index]
+        self.controller.openFileAtLine(
+                                os.path.join(self.index.directory, filename),
+                                line_num)
+
+    def format_result(self, result):
+        filename, line_num, kind = result
+        return u"{}:{}: {}".format(filename, line_num, kind)
+
+    def _update_index(self, index):
+        start_time = time.time()
+        files, lexed = index.update()
+        postings = index.invert(files)
+        try:
+            index.save(files)
+        except IOError:
+            self.logger.debug("Couldn't save corpus index to %s.", index.path)
+        runSwingLater(self._index_updated, index, files, postings, lexed,
+                      time.time() - start_time)
+
+    def _index_updated(self, index, files, postings, lexed, elapsed):
+        index.replace(files, postings)
+        self.view.set_status("Indexed {} files ({} updated) in {:.2f} "
+                             "seconds.".format(len(files), lexed, elapsed))
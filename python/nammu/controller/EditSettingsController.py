@@ -58,6 +58,7 @@ class EditSettingsController:
         #       settings window. The other tabs for keystrokes, languages and
         #       projects will be added later.
         self.config['working_dir']['default'] = working_dir
+        server_changed = self.config['servers']['default'] != server
         self.config['servers']['default'] = server
         self.config['console_style']['fontsize']['user'] = console_fontsize
         self.config['console_style']['font_color']['user'] = font_color
@@ -68,6 +69,9 @@ class EditSettingsController:
             'user'] = arabic_area_fontsize
         self.controller.logger.debug("Settings updated.")
         save_yaml_config(self.config)
+        if server_changed:
+            # The chosen server goes first until the others are measured
+            self.controller.start_server_pool()
 
     def refreshConsole(self):
         self.controller.consoleController.refreshConsole()
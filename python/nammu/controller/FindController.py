@@ -17,57 +17,79 @@ You should have received a copy of the GNU General Public License
 along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import logging
 import re
+import time
 from ..view.FindView import FindView
-from javax.swing.text import BadLocationException
+from ..utils.SearchSession import SearchMatch, SearchSession
 
 
 class FindController(object):
     def __init__(self, maincontroller):
+        self.logger = logging.getLogger("NammuController")
         self.controller = maincontroller
         self.config = self.controller.config
         self.atfAreaController = self.controller.atfAreaController
         self.view = FindView(self)
         self.view.display()
-        self.matches = None
         self.expr = None
-        self.offset = 0
         self.ignore_case = False
         self.regex = False
         self.selection = False
-        self.selected_text = None
         self.doc = self.atfAreaController.edit_area_styledoc
-        self.position = None
-        # This is needed to keep track of which was the previous match in the
-        # iterator.
+        # Matches of the current search, kept up to date as the text changes
+        self.session = None
+        # This is needed to keep track of which was the previous match.
+        self.current_match = None
+
+    def close(self):
+        '''
+        Forget about the current search and stop following the text changes.
+        '''
+        if self.session:
+            self.session.close()
+        self.session = None
         self.current_match = None
-        self.count = None
 
     def replace_all(self, old_text, new_text, ignore_case, regex, selection):
         '''
-        Change all matches in the text with new given text.
+        Change all matches in the text (or in the selection, if the user
+        chooses so) with new given text. All replacements are applied to the
+        ATF area in a single undoable edit.
         '''
-        self.expr = new_text
+        start_time = time.time()
         self.ignore_case = ignore_case
         self.regex = regex
         self.selection = selection
-        # Check wether there is some text in the text area.
-        current = self.atfAreaController.getAtfAreaText()
-        if current:
-            # If user chooses to replace on selection, check if any text is
-            # selected and if so, work only on that selection.
-            if selection:
-                selected = self.atfAreaController.getSelectedText()
-                if selected:
-                    replaced = self._replace_all_in_text(selected, old_text,
-                                                         new_text, ignore_case,
-                                                         regex)
-                    self.atfAreaController.replaceSelection(replaced)
+        # Matches will need to be searched for again after replacing
+        self.expr = None
+        highlighted = self.session is not None
+        self.close()
+        if not old_text:
+            return
+        start, end = 0, self.doc.getLength()
+        if selection:
+            start = self.atfAreaController.getSelectionStart()
+            end = self.atfAreaController.edit_area.getSelectionEnd()
+        # Check wether there is some text to replace in.
+        if end <= start:
+            return
+        pattern = self._compile(old_text)
+        text = self.doc.getText(start, end - start)
+        edits = []
+        for match in pattern.finditer(text):
+            if regex:
+                replacement = match.expand(new_text)
             else:
-                replaced = self._replace_all_in_text(current, old_text,
-                                                     new_text, ignore_case,
-                                                     regex)
-                self.atfAreaController.setAtfAreaText(replaced)
+                replacement = new_text
+            edits.append((start + match.start(),
+                          start + match.end(),
+                          replacement))
+        if highlighted:
+            self.atfAreaController.restore_highlight()
+        self.atfAreaController.apply_edits(edits)
+        self.logger.info("Replaced %d matches in %.3f seconds.",
+                         len(edits), time.time() - start_time)
 
     def find_next(self, expr, ignore_case, regex, selection, reset=False):
         '''
@@ -87,142 +109,99 @@ class FindController(object):
         if self.expr != expr:
             self.expr = expr
             self.reset = True
-        if self.reset:
-            # TODO:Forget about previous text selections?
-            # self.selected_text = None
-            self.matches = self._find_all_matches()
-            if self.matches:
-                # Highlight matches
-                self.controller.atfAreaController.highlight_matches(
-                                                                self.matches,
-                                                                self.offset)
-                self.count = 0
-            else:
-                # TODO: Pop up - No matches
-                self.count = None
-                self.controller.atfAreaController.restore_highlight()
-        else:
-            # self.count could be 0!
-            if self.count is not None:
-                self.count += 1
-        try:
-            # Save current match
-            self.current_match = self.matches[self.count]
-        except IndexError:
-            # No more matches, restart search
-            # TODO: notify user with pop up?
-            self.count = self.current_match = self.previous_match = None
-            self.find_next(expr, ignore_case, regex, selection, True)
-        except TypeError:
-            # self.count is None
-            self.current_match = self.previous_match = None
-            self.controller.atfAreaController.restore_highlight()
+        if self.reset or self.session is None:
+            self._start_session()
+        if self.session is None or not self.session.matches:
             # TODO: Display pop up - No matches
+            self.current_match = None
+            self.controller.atfAreaController.restore_highlight()
+            return
+        if self.current_match is None:
+            offset = self.session.get_scope()[0]
         else:
-            # Move focus to current match
-            self.controller.atfAreaController.setCaretPosition(
-                                                self.current_match.start())
-            # Highlight matches, taking current match into account for
-            # different colouring
-            self.controller.atfAreaController.highlight_matches(
-                                                            self.matches,
-                                                            self.offset,
-                                                            self.current_match)
+            offset = self.current_match.end()
+            # Empty matches would be found again and again otherwise
+            if offset == self.current_match.start():
+                offset += 1
+        # When there are no more matches, the search starts again from the
+        # first one.
+        # TODO: notify user with pop up?
+        self.current_match = self.session.next_match(offset)
+        # Move focus to current match
+        self.controller.atfAreaController.setCaretPosition(
+                                            self.current_match.start())
+        # Highlight matches, taking current match into account for
+        # different colouring
+        self.controller.atfAreaController.highlight_matches(
+                                                    self.session.matches,
+                                                    0,
+                                                    self.current_match)
 
     def replace_one(self, old_text, new_text, ignore_case, regex, selection):
         '''
-        Replace one match and reset the matches in the iterator since
-        all the positions will be dependent on the shift caused by the replace.
-        Best for now is to find all matches with an offset up to the replaced
-        word.
+        Replace the current match and move on to the next one. The search
+        session takes care of finding again the matches in the edited line, so
+        there is no need to search the whole text again.
         '''
-        if self.current_match:
-            # Get current caret position, which will be pointing to the
-            # beginning of the word that needs changing.
-            caret_pos = self.atfAreaController.edit_area.getCaretPosition()
-            old_length = len(old_text)
-            new_length = len(new_text)
-            try:
-                self.doc.remove(caret_pos, old_length)
-                self.doc.insertString(caret_pos, new_text, None)
-                # Move caret to next match and highlight matches
-                # self.offset = caret_pos
-            except BadLocationException:
-                # We've reached end of text
-                # If length is equal, no need to find all again.
-                self.matches = self._find_all_matches()
-            # If length is equal, no need to find all again.
-            if old_length != new_length:
-                self.offset = caret_pos
-                self.matches = self._find_all_matches()
-            # In any case, try to find next
+        if self.current_match and self.session:
+            start = self.current_match.start()
+            # The match as the session found it in its context, so patterns
+            # that look around the match (e.g. lookbehinds, \b or $) work
+            match = self.session.match_at(start)
+            if match is None:
+                # The text has changed since, so just move on
+                self.find_next(old_text, ignore_case, regex, selection)
+                return
+            end = match.end()
+            replacement = new_text
+            if self.regex:
+                # Allow references to groups in the replacement text
+                replacement = match.match.expand(new_text)
+            # Replacing a match is a single undoable action
+            edit_listener = self.atfAreaController.view.edit_listener
+            edit_listener.force_start_compound()
+            self.doc.remove(start, end - start)
+            self.doc.insertString(start, replacement, None)
+            edit_listener.force_stop_compound()
+            self.atfAreaController.highlight_range(start,
+                                                   start + len(replacement))
+            # Next match will be searched for after the replaced text
+            self.current_match = SearchMatch(self.doc, start,
+                                             start + len(replacement))
             self.find_next(old_text, ignore_case, regex, selection)
         else:
             # TODO: Show window saying no more matches found
             pass
 
-    def _find_all_matches(self):
+    def _start_session(self):
         '''
-        Helper method that finds all matches depending on user options.
+        Helper method that finds all matches depending on user options and
+        keeps track of them from then on.
         '''
-        # Check wether there is some text in the text area.
-        atf_text = self.atfAreaController.getAtfAreaText()
-        if atf_text:
-            # If user chooses to find on selection, check if any text is
-            # selected and if so, work only on that selection.
-            # Note selection will be disabled when caret is moved, so once
-            # we reach the end of the selection, the next time getSelectedText
-            # will return None. We need to make the selection persistent until
-            # next reset.
-            if self.selection:
-                atf_text = self.atfAreaController.getSelectedText()
-                if atf_text:
-                    self.selected_text = atf_text
-                    self.offset = self.atfAreaController.getSelectionStart()
-                elif self.selected_text:
-                    atf_text = self.selected_text
-                else:
-                    self.selected_text = None
-                    self.offset = 0
-            else:
-                self.offset = 0
-                self.selected_text = None
-            if atf_text:
-                return self._find_matches(atf_text)
-            else:
-                return None
+        # If user chooses to find on selection, check if any text is
+        # selected and if so, work only on that selection.
+        # Note selection will be disabled when caret is moved, so we need to
+        # make the selection persistent until next selection.
+        scope = (0, None)
+        if self.selection:
+            selection_start = self.atfAreaController.getSelectionStart()
+            selection_end = self.atfAreaController.edit_area.getSelectionEnd()
+            if selection_end > selection_start:
+                scope = (selection_start, selection_end)
+            elif self.session and self.session.scope_end:
+                scope = self.session.get_scope()
+        self.close()
+        if self.expr:
+            self.session = SearchSession(self.doc, self._compile(self.expr),
+                                         *scope)
 
-    def _replace_all_in_text(self, atf_text, old_text, new_text, ignore_case,
-                             regex):
-        '''
-        Checks all flags and returns a text after replacing old_text with
-        new_text.
+    def _compile(self, expr):
         '''
-        if not regex:
-            old_text = re.escape(old_text)
-        if ignore_case:
-            pattern = re.compile(old_text, re.IGNORECASE)
-            text = pattern.sub(new_text, atf_text)
-        else:
-            text = re.sub(old_text, new_text, atf_text)
-        return text
-
-    def _find_matches(self, text):
-        '''
-        Returns a list with the begining position of all matches of a given
-        text in the ATF area.
+        Returns a compiled pattern for the given text, depending on the regular
+        expression and ignore case options.
         '''
         if not self.regex:
-            expr = re.escape(self.expr)
-        else:
-            expr = self.expr
+            expr = re.escape(expr)
         if self.ignore_case:
-            pattern = re.compile(expr, re.IGNORECASE)
-        else:
-            pattern = re.compile(expr)
-        # Save matches on a list because iterators are making re-painting
-        # matches a nightmare. Also useful for future find backwards.
-        matches = []
-        for match in pattern.finditer(text):
-            matches.append(match)
-        return matches
+            return re.compile(expr, re.IGNORECASE)
+        return re.compile(expr)
@@ -0,0 +1,181 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import codecs
+import logging
+import os
+import re
+import time
+from java.lang import Runnable, Runtime
+from java.util.concurrent import Executors
+from swingutils.threads.swing import runSwingLater
+from ..view.FindInFilesView import FindInFilesView
+
+
+class FindInFilesController(object):
+    '''
+    Searches all the ATF files in the working directory in parallel and
+    lists the matching lines as they are found.
+    '''
+    def __init__(self, maincontroller):
+        self.logger = logging.getLogger("NammuController")
+        self.controller = maincontroller
+        self.config = self.controller.config
+        self.executor = None
+        # Each search gets a new id, so results from cancelled searches that
+        # were still running can be told apart and ignored.
+        self.search_id = 0
+        self.pending = 0
+        self.results = []
+        self.start_time = None
+        self.view = FindInFilesView(self)
+        self.view.display()
+
+    def find(self, expr, ignore_case, regex):
+        '''
+        Start searching for the given text in the ATF files in the working
+        directory. Any search still running is cancelled.
+        '''
+        self.cancel()
+        self.results = []
+        self.view.clear_results()
+        if not expr:
+            return
+        if not regex:
+            expr = re.escape(expr)
+        try:
+            if ignore_case:
+                pattern = re.compile(expr, re.IGNORECASE)
+            else:
+                pattern = re.compile(expr)
+        except re.error:
+            self.logger.error("Invalid regular expression: %s", expr)
+            return
+
+        directory = self.controller.get_working_dir()
+        filenames = self._find_atf_files(directory)
+        self.start_time = time.time()
+        self.pending = len(filenames)
+        self.view.set_status("Searching {} files in {}...".format(
+                                                        len(filenames),
+                                                        directory))
+        if not filenames:
+            self._finish()
+            return
+
+        # Files are searched in parallel, each worker sending the results of
+        # a whole file back to the Swing thread at once.
+        threads = Runtime.getRuntime().availableProcessors()
+        self.executor = Executors.newFixedThreadPool(threads)
+        for filename in filenames:
+            self.executor.execute(FileSearch(self, self.search_id, filename,
+                                             pattern))
+        # No more tasks will be submitted, so threads finish with the last one
+        self.executor.shutdown()
+
+    def cancel(self):
+        '''
+        Stop the current search, keeping the results found so far.
+        '''
+        self.search_id += 1
+        if self.executor:
+            self.executor.shutdownNow()
+            self.executor = None
+            if self.pending:
+                self.view.set_status("Search cancelled, {} matching lines "
+                                     "found.".format(len(self.results)))
+        self.pending = 0
+
+    def is_cancelled(self, search_id):
+        return search_id != self.search_id
+
+    def add_results(self, search_id, results):
+        '''
+        Show the results of a file in the list. Must be called from the Swing
+        thread.
+        '''
+        if self.is_cancelled(search_id):
+            return
+        self.results.extend(results)
+        self.view.add_results(results)
+        self.pending -= 1
+        if self.pending == 0:
+            self._finish()
+
+    def open_result(self, index):
+        '''
+        Open the file of the chosen result and move the caret to its line.
+        '''
+        filename, line_num, line = self.results[index]
+        self.controller.openFileAtLine(filename, line_num)
+
+    def format_result(self, result):
+        '''
+        Text shown for a result in the list: path relative to the working
+        directory, line number and line.
+        '''
+        filename, line_num, line = result
+        directory = self.controller.get_working_dir()
+        return u"{}:{}: {}".format(os.path.relpath(filename, directory),
+                                   line_num,
+                                   line.strip())
+
+    def _finish(self):
+        self.executor = None
+        self.view.set_status("Found {} matching lines in {:.2f} "
+                             "seconds.".format(len(self.results),
+                                               time.time() - self.start_time))
+
+    def _find_atf_files(self, directory):
+        '''
+        Returns a sorted list with the paths of all ATF files in the given
+        directory and its subdirectories.
+        '''
+        filenames = []
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                if os.path.splitext(name)[1] == '.atf':
+                    filenames.append(os.path.join(root, name))
+        return sorted(filenames)
+
+
+class FileSearch(Runnable):
+    '''
+    Task searching for a pattern in the lines of a file, run by the find in
+    files thread pool.
+    '''
+    def __init__(self, controller, search_id, filename, pattern):
+        self.controller = controller
+        self.search_id = search_id
+        self.filename = filename
+        self.pattern = pattern
+
+    def run(self):
+        results = []
+        if not self.controller.is_cancelled(self.search_id):
+            try:
+                text = codecs.open(self.filename, encoding='utf-8').read()
+            except (IOError, UnicodeDecodeError):
+                self.controller.logger.debug("Couldn't read %s when finding "
+                                             "in files.", self.filename)
+            else:
+                for line_num, line in enumerate(text.split('\n'), start=1):
+                    if self.pattern.search(line):
+                        results.append((self.filename, line_num, line))
+        runSwingLater(self.controller.add_results, self.search_id, results)
@@ -17,9 +17,15 @@ You should have received a copy of the GNU General Public License
 along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
-from java.util import Vector
+import threading
+from java.awt.event import ActionListener
+from javax.swing import Timer
+from javax.swing.event import DocumentListener
+from swingutils.threads.swing import runSwingLater
+from pyoracc.atf.atffile import AtfFile
 
-from ..view.ModelView import ModelView
+from ..utils import split_fragments
+from ..view.ModelView import ModelView, LinesTableModel
 from pyoracc.model.translation import Translation
 from pyoracc.model.ruling import Ruling
 from pyoracc.model.comment import Comment
@@ -32,8 +38,14 @@ class ModelController(object):
     Displays ATF model view in a separate window.
     It'll possibly be shown instead of the text view in the AtfAreaView in the
     future.
+    The model view follows the changes in the ATF area: once the user stops
+    typing, the fragments that changed are parsed again in the background and
+    only the rows that differ are updated.
     '''
-    def __init__(self, mainControler, parsedAtf):
+    # Milliseconds without edits before the model view is updated
+    sync_delay = 500
+
+    def __init__(self, mainControler, parsedAtf, sourceText=""):
         """
         1. Parse text area content
         2. Change atfArea mode to model view from parent controller?
@@ -53,6 +65,14 @@ class ModelController(object):
         # Get ATF object parsed from text displated in text area
         self.atf = parsedAtf
 
+        # Table models of the tabs built so far, and whether the view is
+        # following the changes in the ATF area
+        self.table_models = {}
+        self.sync_listener = None
+        # Increased with every sync, so results of outdated background parses
+        # are discarded
+        self.revision = 0
+
         # Shorthand for calling the logger
         self.logger = self.controller.logger
 
@@ -68,67 +88,217 @@ class ModelController(object):
         self.logger.info("The Model View is an experimental feature, use with "
                          "caution!")
 
-        if isinstance(atfText, Composite) and atfText:
-            self.logger.info("The current file {} contains multiple fragments "
-                             "and cannot be loaded into the model view. Please"
-                             " save the file as individual fragments and try "
-                             " again".format(self.controller.currentFilename))
-        elif atfText is None:
+        if atfText is None:
             self.logger.info("The current file is formatted in a way that"
                              "the model view cannot understand.")
         else:
-            self.configure_model_view_single(atfText)
+            # Files with multiple fragments get a tab per fragment
+            if isinstance(atfText, Composite):
+                self.texts = list(atfText.texts)
+            else:
+                self.texts = [atfText]
+            self.fragments = [text for line_num, text
+                              in split_fragments(sourceText)[1]]
+            self.configure_model_view()
+            self.start_sync()
 
-    def configure_model_view_single(self, atfText):
+    def configure_model_view(self):
         '''
-        At present the model view can only cope with files which represent a
-        single fragment. This method has been moved out of init so we only
-        call it if a single fragment file is loaded.
+        Add a tab in the view per object in the text and display it. The
+        contents of each tab are only built when it is first selected, so
+        files with lots of objects can be displayed straight away.
         '''
+        for atfText in self.texts:
+            self.view.addObject(self.get_object_id(atfText))
 
-        # Add a new tab in the view per object in the text
-        objectID = "&" + atfText.code + " = " + atfText.description
-        self.view.addObject(objectID)
+        # Display model view
+        self.view.display()
+
+    def buildObject(self, index):
+        '''
+        Add the metadata and lines of the object in the given tab to the view.
+        '''
+        atfText = self.texts[index]
         # TODO: ATF protocols are not saved in the model yet, but need to be
         # passed here:
-        # self.view.objectTab[objectID].addMetadata(objectID, atfText.project,
-        #                                          atfText.language,
-        #                                          atfText.protocols)
-        self.view.addMetadata(objectID, atfText.project, atfText.language)
+        # self.view.addMetadata(index, atfText.project, atfText.language,
+        #                       atfText.protocols)
+        self.view.addMetadata(index, atfText.project, atfText.language)
+        table_model = LinesTableModel(self.get_lines(atfText),
+                                      self.describe_line, self.line_key)
+        self.table_models[index] = table_model
+        self.view.addLines(index, table_model)
 
+    def get_object_id(self, atfText):
+        return u"&{} = {}".format(atfText.code, atfText.description)
+
+    def get_lines(self, atfText):
+        '''
+        Returns the lines of all sides of all objects in a text.
+        '''
+        lines = []
         for item in atfText.children:
             for side in item.children:
                 # TODO Display side type and make panel as convenient to show
                 # all sides
                 if not(isinstance(side, Translation)):
                     for line in side.children:
-                        # TODO Display label and words and lemmas in dropdown
-                        # boxes
-                        content = Vector()
-                        # TODO use polimorfism - see
-                        # http://stackoverflow.com/questions/5579309/switch-instanceof
-                        if (isinstance(line, Line)):
-                            label = line.label
-                            words = " ".join(line.words)
-                            lemmas = ", ".join(line.lemmas)
-                            content.clear()
-                            content.add(words)
-                            content.add(lemmas)
-                            # content.add(translations)
-                            self.view.addLine(objectID, label, content)
-                        if (isinstance(line, Ruling)):
-                            label = "$ ruling"
-                            if line.type == "single":
-                                ruling = "-------------"
-                            content.clear()
-                            content.add(ruling)
-                            self.view.addLine(objectID, label, content)
-                        if (isinstance(line, Comment)):
-                            label = "# Comment"
-                            comment = line.content
-                            content.clear()
-                            content.add(comment)
-                            self.view.addLine(objectID, label, content)
+                        if isinstance(line, (Line, Ruling, Comment)):
+                            lines.append(line)
+        return lines
 
-        # Display model view
-        self.view.display()
+    def describe_line(self, line):
+        '''
+        Returns the label, content and lemmas to display for a line.
+        '''
+        # TODO use polimorfism - see
+        # http://stackoverflow.com/questions/5579309/switch-instanceof
+        if isinstance(line, Line):
+            return line.label, " ".join(line.words), ", ".join(line.lemmas)
+        if isinstance(line, Ruling):
+            if line.type == "single":
+                ruling = "-------------"
+            else:
+                ruling = line.type
+            return "$ ruling", ruling, ""
+        return "# Comment", line.content, ""
+
+    def line_key(self, line):
+        '''
+        Returns what describe_line shows of a line, without building the text,
+        to compare the lines of two parses.
+        '''
+        if isinstance(line, Line):
+            return Line, line.label, tuple(line.words), tuple(line.lemmas)
+        if isinstance(line, Ruling):
+            return Ruling, line.type
+        return Comment, line.content
+
+    def start_sync(self):
+        '''
+        Start following the changes in the ATF area.
+        '''
+        self.sync_listener = ModelSyncListener(self)
+        self.sync_timer = Timer(self.sync_delay, self.sync_listener)
+        self.sync_timer.setRepeats(False)
+        doc = self.controller.atfAreaController.edit_area_styledoc
+        doc.addDocumentListener(self.sync_listener)
+
+    def close(self):
+        '''
+        Stop following the changes in the ATF area once the window is closed.
+        '''
+        if self.sync_listener:
+            self.sync_timer.stop()
+            doc = self.controller.atfAreaController.edit_area_styledoc
+            doc.removeDocumentListener(self.sync_listener)
+            self.sync_listener = None
+
+    def sync(self):
+        '''
+        Find which fragments have changed since the last sync and parse them
+        again in the background. If fragments have been added or removed, the
+        whole text is parsed again.
+        '''
+        text = self.controller.atfAreaController.getAtfAreaText()
+        texts = [fragment for line_num, fragment
+                 in split_fragments(text)[1]]
+        if len(texts) == len(self.fragments):
+            changed = [index for index, fragment in enumerate(texts)
+                       if fragment != self.fragments[index]]
+            if not changed:
+                return
+        else:
+            changed = None
+        self.revision += 1
+        thread = threading.Thread(target=self._parse_changes,
+                                  args=(self.revision, text, texts, changed))
+        thread.setDaemon(True)
+        thread.start()
+
+    def _parse_changes(self, revision, text, texts, changed):
+        '''
+        Runs in a background thread. Fragments that can't be parsed are left
+        as they were until they are fixed.
+        '''
+        if changed is None:
+            try:
+                parsed = AtfFile(text)
+            except SyntaxError as e:
+                runSwingLater(self._report_syntax_error, revision, e)
+            else:
+                runSwingLater(self._rebuild, revision, texts, parsed)
+            return
+        updates = []
+        for index in changed:
+            try:
+                updates.append((index, AtfFile(texts[index]).text))
+            except SyntaxError:
+                pass
+        runSwingLater(self._apply_changes, revision, texts, updates)
+
+    def _apply_changes(self, revision, texts, updates):
+        '''
+        Replace the changed fragments and update only their rows in the view.
+        '''
+        if revision != self.revision or not self.sync_listener:
+            return
+        for index, atfText in updates:
+            if isinstance(atfText, Composite):
+                continue
+            self.fragments[index] = texts[index]
+            self.texts[index] = atfText
+            self.view.setObjectTitle(index, self.get_object_id(atfText))
+            if index in self.table_models:
+                self.table_models[index].update_lines(self.get_lines(atfText))
+
+    def _report_syntax_error(self, revision, error):
+        '''
+        Report why the text couldn't be parsed, unless it's changed since.
+        '''
+        if revision == self.revision and self.sync_listener:
+            self.controller.report_syntax_error(error)
+
+    def _rebuild(self, revision, texts, parsed):
+        '''
+        Show all tabs again after fragments have been added or removed.
+        '''
+        if revision != self.revision or not self.sync_listener:
+            return
+        try:
+            atfText = parsed.text
+        except AttributeError:
+            return
+        if isinstance(atfText, Composite):
+            self.texts = list(atfText.texts)
+        else:
+            self.texts = [atfText]
+        self.fragments = texts
+        self.table_models = {}
+        self.view.clearObjects()
+        for atfText in self.texts:
+            self.view.addObject(self.get_object_id(atfText))
+
+
+class ModelSyncListener(DocumentListener, ActionListener):
+    '''
+    Waits for the user to stop editing the ATF area for a moment before
+    updating the model view.
+    '''
+    def __init__(self, controller):
+        self.controller = controller
+
+    def insertUpdate(self, e):
+        self.controller.sync_timer.restart()
+
+    def removeUpdate(self, e):
+        self.controller.sync_timer.restart()
+
+    def changedUpdate(self, e):
+        '''
+        Attribute changes (e.g. syntax highlighting) don't affect the model.
+        '''
+        pass
+
+    def actionPerformed(self, e):
+        self.controller.sync()
@@ -22,6 +22,7 @@ from logging import Formatter
 import logging
 import logging.config
 import os
+import threading
 from swingutils.threads.swing import runSwingLater
 
 from AtfAreaController import AtfAreaController
@@ -31,6 +32,8 @@ from ModelController import ModelController
 from ToolbarController import ToolbarController
 from NewAtfController import NewAtfController
 from FindController import FindController
+from FindInFilesController import FindInFilesController
+from CorpusSearchController import CorpusSearchController
 from EditSettingsController import EditSettingsController
 from WelcomeController import WelcomeController
 from java.awt import Desktop
@@ -40,12 +43,19 @@ from javax.swing import JFileChooser, JOptionPane, ToolTipManager, JSplitPane
 from javax.swing.filechooser import FileNameExtensionFilter
 from javax.swing.text import DefaultCaret
 from pyoracc.atf.atffile import AtfFile
-from requests.exceptions import RequestException, ConnectTimeout
+from requests.exceptions import ConnectTimeout
 from requests.exceptions import Timeout, ConnectionError, HTTPError
 
 from ..SOAPClient.SOAPClient import SOAPClient
+from ..SOAPClient.ServerPool import ServerPool
 from ..utils import get_yaml_config, save_yaml_config, get_log_path
+from ..utils import split_fragments, select_fragments
 from ..utils.NammuConsoleHandler import NammuConsoleHandler
+from ..utils.FragmentDelta import FragmentDelta, join_pieces
+from ..utils.FragmentDelta import remap_log_lines
+from ..utils.JobQueue import JobQueue
+from ..utils.ValidationCache import ValidationCache
+from ..utils.ValidationReport import ValidationReport
 from ..view.NammuView import NammuView
 
 
@@ -105,6 +115,43 @@ class NammuController(object):
 
         # Find windows shouldn't coexist
         self.finding = False
+        self.find_controller = None
+        self.find_in_files_controller = None
+        self.corpus_search_controller = None
+
+        # Corpus index of the working directory, loaded when first needed
+        self.corpus_index = None
+
+        # Errors found by the last validation or lemmatisation
+        self.validation_report = None
+
+        # Server results of unchanged files, or None if disabled in settings
+        self.validation_cache = ValidationCache.from_config(self.config)
+
+        # ORACC servers to send commands to, measured in the background
+        self.server_pool = None
+        self.start_server_pool()
+
+        # Background thread sending the last command to the server, and a
+        # counter to tell the results of earlier commands apart
+        self.command_thread = None
+        self.command_revision = 0
+
+        # Texts of the current file that last validated without errors
+        self.fragment_delta = None
+        if self.config.get('delta_validation', {}).get('enabled', True):
+            self.fragment_delta = FragmentDelta()
+
+        # Requests waiting for a server to be reachable, kept across sessions
+        self.job_queue = JobQueue.from_config(self.config, self.run_job,
+                                              self.job_done, self.job_failed)
+        if self.job_queue:
+            self.job_queue.start()
+
+        # Last text parsed and its parsed object, and the model view showing
+        # it, if any
+        self.parse_cache = None
+        self.modelController = None
 
         # Keep track of arabic edition being on or off
         self.arabic_edition_on = False
@@ -160,66 +207,95 @@ class NammuController(object):
 
             if status == JFileChooser.APPROVE_OPTION:
                 atfFile = fileChooser.getSelectedFile()
-                self.currentFilename = atfFile.getCanonicalPath()
-                atfText = self.readTextFile(self.currentFilename)
-                # Clear ATF area before adding next text to clean up tooltips
-                # and such
-                self.atfAreaController.clearAtfArea(
-                                            arabic=self.arabic_edition_on)
-
-                # Check for Arabic content and toggle arabic translation mode
-                arabicIndex = self.atfAreaController.findArabic(atfText)
-                if arabicIndex:
-                    self.atf_body = atfText[:arabicIndex]
-                    self.atf_translation = atfText[arabicIndex:]
-                    self.arabic(force=True)
-                else:
-                    # Turn off caret movement and highligting for file load
-                    self.atfAreaController.caret.setUpdatePolicy(
-                                                    DefaultCaret.NEVER_UPDATE)
-                    syntax_high = self.atfAreaController.syntax_highlighter
-                    syntax_high.syntax_highlight_on = True
-                    self.atfAreaController.setAtfAreaText(atfText)
-                    self.atf_body = atfText
-                    self.atf_translation = ""
-                    if self.arabic_edition_on:
-                        if self.handleUnsaved():
-                            self.arabic_edition_on = False
-                            self.splitEditorV()
+                self.loadFile(atfFile.getCanonicalPath())
 
-                self.consoleController.clearConsole()
-                self.logger.info("File %s successfully opened.",
-                                 self.currentFilename)
-                self.view.set_title()
+            # TODO: Else, prompt user to choose again before closing
 
-                # Re-enable caret updating and syntax highlighting after load
-                self.atfAreaController.caret.setUpdatePolicy(
-                                                    DefaultCaret.ALWAYS_UPDATE)
+    def loadFile(self, filename):
+        '''
+        Load the given ATF file in the text area and display its name in the
+        title bar. Unsaved changes need to have been handled by the caller.
+        '''
+        self.currentFilename = filename
+        atfText = self.readTextFile(self.currentFilename)
+        # Clear ATF area before adding next text to clean up tooltips
+        # and such
+        self.atfAreaController.clearAtfArea(arabic=self.arabic_edition_on)
 
-                # Now dispatch syntax highlighting in a new thread so
-                # we dont highlight before the full file is loaded
-                runSwingLater(self.initHighlighting)
+        # Check for Arabic content and toggle arabic translation mode
+        arabicIndex = self.atfAreaController.findArabic(atfText)
+        if arabicIndex is not None:
+            self.atf_body = atfText[:arabicIndex]
+            self.atf_translation = atfText[arabicIndex:]
+            self.arabic(force=True)
+        else:
+            # Turn off caret movement and highligting for file load
+            self.atfAreaController.caret.setUpdatePolicy(
+                                            DefaultCaret.NEVER_UPDATE)
+            syntax_high = self.atfAreaController.syntax_highlighter
+            syntax_high.syntax_highlight_on = True
+            self.atfAreaController.setAtfAreaText(atfText)
+            self.atf_body = atfText
+            self.atf_translation = ""
+            if self.arabic_edition_on:
+                if self.handleUnsaved():
+                    self.arabic_edition_on = False
+                    self.splitEditorV()
 
-            # TODO: Else, prompt user to choose again before closing
+        self.consoleController.clearConsole()
+        self.logger.info("File %s successfully opened.",
+                         self.currentFilename)
+        self.view.set_title()
 
-            # Update settings with current file's path
-            self.update_config_element(self.get_working_dir(),
-                                       'default', 'working_dir')
+        # Re-enable caret updating and syntax highlighting after load
+        self.atfAreaController.caret.setUpdatePolicy(
+                                            DefaultCaret.ALWAYS_UPDATE)
 
-            # Finally, refresh the edit area to propagate custom font settings
-            self.atfAreaController.refreshEditArea()
+        # Now dispatch syntax highlighting in a new thread so
+        # we dont highlight before the full file is loaded
+        runSwingLater(self.initHighlighting)
 
-            # Clear stack of edits
-            self.atfAreaController.undo_manager.discardAllEdits()
+        # Update settings with current file's path
+        self.update_config_element(self.get_working_dir(),
+                                   'default', 'working_dir')
+
+        # Finally, refresh the edit area to propagate custom font settings
+        self.atfAreaController.refreshEditArea()
+
+        # Clear stack of edits
+        self.atfAreaController.undo_manager.discardAllEdits()
+
+    def openFileAtLine(self, filename, line_num):
+        '''
+        Load the given ATF file, unless it is the one already open, and move
+        the caret to the given line.
+        '''
+        if filename != self.currentFilename:
+            if not self.handleUnsaved():
+                return
+            self.loadFile(filename)
+        self.atfAreaController.go_to_line(line_num)
+
+    def nextError(self, event=None):
+        '''
+        Move the caret to the next line with validation errors.
+        '''
+        if self.atfAreaController.go_to_error(forward=True) is None:
+            self.logger.info("There are no validation errors to go to.")
+
+    def previousError(self, event=None):
+        '''
+        Move the caret to the previous line with validation errors.
+        '''
+        if self.atfAreaController.go_to_error(forward=False) is None:
+            self.logger.info("There are no validation errors to go to.")
 
     def initHighlighting(self):
         '''
         A helper function to be called when we need to initialise syntax
         highlighting in a different thread.
         '''
-        atfview = self.atfAreaController.view
-        top, bottom = atfview.get_viewport_carets()
-        self.atfAreaController.syntax_highlight(top, bottom)
+        self.atfAreaController.highlight_viewports()
 
     def readTextFile(self, filename):
         '''
@@ -541,8 +617,6 @@ class NammuController(object):
         Connect to ORACC server and retrieved lemmatised version of ATF file.
         Don't lemmatise if file doesn't validate.
         '''
-        # Grab the caret position before lemmatising
-        pre_cursor = self.atfAreaController.edit_area.getCaretPosition()
         # Clear previous log in Nammu's console
         self.consoleController.clearConsole()
 
@@ -565,94 +639,339 @@ class NammuController(object):
                                 self.currentFilename)
 
             self.logger.debug("Lemmatising ATF done.")
-            # Restore the caret position following lemmatisation
-            self.atfAreaController.edit_area.setCaretPosition(pre_cursor)
         else:
             self.logger.error("Please save file before trying to lemmatise.")
 
-    def send_command(self, command, project):
+    def lemmatiseSelection(self, event=None):
+        '''
+        Lemmatise only the texts ("&" fragments) under the caret or touched by
+        the selection, sent with the lines before the first text, and put
+        the lemmatised texts back in place.
+        '''
+        self.consoleController.clearConsole()
+        self.atfAreaController.clearToolTips()
+        if not self.currentFilename:
+            self.logger.error("Please save file before trying to lemmatise.")
+            return
+        project = self.get_project()
+        if not project:
+            self.logger.error("No project found in file %s. "
+                              "Add project and retry.",
+                              self.currentFilename)
+            return
+        area = self.atfAreaController.edit_area
+        root = area.getDocument().getDefaultRootElement()
+        first_line = root.getElementIndex(area.getSelectionStart()) + 1
+        last_line = root.getElementIndex(area.getSelectionEnd()) + 1
+        preamble, fragments = select_fragments(self._getAtfText(False),
+                                               first_line, last_line)
+        if not fragments:
+            self.logger.error("Place the caret in a text or select the texts "
+                              "to lemmatise.")
+            return
+        self.logger.debug("Lemmatising %d texts of ATF file %s.",
+                          len(fragments), self.currentFilename)
+        self.send_command("lem", project, (preamble, fragments))
+        self.logger.debug("Lemmatising ATF done.")
+
+    def send_command(self, command, project, selection=None):
         '''
         Both validation and atf validation work similarly, same for other
         services.
         This method sends a command to the ORACC server along with all the
         necessary arguments to build the HTTP request.
-        '''
-        # Build request.zip on the fly, pack all needed in it and send to
-        # server
-        server = self.config['servers']['default']
-        url = self.config['servers'][server]['url']
-        port = self.config['servers'][server]['port']
-        url_dir = self.config['servers'][server]['dir']
-
-        # Create HTTP client and prepare all input arguments for request
-        client = SOAPClient(url, port, url_dir, method='POST')
-
+        If `selection` is given, it's the text before the first fragment and
+        the (line number, text) tuples of the only fragments to send.
+        The results are shown once the server sends them, unless another
+        command has been sent since.
+        '''
+        self.command_revision += 1
+        revision = self.command_revision
+        filename = self.currentFilename
         atf_basename = os.path.basename(self.currentFilename)
         # Do not send Arabic translation for lemmatisation.
-        nammu_text = self._getAtfText(command != "lem" and
-                                      self.arabic_edition_on)
+        nammu_text = full_text = self._getAtfText(command != "lem" and
+                                                  self.arabic_edition_on)
+        line_map = None
+        if selection:
+            preamble, fragments = selection
+            nammu_text, line_map = join_pieces([(1, preamble)] + fragments)
+
+        # Only validate the texts that changed since they last validated
+        # without errors, together with the lines before the first text.
+        delta = self.fragment_delta if command == "atf" else None
+        arabic_edition_on = self.arabic_edition_on
+
+        def delta_context(server):
+            # Another server might not accept what this one did
+            if server in self.server_pool.servers:
+                settings = self.server_pool.servers[server]
+                server = "{}:{}".format(settings['url'], settings['port'])
+            return (filename, project, arabic_edition_on, server)
+
+        if delta:
+            # The server that answers is only known once the command is sent,
+            # so expect the best one
+            ranked = self.server_pool.get_ranked()
+            nammu_text = delta.build(nammu_text, delta_context(
+                                        ranked[0] if ranked else None))
+            if nammu_text is None:
+                self.logger.debug("No texts changed since they last "
+                                  "validated without errors.")
+                self.process_server_response('', '', None)
+                return
+            self.logger.debug("Validating %d changed texts.",
+                              delta.get_fragment_count())
 
         # Remove spaces from filename which make the server confused
         atf_basename = atf_basename.replace(' ', '')
+        atf_text = nammu_text.encode('utf-8')
+
+        # The servers would give the same answer for an unchanged file
+        if self.validation_cache:
+            results = server = None
+            for server in self.server_pool.get_ranked():
+                results = self.validation_cache.get(self.get_cache_key(
+                                            server, atf_text, atf_basename,
+                                            project, command))
+                if results:
+                    break
+            if results:
+                self.logger.debug("Using the results the ORACC server sent "
+                                  "last time for this unchanged file.")
+                self.show_command_results(results, delta, selection,
+                                          line_map, full_text,
+                                          delta_context(server))
+                return
 
-        # Send request and check for returned process ID
-        client.create_request(command=command,
-                              keys=[project, '00atf/' + atf_basename],
-                              atf_basename=atf_basename,
-                              atf_text=nammu_text.encode('utf-8'))
+        # Send the command to the fastest server, or the next ones if it
+        # fails, in the background so the UI isn't blocked while waiting
+        def attempt(server, settings):
+            client = SOAPClient(settings['url'], settings['port'],
+                                settings['dir'], method='POST')
+            return self.run_server_command(client, command, project,
+                                           atf_basename, atf_text)
 
-        try:
-            self.send_request(client)
-        except RequestException as re:
-            self.logger.error(
-                        "Error when trying to send first HTTP POST request.")
-            self.logger.debug(str(re))
-            return
-        except Exception as e:
-            self.logger.debug(str(e))
-            return
-        server_id = client.get_response_id()
+        def run():
+            try:
+                server, results = self.server_pool.run(attempt)
+            except Exception as e:
+                runSwingLater(failed, e)
+                return
+            self.logger.debug("Results received from ORACC server %s.",
+                              server)
+            if self.validation_cache:
+                self.validation_cache.put(self.get_cache_key(
+                                                server, atf_text,
+                                                atf_basename, project,
+                                                command),
+                                          *results)
+            runSwingLater(done, server, results)
+
+        def is_current():
+            # Results of a command sent before the last one, or for another
+            # file or an edited text, no longer apply
+            return (revision == self.command_revision and
+                    filename == self.currentFilename and
+                    full_text == self._getAtfText(command != "lem" and
+                                                  self.arabic_edition_on))
+
+        def done(server, results):
+            if is_current():
+                self.show_command_results(results, delta, selection,
+                                          line_map, full_text,
+                                          delta_context(server))
+            elif revision == self.command_revision:
+                self.logger.info("Received the results from the ORACC "
+                                 "server, but the file has changed since. "
+                                 "Please try again.")
+
+        def failed(error):
+            if revision != self.command_revision:
+                return
+            self.logger.error("Couldn't get a response from any ORACC "
+                              "server. %s", error)
+            if self.job_queue and not selection:
+                # Send the whole text later, delta validation doesn't know
+                # what will have changed by then
+                self.job_queue.add(command, project, filename, full_text)
+                self.logger.info("The request has been queued and will be "
+                                 "sent again when a server can be reached. "
+                                 "You can keep editing in the meantime.")
+
+        self.command_thread = threading.Thread(target=run,
+                                               name="ServerCommand")
+        self.command_thread.setDaemon(True)
+        self.command_thread.start()
+
+    def show_command_results(self, results, delta, selection, line_map,
+                             full_text, delta_context=None):
+        '''
+        Errors are reported with the line numbers of the text sent, so map
+        them back to the whole text before showing them. Lemmatised texts of
+        a selection are put back in place of the ones sent. `delta_context`
+        says which server the results came from.
+        '''
+        oracc_log, request_log, autolem = results
+        if delta:
+            oracc_log = delta.update(oracc_log, delta_context)
+        elif selection:
+            oracc_log = remap_log_lines(oracc_log, line_map)[0]
+            if autolem:
+                autolem = self.splice_fragments(full_text, selection[1],
+                                                autolem.decode('utf-8'))
+        self.process_server_response(oracc_log, request_log, autolem)
 
-        # Wait for server to prepare response
-        self.logger.debug("Request sent OK with ID %s", server_id)
-        self.logger.debug("Waiting for ORACC server to prepare response...")
-        try:
-            self.wait_for_response(client, server_id)
-        except RequestException as re:
-            self.logger.error("Error when trying to send HTTP GET request.")
-            self.logger.debug(str(re))
-            return
-        except Exception as e:
-            self.logger.error("Server error.")
-            self.logger.debug(str(e))
+    def splice_fragments(self, text, fragments, lemmatised):
+        '''
+        Returns `text` with each of the given fragments replaced with its
+        lemmatised version, encoded like the server's, or None if the
+        lemmatised text doesn't have the same fragments.
+        '''
+        new_fragments = split_fragments(lemmatised.replace('\r\n', '\n'))[1]
+        if len(new_fragments) != len(fragments):
+            self.logger.error("The lemmatised texts returned by the server "
+                              "don't match the ones sent.")
+            return None
+        replacements = dict((line_num, new_fragment) for (line_num, fragment),
+                            (new_line_num, new_fragment)
+                            in zip(fragments, new_fragments))
+        preamble, all_fragments = split_fragments(text)
+        pieces = [preamble]
+        for index, (line_num, fragment) in enumerate(all_fragments):
+            fragment = replacements.get(line_num, fragment)
+            if index < len(all_fragments) - 1 and not fragment.endswith('\n'):
+                fragment += u'\n'
+            pieces.append(fragment)
+        return u''.join(pieces).encode('utf-8')
+
+    def get_cache_key(self, server, atf_text, atf_basename, project,
+                      command):
+        url = self.server_pool.servers[server]['url']
+        return ValidationCache.get_key(atf_text, atf_basename, project,
+                                       command, url)
+
+    def start_server_pool(self):
+        '''
+        (Re)create the pool of servers from the settings and start measuring
+        them in the background.
+        '''
+        if self.server_pool:
+            self.server_pool.stop()
+        self.server_pool = ServerPool.from_config(self.config)
+        self.server_pool.listeners.append(self.server_reachable)
+        self.server_pool.start()
+
+    def server_reachable(self, server):
+        if getattr(self, 'job_queue', None) and len(self.job_queue):
+            self.logger.debug("ORACC server %s is reachable, sending queued "
+                              "requests.", server)
+            self.job_queue.wake()
+
+    def run_job(self, job):
+        '''
+        Send a queued request. Called from the job queue's worker threads.
+        '''
+        atf_basename = os.path.basename(job['filename']).replace(' ', '')
+        atf_text = job['text'].encode('utf-8')
+
+        def attempt(server, settings):
+            client = SOAPClient(settings['url'], settings['port'],
+                                settings['dir'], method='POST')
+            return self.run_server_command(client, job['command'],
+                                           job['project'], atf_basename,
+                                           atf_text)
+        server, results = self.server_pool.run(attempt)
+        if self.validation_cache:
+            self.validation_cache.put(self.get_cache_key(server, atf_text,
+                                                         atf_basename,
+                                                         job['project'],
+                                                         job['command']),
+                                      *results)
+        return results
+
+    def job_done(self, job, results):
+        runSwingLater(self.show_job_results, job, results)
+
+    def job_failed(self, job, error):
+        runSwingLater(self.logger.error,
+                      "Gave up sending the queued request for %s after %d "
+                      "attempts: %s", job['filename'], job['attempts'], error)
+
+    def show_job_results(self, job, results):
+        '''
+        Show the results of a queued request if its file is open and hasn't
+        changed since, otherwise only print them in the console.
+        '''
+        oracc_log, request_log, autolem = results
+        action = ("lemmatisation" if job['command'] == "lem"
+                  else "validation")
+        current_text = self._getAtfText(job['command'] != "lem" and
+                                        self.arabic_edition_on)
+        if (job['filename'] == self.currentFilename and
+                JobQueue.get_revision(current_text) == job['revision']):
+            self.consoleController.clearConsole()
+            self.atfAreaController.clearToolTips()
+            self.logger.info("Received the results of the queued %s.", action)
+            self.process_server_response(oracc_log, request_log, autolem)
             return
+        if job['filename'] == self.currentFilename:
+            self.logger.info("Received the results of the queued %s, but the "
+                             "file has changed since.", action)
+        else:
+            self.logger.info("Received the results of the queued %s of %s.",
+                             action, job['filename'])
+        for line in (oracc_log or '').splitlines():
+            self.logger.info(line)
+        if autolem:
+            self.logger.info("Lemmatise again to get the lemmatised text.")
+        elif not oracc_log:
+            self.logger.info("The validation returned no errors.")
+
+    def showServerStats(self, event=None):
+        '''
+        Print the health and latency of each ORACC server in the console.
+        '''
+        self.consoleController.clearConsole()
+        self.logger.info("ORACC servers, from the one that will be used "
+                         "first:")
+        for line in self.server_pool.get_summary():
+            self.logger.info(line)
 
-        # Send new request to fetch results and server logs
-        # TODO: This shouldn't need a new client, but a new request inside the
-        #       same client
-        # client = SOAPClient(url, port, url_dir, method='POST')
-        self.logger.debug("Fetching response... ")
-        client.create_request(keys=[server_id])
+    def run_server_command(self, client, command, project, atf_basename,
+                           atf_text):
+        '''
+        Send the command to the client's server, wait for it to be processed
+        and fetch the results. Returns the server logs and lemmatised file,
+        or raises an exception with a message for the user if any step fails.
+        This runs in the server pool's threads, possibly at the same time on
+        several servers, so it only logs at debug level. The caller reports
+        the outcome once it has the results or all servers have failed.
+        '''
         try:
-            self.send_request(client)
-        except RequestException as re:
-            self.logger.error("Error when trying to send last HTTP POST "
-                              "request.")
-            self.logger.exception(str(re))
-            return
+            return client.run_command(command, project, atf_basename,
+                                      atf_text)
+        except (Timeout, ConnectTimeout) as e:
+            self.logger.debug(str(e))
+            raise Exception("ORACC server {} timed out.".format(client.url))
+        except ConnectionError as e:
+            self.logger.debug(str(e))
+            raise Exception("Can't connect to ORACC server at "
+                            "{}.".format(client.url))
+        except HTTPError as e:
+            self.logger.debug(str(e))
+            raise Exception("ORACC server {} returned invalid HTTP "
+                            "response.".format(client.url))
+        except IndexError as e:
+            self.logger.debug(str(e))
+            raise Exception("Couldn't get server logs from ORACC server "
+                            "{}.".format(client.url))
         except Exception as e:
-            self.logger.error("Server error.")
             self.logger.debug(str(e))
-            return
-
-        # Retrieve server logs and lemmatised file from server SOAP response
-        self.logger.debug("Reading response sent by ORACC server... ")
-        try:
-            oracc_log, request_log, autolem = client.get_server_logs()
-        except IndexError:
-            self.logger.error("Couldn't get server logs.")
-            return
-        self.process_server_response(oracc_log, request_log, autolem)
+            if "UnknownServerError" in e.args:
+                raise Exception("ORACC server {} seems down. Contact server "
+                                "admin.".format(client.url))
+            raise
 
     def process_server_response(self, oracc_log, request_log, autolem):
         """
@@ -684,97 +1003,31 @@ class NammuController(object):
         else:
             self.logger.info("The validation returned no errors.")
             if autolem:
-                self.atfAreaController.setAtfAreaText(autolem.decode('utf-8'))
+                # Only the lines that changed are replaced, so caret, scroll
+                # and undo history stay in place
+                self.atfAreaController.merge_text(autolem.decode('utf-8'))
                 self.logger.info("Lemmatised ATF received from ORACC server.")
 
         # Always syntax highlight, not only when there are errors, otherwise
         # old error lines' styling won't be cleared!
         runSwingLater(self.initHighlighting)
 
-    def send_request(self, client):
-        """
-        Tries to send HTTP POST request to ORACC server and raise problems.
-        TODO: When we have proper logging it'd be nice to move this to the
-        SOAPClient.
-        # TODO: Prompt dialog when exception occurs.
-        """
-        try:
-            client.send()
-        except (Timeout, ConnectTimeout):
-            self.logger.error('ORACC %s server timed out after 5 seconds.',
-                              client.url)
-            self.logger.error('You can try with a different server from the '
-                              'settings menu.')
-            raise Exception('Connection to server {} timed '
-                            'out.'.format(client.url))
-        except ConnectionError:
-            raise Exception("Can't connect to ORACC server at %s.",
-                            client.url)
-        except HTTPError:
-            raise Exception("ORACC server returned invalid HTTP response.")
-
-    def wait_for_response(self, client, server_id):
-        """
-        Tries to send HTTP GET request to ORACC server and raise problems.
-        TODO: When we have proper logging it'd be nice to move this to the
-        SOAPClient.
-        # TODO: Prompt dialog when exception occurs.
-        """
-        try:
-            client.wait_for_response(server_id)
-        except Timeout:
-            self.logger.error("ORACC server timed out after 5 seconds.")
-            raise
-        except ConnectionError:
-            self.logger.error("Can't connect to ORACC server at %s.",
-                              client.url)
-            raise
-        except HTTPError:
-            self.logger.error("ORACC server returned invalid HTTP response.")
-            raise
-        except Exception as e:
-            if e.args == "UnknownServerError":
-                self.logger.error(
-                            "ORACC server seems down. Contact server admin.")
-                raise
-            else:
-                self.logger.error("Unexpected error when waiting for ORACC "
-                                  "server to prepare response.")
-
     def process_validation_errors(self, oracc_log):
         """
         Reads the log from the oracc server from the validation, and refreshes
         the dictionary with line numbers and error messages.
         """
-        validation_errors = {}
-        for line in oracc_log.splitlines():
-            if ':' in line:
-                try:
-                    server_filename = line.split(':')[0]
-                    line_number = line.split(':')[1]
-                    project_id = line.split(':')[2]
-                    error_message = line.split(project_id + ':')[1]
-                except IndexError:
-                    continue
-
-                if line_number not in validation_errors.keys():
-                    validation_errors[line_number] = ''
-
-                formatted_err = ('<a href={0}>{1}:{0}</a>:{2}:{3}'
-                                 .format(line_number,
-                                         server_filename,
-                                         project_id,
-                                         error_message))
-                validation_errors[line_number] += formatted_err
-                self.logger.info(formatted_err)
-            else:
-                summary_line = line
+        self.validation_report = ValidationReport.parse(oracc_log)
+        for error in self.validation_report:
+            self.logger.info(error.to_html())
 
         # Finally, write the servers summary line to the logger
-        self.logger.info(summary_line)
+        if self.validation_report.summary:
+            self.logger.info(self.validation_report.summary)
 
         # Refresh validation errors
-        self.atfAreaController.set_validation_errors(validation_errors)
+        self.atfAreaController.set_validation_errors(
+                                    self.validation_report.get_tooltips())
 
     def launchWelcomeScreen(self):
         '''
@@ -803,34 +1056,66 @@ class NammuController(object):
         '''
         1. Check if a file is opened or not
         2. Check if file is valid before trying to display model view
-        3. Send text to model view controller and delegate
+        3. Parse text in the background and send the parsed object to the
+           model view controller
         '''
         atfText = self.atfAreaController.getAtfAreaText()
         if self.currentFilename or atfText:
             # TODO Check if ATF is valid
-            # This may imply parsing the text, so perhaps the model controller
-            # can just receive the parsed object instead of the text
-            self.modelController = ModelController(self, self.parse(atfText))
+            thread = threading.Thread(target=self._parseForModelView,
+                                      args=(atfText,))
+            thread.setDaemon(True)
+            thread.start()
         else:
             self.promptInfoPane(
                         "Open ATF file before trying to display model view.")
 
+    def _parseForModelView(self, atfText):
+        '''
+        Runs in a background thread so the parsing doesn't block the UI.
+        Syntax errors are reported and the parse cache is updated from the
+        event dispatch thread.
+        '''
+        try:
+            parsed = AtfFile(atfText)
+        except SyntaxError as e:
+            parsed = None
+            runSwingLater(self.report_syntax_error, e)
+        runSwingLater(self._showModelView, parsed, atfText)
+
+    def _showModelView(self, parsed, atfText):
+        if parsed:
+            self.parse_cache = (atfText, parsed)
+        if self.modelController:
+            self.modelController.close()
+        self.modelController = ModelController(self, parsed, atfText)
+
     def parse(self, text, event=None):
         '''
         Parse input string, could be just a line or a whole file content.
+        The last text parsed successfully is cached, since the same text is
+        often parsed several times in a row (e.g. to get the project and the
+        language before validating).
         '''
+        cache = self.parse_cache
+        if cache and cache[0] == text:
+            return cache[1]
         try:
             parsed = AtfFile(text)
         except SyntaxError as e:
-            self.logger.error("There is a syntax error near character '{}' "
-                              "in line {} and position {}".format(
-                                                        e.text.strip('\n'),
-                                                        e.lineno,
-                                                        e.offset + 1)
-                              )
+            self.report_syntax_error(e)
         else:
+            self.parse_cache = (text, parsed)
             return parsed
 
+    def report_syntax_error(self, error):
+        self.logger.error("There is a syntax error near character '{}' "
+                          "in line {} and position {}".format(
+                                                    error.text.strip('\n'),
+                                                    error.lineno,
+                                                    error.offset + 1)
+                          )
+
     def arabic(self, event=None, force=False):
         '''
         Create bool for arabic, change value when clicked.
@@ -852,11 +1137,12 @@ class NammuController(object):
             if self.handleUnsaved():
                 if self.arabic_edition_on:
                     # revert back to single pane
-                    joined = self.atfAreaController.concatenate_arabic_text()
-                    if self.atfAreaController.findArabic(joined):
+                    if self.atfAreaController.has_arabic_translation():
                         self.logger.info("Cannot disable Arabic translation"
                                          " mode, Arabic translation detected")
                     else:
+                        joined = (self.atfAreaController
+                                      .concatenate_arabic_text())
                         self.atfAreaController.view.toggle_split()
                         self.arabic_edition_on = False
                         self.atfAreaController.edit_area.setText(joined)
@@ -1040,6 +1326,29 @@ class NammuController(object):
         '''
         if self.find_controller:
             if not self.find_controller.view.isShowing():
+                # Stop following text changes for a dismissed search
+                self.find_controller.close()
                 self.find_controller = FindController(self)
         else:
             self.find_controller = FindController(self)
+
+    def findInFiles(self, event=None):
+        '''
+        Find in files functionality:
+        * Displays find in files window with options
+        * Searches all ATF files in the working directory
+        * Opens files at the line of the chosen result
+        '''
+        if (not self.find_in_files_controller or
+                not self.find_in_files_controller.view.isShowing()):
+            self.find_in_files_controller = FindInFilesController(self)
+
+    def searchCorpus(self, event=None):
+        '''
+        Displays the corpus search window, to look up where lemmas, signs,
+        words, line labels or texts appear in the ATF files of the working
+        directory.
+        '''
+        if (not self.corpus_search_controller or
+                not self.corpus_search_controller.view.isShowing()):
+            self.corpus_search_controller = CorpusSearchController(self)
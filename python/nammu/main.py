@@ -17,15 +17,23 @@ You should have received a copy of the GNU General Public License
 along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
-from controller.NammuController import NammuController
+import sys
 
 
-def main():
+def main(args=None):
     '''
     This is the Python entry point invoked from Java's entry point.
+    When given command line arguments, Nammu runs the headless command line
+    interface instead of opening its window, and returns its exit status.
+    The GUI is only imported when needed, so the command line interface
+    starts without loading any Swing code.
     '''
+    if args:
+        from cli import main as cli_main
+        return cli_main(args)
+    from controller.NammuController import NammuController
     NammuController()
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main(sys.argv[1:]))
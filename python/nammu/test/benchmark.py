@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import argparse
+import codecs
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+'''
+Benchmarks of the editor hot paths on synthetic ATF files of increasing size,
+with and without an Arabic translation block. It needs a display, like the
+tests in test_nammu.py, and is run from the repository root with:
+
+    jython -m nammu.test.benchmark --sizes 1000,10000 --output results.json
+
+Timings are in seconds. Results from different versions can be compared
+with --compare old_results.json.
+'''
+
+default_sizes = [1000, 10000, 50000, 200000]
+
+# Lines of each synthetic text after its header
+text_lines = [u"@obverse",
+              u"1. a-na {d}UTU be-li2-ia",
+              u"#lem: ana[to]PRP; Šamaš[1]DN; bēlu[lord]N",
+              u"2. ARAD-ka {m}ba-ia#-a",
+              u"#lem: ardu[servant]N; Bayâ[1]PN",
+              u"3. 1(diš) me 6(u)# ANŠE ŠE.PAD-MEŠ",
+              u"#lem: n; mē[(one) hundred]NU; n; imāru[donkey]N; X",
+              u"4. TA IGI {m}u2-din#-ni",
+              u"#lem: issu[from]PRP; pān[front]N; Udīnu[1]PN",
+              u"@reverse",
+              u"1'. [x x] x# KUR-ia",
+              u"#lem: u; u; u; mātu[land]N",
+              u"$ rest broken",
+              u""]
+
+arabic_lines = [u"@obverse",
+                u"1. إلى شمش سيدي",
+                u"2. عبدك باياء",
+                u"3. ١٦٠ حمار من الشعير",
+                u"4. من عند أوديني",
+                u""]
+
+
+def synthetic_atf(no_of_lines, arabic=False):
+    '''
+    Returns an ATF text with roughly the given number of lines, made of
+    as many texts as needed. If `arabic` is True, a tenth of the lines are
+    an Arabic translation block at the end.
+    '''
+    body_lines = no_of_lines * 9 // 10 if arabic else no_of_lines
+    lines = []
+    text_no = 0
+    while len(lines) < body_lines:
+        text_no += 1
+        lines.extend([u"&X{:06d} = Synthetic text {}".format(text_no,
+                                                             text_no),
+                      u"#project: cams/gkab",
+                      u"#atf: lang akk-x-stdbab",
+                      u"#atf: use unicode",
+                      u"@tablet"])
+        lines.extend(text_lines)
+    if arabic:
+        lines.append(u"@translation parallel ar project")
+        while len(lines) < no_of_lines:
+            lines.extend(arabic_lines)
+    return u'\n'.join(lines) + u'\n'
+
+
+def timed(function, *args):
+    start_time = time.time()
+    function(*args)
+    return time.time() - start_time
+
+
+def summary(timings):
+    '''
+    Summarise repeated measurements with their median and maximum.
+    '''
+    timings = sorted(timings)
+    return {'median': timings[len(timings) // 2], 'max': timings[-1],
+            'runs': len(timings)}
+
+
+class Benchmark(object):
+    '''
+    Runs each benchmark on a NammuController, calling the same methods the
+    Swing listeners call.
+    '''
+    def __init__(self, nammu, repeat):
+        self.nammu = nammu
+        self.controller = nammu.atfAreaController
+        self.repeat = repeat
+
+    def run(self, filename):
+        results = {}
+        nammu = self.nammu
+        results['open'] = timed(nammu.loadFile, filename)
+        results['first_highlight'] = timed(nammu.initHighlighting)
+        results['keystroke'] = self.keystroke()
+        results['scroll'] = self.scroll()
+        results['find_all'], results['replace_all'] = self.find_replace()
+        results['error_remap'] = self.error_remap()
+        results['tooltip'] = self.tooltip()
+        path = filename + '.saved'
+        results['save'] = timed(nammu.writeTextFile, path,
+                                nammu._getAtfText(nammu.arabic_edition_on))
+        os.remove(path)
+        return results
+
+    def keystroke(self):
+        '''
+        Type characters in the middle of the text on screen and highlight it
+        again, like the key listener does on key release.
+        '''
+        doc = self.controller.edit_area_styledoc
+        timings = []
+        for i in range(self.repeat):
+            top, bottom = self.controller.view.get_viewport_ranges()[0]
+            start_time = time.time()
+            doc.insertString((top + bottom) // 2, u"a", None)
+            self.controller.highlight_viewports()
+            timings.append(time.time() - start_time)
+        return summary(timings)
+
+    def scroll(self):
+        '''
+        Jump to evenly spaced lines and highlight the text on screen, like
+        the scroll listener does.
+        '''
+        area = self.controller.edit_area
+        root = self.controller.edit_area_styledoc.getDefaultRootElement()
+        lines = root.getElementCount()
+        timings = []
+        for i in range(self.repeat):
+            line = root.getElement(lines * i // self.repeat)
+            rect = area.modelToView(line.getStartOffset())
+            if rect is None:
+                continue
+            start_time = time.time()
+            area.scrollRectToVisible(rect)
+            self.controller.highlight_viewports()
+            timings.append(time.time() - start_time)
+        return summary(timings) if timings else None
+
+    def find_replace(self):
+        '''
+        Highlight all the matches of a common sign and replace them all, then
+        undo the replacement.
+        '''
+        # Imported here so this module can be imported without Swing
+        from ..controller.FindController import FindController
+        find_controller = FindController(self.nammu)
+        try:
+            find_all = timed(find_controller.find_next, u"IGI", False, False,
+                             False, True)
+            replace_all = timed(find_controller.replace_all, u"IGI",
+                                u"igi", False, False, False)
+            self.controller.undo()
+        finally:
+            find_controller.view.done(None)
+        return find_all, replace_all
+
+    def error_remap(self):
+        '''
+        Mark every tenth line as having a validation error and insert and
+        remove lines at the top, so all the error lines have to move.
+        '''
+        doc = self.controller.edit_area_styledoc
+        lines = doc.getDefaultRootElement().getElementCount()
+        self.controller.set_validation_errors(
+                        dict((str(line), u'error') for line
+                             in range(1, lines + 1, 10)))
+        timings = []
+        for i in range(self.repeat):
+            start_time = time.time()
+            doc.insertString(0, u"\n", None)
+            timings.append(time.time() - start_time)
+            self.controller.view.oldtext = self.controller.getAtfAreaText()
+            doc.remove(0, 1)
+        self.controller.set_validation_errors({})
+        return summary(timings)
+
+    def tooltip(self):
+        '''
+        Hover over the last lines of the text with every line marked as having
+        a validation error, like the tooltip manager does on mouse movement.
+        '''
+        from java.awt.event import MouseEvent
+        area = self.controller.edit_area
+        root = self.controller.edit_area_styledoc.getDefaultRootElement()
+        lines = root.getElementCount()
+        self.controller.set_validation_errors(
+                        dict((str(line), u'error') for line
+                             in range(1, lines + 1)))
+        timings = []
+        for i in range(self.repeat):
+            line = root.getElement(max(lines - 1 - i, 0))
+            rect = area.modelToView(line.getStartOffset())
+            if rect is None:
+                continue
+            event = MouseEvent(area, MouseEvent.MOUSE_MOVED, 0, 0, rect.x,
+                               rect.y, 0, False)
+            timings.append(timed(area.getToolTipText, event))
+        self.controller.set_validation_errors({})
+        return summary(timings) if timings else None
+
+
+def compare(results, old_results):
+    '''
+    Print the ratio between the new and the old timings of each benchmark.
+    '''
+    for name, timings in sorted(results['files'].items()):
+        old_timings = old_results['files'].get(name)
+        if not old_timings:
+            continue
+        for key, value in sorted(timings.items()):
+            old_value = old_timings.get(key)
+            if isinstance(value, dict) and isinstance(old_value, dict):
+                value, old_value = value['median'], old_value['median']
+            if value and old_value:
+                print "{} {}: {:.4f}s (was {:.4f}s, x{:.2f})".format(
+                        name, key, value, old_value, value / old_value)
+
+
+def get_version():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always',
+                                        '--dirty']).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+                description="Benchmark Nammu's editor on synthetic ATF files.")
+    parser.add_argument('--sizes',
+                        default=','.join(str(size) for size in default_sizes),
+                        help='comma separated numbers of lines')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='runs of the repeated benchmarks')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', help='earlier results to compare with')
+    args = parser.parse_args()
+
+    # Imported here so the synthetic files can be generated without Swing
+    from ..controller.NammuController import NammuController
+    nammu = NammuController()
+    nammu.handleUnsaved = lambda: True
+    benchmark = Benchmark(nammu, args.repeat)
+    results = {'version': get_version(),
+               'platform': platform.platform(),
+               'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'files': {}}
+    directory = tempfile.mkdtemp()
+    try:
+        for size in [int(size) for size in args.sizes.split(',')]:
+            for arabic in (False, True):
+                name = '{}{}'.format(size, '_arabic' if arabic else '')
+                filename = os.path.join(directory, name + '.atf')
+                with codecs.open(filename, 'w', 'utf-8') as atf_file:
+                    atf_file.write(synthetic_atf(size, arabic))
+                results['files'][name] = benchmark.run(filename)
+                print name, json.dumps(results['files'][name], sort_keys=True)
+    finally:
+        shutil.rmtree(directory)
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as old_output:
+            compare(results, json.load(old_output))
+    nammu.view.dispose()
+
+
+if __name__ == '__main__':
+    main()
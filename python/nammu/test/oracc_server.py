@@ -0,0 +1,299 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import argparse
+import random
+import re
+import string
+import threading
+import time
+import zipfile
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from cStringIO import StringIO
+
+'''
+Local stand-in for the ORACC SOAP server, speaking the same submit, status
+poll and fetch protocol as HTTPRequest and SOAPClient, so the validation
+pipeline can be tested and load tested offline.
+It can also be run on its own, e.g.:
+
+    jython -m nammu.test.oracc_server --port 8085 --latency 0.2
+'''
+
+keys_re = re.compile(r'<osc-data:key>(.*?)</osc-data:key>')
+boundary_re = re.compile(r'boundary="?([^";]+)"?')
+
+response_envelope = """<?xml version="1.0" encoding="UTF-8"?>
+<SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope" \
+xmlns:osc-data="http://oracc.org/wsdl/ows.xsd" \
+xmlns:osc-meth="http://oracc.org/wsdl/ows.wsdl">
+<SOAP-ENV:Body>
+<osc-meth:{type}>
+<osc-data:keys><osc-data:key>{key}</osc-data:key></osc-data:keys>
+</osc-meth:{type}>
+</SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+response_boundary = '==========response========'
+
+
+class OraccServer(ThreadingMixIn, HTTPServer):
+    '''
+    Threaded HTTP server holding the submitted jobs.
+    * latency: seconds to wait before answering each request.
+    * processing_time: seconds a job stays in "run" state after submission.
+    * failure_rate: probability of answering a POST with an HTTP 500 error.
+    * error_rate: probability of a status poll answering "err_stat".
+    * response_size: bytes of padding added to request.log in the results,
+      to emulate big responses.
+    * error_pattern: lines of the ATF text containing this string are
+      reported as validation errors.
+    '''
+    daemon_threads = True
+
+    def __init__(self, port=0, url_dir='p', latency=0, processing_time=0,
+                 failure_rate=0, error_rate=0, response_size=0,
+                 error_pattern=None, seed=None):
+        HTTPServer.__init__(self, ('127.0.0.1', port), OraccRequestHandler)
+        self.port = self.server_address[1]
+        self.url_dir = url_dir
+        self.latency = latency
+        self.processing_time = processing_time
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.response_size = response_size
+        self.error_pattern = error_pattern
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.counts = {'submit': 0, 'status': 0, 'fetch': 0, 'failed': 0}
+        self.thread = None
+
+    def start(self):
+        '''
+        Serve requests in a background thread.
+        '''
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, kind):
+        with self.lock:
+            self.counts[kind] += 1
+
+    def should_fail(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def add_job(self, command, keys, atf_basename, atf_text):
+        with self.lock:
+            job_id = ''.join(self.random.choice(string.ascii_letters)
+                             for i in range(6))
+            self.jobs[job_id] = {'command': command,
+                                 'keys': keys,
+                                 'atf_basename': atf_basename,
+                                 'atf_text': atf_text,
+                                 'ready': time.time() + self.processing_time}
+        return job_id
+
+    def get_job(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def build_results(self, job):
+        '''
+        Returns the zip the ORACC server sends back with oracc.log,
+        request.log and, when lemmatising, the lemmatised ATF.
+        '''
+        project = job['keys'][0] if job['keys'] else ''
+        path = '00atf/' + job['atf_basename']
+        lines = job['atf_text'].replace('\r\n', '\n').split('\n')
+        errors = []
+        if self.error_pattern:
+            errors = ['{}:{}:{}: unknown sign or word: {}'.format(
+                                                    path, line_num, project,
+                                                    self.error_pattern)
+                      for line_num, line in enumerate(lines, start=1)
+                      if self.error_pattern in line]
+        if errors:
+            errors.append('ATF processor ox issued {} errors'.format(
+                                                                len(errors)))
+        files = {'oracc.log': '\n'.join(errors),
+                 'request.log': 'Processing {} for {}\r\n'.format(
+                                                                path,
+                                                                project)}
+        if job['command'] == 'lem' and not errors:
+            name = job['atf_basename'].rsplit('.', 1)[0] + '_autolem.atf'
+            files['00atf/' + name] = self.lemmatise(lines)
+        padding = ''.join(self.random.choice(string.ascii_letters)
+                          for i in range(self.response_size))
+        # The logs use Windows line endings and the zip is stored without
+        # compression, so the attachment holds "\r\n" like real results
+        # often do
+        data = StringIO()
+        zip_file = zipfile.ZipFile(data, 'w', zipfile.ZIP_STORED)
+        for name, content in sorted(files.items()):
+            if name == 'request.log':
+                content += padding
+            zip_file.writestr(name, content)
+        zip_file.close()
+        return data.getvalue()
+
+    def lemmatise(self, lines):
+        '''
+        Add an unknown lemma ("X") for each word of the text lines that
+        aren't lemmatised yet.
+        '''
+        lemmatised = []
+        for index, line in enumerate(lines):
+            lemmatised.append(line)
+            label = re.match(r'\S+\.\s', line)
+            following = lines[index + 1] if index + 1 < len(lines) else ''
+            if label and not following.startswith('#lem:'):
+                words = line[label.end():].split()
+                lemmatised.append('#lem: ' + '; '.join('X' for w in words))
+        return '\n'.join(lemmatised)
+
+
+class OraccRequestHandler(BaseHTTPRequestHandler):
+    '''
+    POST requests with a Request envelope submit a job and get its id back,
+    GET requests to /<url_dir>/<id> poll its status, and POST requests with
+    a Response envelope fetch its results.
+    '''
+    protocol_version = 'HTTP/1.0'
+
+    def log_message(self, format, *args):
+        # Keep test output clean
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.getheader('Content-Length') or 0)
+        body = self.rfile.read(length)
+        time.sleep(self.server.latency)
+        if self.server.should_fail(self.server.failure_rate):
+            self.server.count('failed')
+            self.send_text(500, 'text/plain', 'Internal Server Error\n')
+            return
+        keys = keys_re.findall(body)
+        if '<osc-meth:Request>' in body:
+            self.submit(body, keys)
+        else:
+            self.fetch(keys)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        self.server.count('status')
+        job_id = self.path.rstrip('/').rsplit('/', 1)[-1]
+        job = self.server.get_job(job_id)
+        if (job is None or
+                self.server.should_fail(self.server.error_rate)):
+            status = 'err_stat\n'
+        elif time.time() < job['ready']:
+            status = 'run\n'
+        else:
+            status = 'done\n'
+        self.send_text(200, 'text/plain', status)
+
+    def submit(self, body, keys):
+        self.server.count('submit')
+        match = boundary_re.search(self.headers.getheader('Content-Type', ''))
+        start = body.find('\r\n\r\nPK')
+        if len(keys) < 3 or not match or start < 0:
+            self.send_text(400, 'text/plain', 'Bad request\n')
+            return
+        end = body.rfind('\r\n--' + match.group(1))
+        zip_file = zipfile.ZipFile(StringIO(body[start + 4:end]))
+        atf_path = zip_file.namelist()[0]
+        job_id = self.server.add_job(keys[0], keys[1:],
+                                     atf_path.split('/', 1)[-1],
+                                     zip_file.read(atf_path))
+        self.send_text(200, 'application/soap+xml',
+                       response_envelope.format(type='RequestResponse',
+                                                key=job_id))
+
+    def fetch(self, keys):
+        self.server.count('fetch')
+        job = self.server.get_job(keys[0]) if keys else None
+        if job is None:
+            self.send_text(404, 'text/plain', 'Unknown request\n')
+            return
+        envelope = response_envelope.format(type='ResponseResponse',
+                                            key=keys[0])
+        results = self.server.build_results(job)
+        boundary = '--' + response_boundary
+        body = '\r\n'.join([
+                    boundary,
+                    'Content-Type: application/xop+xml; charset=utf-8; '
+                    'type="application/soap+xml"',
+                    'Content-Transfer-Encoding: binary',
+                    'Content-ID: <SOAP-ENV:Envelope>',
+                    '',
+                    envelope,
+                    boundary,
+                    'Content-Type: */*',
+                    'Content-Transfer-Encoding: binary',
+                    'Content-ID: <response_zip>',
+                    '',
+                    results,
+                    boundary + '--',
+                    ''])
+        self.send_text(200,
+                       'multipart/related; type="application/xop+xml"; '
+                       'start="<SOAP-ENV:Envelope>"; '
+                       'boundary="{}"'.format(response_boundary),
+                       body)
+
+    def send_text(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+                        description='Local stand-in for the ORACC server.')
+    parser.add_argument('--port', type=int, default=8085)
+    parser.add_argument('--dir', default='p')
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--processing-time', type=float, default=0)
+    parser.add_argument('--failure-rate', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--response-size', type=int, default=0)
+    parser.add_argument('--error-pattern')
+    args = parser.parse_args()
+    server = OraccServer(args.port, args.dir, args.latency,
+                         args.processing_time, args.failure_rate,
+                         args.error_rate, args.response_size,
+                         args.error_pattern)
+    print "Serving ORACC stand-in on port {}".format(server.port)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
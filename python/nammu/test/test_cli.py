@@ -0,0 +1,47 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import json
+
+from ..cli import main, parse_oracc_log
+
+
+def test_cli_stats_and_parse(capsys):
+    """
+    Check that the command line interface prints one JSON line per file.
+    """
+    filename = 'resources/test/english.atf'
+    assert main(['stats', filename]) == 0
+    result = json.loads(capsys.readouterr()[0])
+    assert result['file'] == filename
+    assert result['stats']['text'] == {'distinct': 1, 'lines': 1}
+    assert main(['parse', filename, 'resources/test/missing.atf']) == 1
+    lines = capsys.readouterr()[0].splitlines()
+    assert [json.loads(line)['ok'] for line in lines] == [True, False]
+    assert json.loads(lines[0])['texts'][0]['project'] == 'ztcc'
+
+
+def test_parse_oracc_log():
+    errors, summary = parse_oracc_log(
+                        "00atf/hyphens.atf:6:cams/gkab: unknown sign: x\n"
+                        "ATF processor ox issued 1 warning and 0 errors\n")
+    assert errors == [{'filename': '00atf/hyphens.atf', 'line': 6,
+                       'project': 'cams/gkab', 'message': 'unknown sign: x',
+                       'severity': 'error'}]
+    assert summary.startswith("ATF processor")
@@ -0,0 +1,46 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import shutil
+
+from ..utils.CorpusIndex import CorpusIndex
+
+
+def test_corpus_index_incremental(monkeypatch, tmpdir):
+    """
+    Check that lemmas and line labels can be looked up in the index, that it
+    is loaded back from disk and that unchanged files are not lexed again.
+    """
+    monkeypatch.setitem(os.environ, 'NAMMU_CONFIG_PATH',
+                        str(tmpdir.mkdir('config')))
+    corpus = tmpdir.mkdir('corpus')
+    shutil.copy('resources/test/english.atf', str(corpus))
+    index = CorpusIndex(str(corpus))
+    files, lexed = index.update()
+    assert lexed == 1
+    index.replace(files, index.invert(files))
+    index.save(files)
+    assert index.lookup('1.', 'label') == []
+    assert index.lookup('1', 'label')
+
+    index = CorpusIndex(str(corpus))
+    assert index.lookup('1', 'label')
+    files, lexed = index.update()
+    assert lexed == 0
@@ -0,0 +1,100 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from ..utils import select_fragments
+from ..utils.FragmentDelta import FragmentDelta, join_pieces, remap_log_lines
+
+text = (u"#atf: use unicode\n"
+        u"&P000001 = First\n#project: cams/gkab\n@obverse\n1. a\n"
+        u"&P000002 = Second\n#project: cams/gkab\n@obverse\n1. b\n"
+        u"&P000003 = Third\n#project: cams/gkab\n@obverse\n1. c\n")
+
+
+def test_fragment_delta():
+    """
+    Check that only texts changed since they last validated without errors
+    are sent again, and that error lines are mapped back to the whole text.
+    """
+    delta = FragmentDelta()
+    context = ('file.atf', 'cams/gkab', False, 'http://localhost:8085')
+    assert delta.build(text, context) == text
+    log = delta.update('00atf/file.atf:9:cams/gkab: unknown sign\n'
+                       'ATF processor ox issued 1 errors')
+    assert log.startswith('00atf/file.atf:9:')
+
+    # Only the second text had errors
+    assert delta.build(text, context) == (u"#atf: use unicode\n"
+                                          u"&P000002 = Second\n"
+                                          u"#project: cams/gkab\n"
+                                          u"@obverse\n1. b\n")
+    log = delta.update('00atf/file.atf:5:cams/gkab: unknown sign\n'
+                       'ATF processor ox issued 1 errors')
+    assert log.split(':')[1] == '9'
+    changed = text.replace(u'1. b', u'1. d')
+    assert delta.build(changed, context).endswith(u"1. d\n")
+    assert delta.update('') == ''
+    assert delta.build(changed, context) is None
+
+    # Nothing is known to be clean in another context
+    assert delta.build(changed, ('other.atf',) + context[1:]) == changed
+
+
+def test_fragment_delta_other_server():
+    """
+    Check that when another server answers, only the texts it validated are
+    known to be clean.
+    """
+    delta = FragmentDelta()
+    context = ('file.atf', 'cams/gkab', False, 'http://localhost:8085')
+    other = context[:3] + ('http://oracc.ub.uni-muenchen.de:8085',)
+    assert delta.build(text, context) == text
+    delta.update('00atf/file.atf:9:cams/gkab: unknown sign\n'
+                 'ATF processor ox issued 1 errors')
+    changed = text.replace(u'1. b', u'1. d')
+    assert delta.build(changed, context).endswith(u"1. d\n")
+    delta.update('', other)
+    assert delta.context == other
+    # The other texts were only validated by the first server
+    assert delta.build(changed, other) == (u"#atf: use unicode\n"
+                                           u"&P000001 = First\n"
+                                           u"#project: cams/gkab\n"
+                                           u"@obverse\n1. a\n"
+                                           u"&P000003 = Third\n"
+                                           u"#project: cams/gkab\n"
+                                           u"@obverse\n1. c\n")
+
+
+def test_select_fragments():
+    """
+    Check that the texts touched by a range of lines are selected and that
+    errors in them are mapped back to the lines of the whole text.
+    """
+    preamble, fragments = select_fragments(text, 9, 9)
+    assert preamble == u"#atf: use unicode\n"
+    assert [line_num for line_num, fragment in fragments] == [6]
+    preamble, fragments = select_fragments(text, 1, 10)
+    assert [line_num for line_num, fragment in fragments] == [2, 6, 10]
+    assert select_fragments(text, 1, 1)[1] == []
+
+    selected, line_map = join_pieces([(1, preamble)] + fragments[2:])
+    assert selected == u"#atf: use unicode\n" + text.split(u"1. b\n")[1]
+    log, error_lines, unattributed = remap_log_lines(
+                    '00atf/file.atf:5:cams/gkab: unknown sign', line_map)
+    assert log == '00atf/file.atf:13:cams/gkab: unknown sign'
+    assert error_lines == set([5]) and not unattributed
@@ -0,0 +1,64 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import threading
+
+from ..utils.JobQueue import JobQueue
+
+
+def test_job_queue_retries(tmpdir):
+    """
+    Check that queued jobs are saved until they're done, are loaded again by
+    a new queue and are retried until the runner succeeds.
+    """
+    attempts = []
+    done = threading.Event()
+    results = []
+
+    def runner(job):
+        attempts.append(job['id'])
+        if len(attempts) < 3:
+            raise IOError("Server unreachable")
+        return ('', 'request log', None)
+
+    def on_result(job, job_results):
+        results.append((job['filename'], job_results))
+        done.set()
+
+    def on_give_up(job, error):
+        done.set()
+
+    queue = JobQueue(runner, on_result, on_give_up, backoff=0.01,
+                     directory=str(tmpdir))
+    job = queue.add('atf', 'cams/gkab', 'file.atf', u'&P000001 = First\n')
+    assert job['revision'] == JobQueue.get_revision(u'&P000001 = First\n')
+    assert os.listdir(str(tmpdir)) == [job['id'] + '.json']
+
+    # Jobs left by an earlier session are loaded again
+    queue = JobQueue(runner, on_result, on_give_up, backoff=0.01,
+                     directory=str(tmpdir))
+    assert len(queue) == 1
+    queue.start()
+    done.wait(10)
+    queue.stop()
+    assert results == [('file.atf', ('', 'request log', None))]
+    assert attempts == [job['id']] * 3
+    assert len(queue) == 0
+    assert os.listdir(str(tmpdir)) == []
@@ -8,9 +8,12 @@ import yaml
 from java.awt import Color
 from javax.swing import JSplitPane, JFileChooser, JScrollPane
 from javax.swing.undo import CompoundEdit
-from javax.swing import JOptionPane
+from javax.swing import JOptionPane, SwingUtilities
+from javax.swing.event import TableModelEvent, TableModelListener
 
 from python.nammu.controller.NammuController import NammuController
+from python.nammu.controller.ModelController import ModelController
+from python.nammu.view.ModelView import LinesTableModel
 from python.nammu.utils import ConfigDict, NammuException, save_yaml_config
 
 
@@ -119,6 +122,31 @@ def generic_loader(filename):
     return codecs.open(filename, encoding='utf-8').read()
 
 
+def wait_for_server(nammu):
+    '''
+    Commands are sent to the ORACC server in the background, so wait until
+    their results have been shown.
+    '''
+    if nammu.command_thread:
+        nammu.command_thread.join()
+    SwingUtilities.invokeAndWait(lambda: None)
+
+
+class TableEvents(TableModelListener):
+    '''
+    Records the (type, first row, last row) of the events fired by a table
+    model, and the number of rows the model had when each was fired.
+    '''
+    def __init__(self):
+        self.events = []
+        self.row_counts = []
+
+    def tableChanged(self, event):
+        self.events.append((event.getType(), event.getFirstRow(),
+                            event.getLastRow()))
+        self.row_counts.append(event.getSource().getRowCount())
+
+
 class mockFile(object):
     '''
     A class used to monkeypatch the Java file object
@@ -172,6 +200,7 @@ class TestNammu(object):
         else:
             nammu.atfAreaController.edit_area.setText(text)
         nammu.lemmatise()
+        wait_for_server(nammu)
         text_with_lemmas = nammu.atfAreaController.edit_area.getText()
         assert text != text_with_lemmas
         # Make sure Arabic translation is not appended to the edit area.
@@ -182,12 +211,14 @@ class TestNammu(object):
         nammu.currentFilename = 'pytest.atf'  # bypass saving the file
         nammu.atfAreaController.edit_area.setText(text)
         nammu.lemmatise()
+        wait_for_server(nammu)
         assert text == nammu.atfAreaController.edit_area.getText()
 
     def test_unsuccsessful_lem(self, broken_atf, nammu):
         nammu.currentFilename = 'pytest.atf'  # bypass saving the file
         nammu.atfAreaController.edit_area.setText(broken_atf)
         nammu.lemmatise()
+        wait_for_server(nammu)
 
         # An empty dictionary means no validation errors
         assert nammu.atfAreaController.validation_errors
@@ -198,6 +229,7 @@ class TestNammu(object):
         nammu.currentFilename = 'pytest.atf'  # bypass saving the file
         nammu.atfAreaController.edit_area.setText(text)
         nammu.validate()
+        wait_for_server(nammu)
 
         # An empty dictionary means no validation errors
         assert not nammu.atfAreaController.validation_errors
@@ -206,6 +238,7 @@ class TestNammu(object):
         nammu.currentFilename = 'pytest.atf'  # bypass saving the file
         nammu.atfAreaController.edit_area.setText(broken_atf)
         nammu.validate()
+        wait_for_server(nammu)
 
         # An empty dictionary means no validation errors
         assert nammu.atfAreaController.validation_errors
@@ -403,6 +436,167 @@ class TestNammu(object):
         assert (controller.edit_area.getText() == "" and
                 "edits: []" not in undo_manager.toString())
 
+    def test_undo_whole_words(self, nammu):
+        '''
+        Typing is grouped in words, so undoing removes a whole word at a time
+        instead of a single character.
+        '''
+        controller = nammu.atfAreaController
+        controller.clearAtfArea()
+        doc = controller.edit_area.getDocument()
+        for position, char in enumerate("Hello Nammu"):
+            doc.insertString(position, char, None)
+        controller.undo()
+        assert controller.edit_area.getText() == "Hello "
+        controller.undo()
+        assert controller.edit_area.getText() == ""
+
+    def test_apply_edits_single_undo(self, nammu):
+        '''
+        A batch of edits (e.g. from replace all) is undone in one go and keeps
+        the validation errors outside the edited lines.
+        '''
+        controller = nammu.atfAreaController
+        controller.clearAtfArea()
+        controller.edit_area.setText("a b\nb\nc\nb c")
+        controller.validation_errors = {'1': 'err', '3': 'err'}
+        controller.apply_edits([(2, 3, 'x'), (4, 5, 'y\nz'), (8, 9, 'x')])
+        assert controller.edit_area.getText() == "a x\ny\nz\nc\nx c"
+        assert sorted(controller.validation_errors.keys()) == ['1', '4']
+        controller.undo()
+        assert controller.edit_area.getText() == "a b\nb\nc\nb c"
+
+    def test_apply_edits_at_line_start(self, nammu):
+        '''
+        Errors follow their lines when whole lines are inserted before them
+        or replaced above them.
+        '''
+        controller = nammu.atfAreaController
+        controller.clearAtfArea()
+        controller.edit_area.setText("1. a\n#lem: A\n2. b\n")
+        controller.validation_errors = {'2': 'lem', '3': 'b'}
+        controller.apply_edits([(5, 5, 'X\n')])
+        assert controller.edit_area.getText() == "1. a\nX\n#lem: A\n2. b\n"
+        assert controller.validation_errors == {'3': 'lem', '4': 'b'}
+        controller.apply_edits([(5, 15, 'Y\nZ\nW\n')])
+        assert controller.edit_area.getText() == "1. a\nY\nZ\nW\n2. b\n"
+        assert controller.validation_errors == {'5': 'b'}
+
+    def test_merge_lemmatised_text(self, nammu):
+        '''
+        Lemmatised text from the server is merged line by line, with Windows
+        line endings, and is undone in one go.
+        '''
+        controller = nammu.atfAreaController
+        controller.clearAtfArea()
+        text = "&X001 = Test\n1. a-na\n2. be-li2\n"
+        controller.edit_area.setText(text)
+        controller.merge_text(u"&X001 = Test\r\n1. a-na\r\n#lem: ana[to]PRP"
+                              u"\r\n2. be-li2\r\n#lem: bēlu[lord]N\r\n")
+        assert controller.edit_area.getText() == (
+                            u"&X001 = Test\n1. a-na\n#lem: ana[to]PRP\n"
+                            u"2. be-li2\n#lem: bēlu[lord]N\n")
+        controller.undo()
+        assert controller.edit_area.getText() == text
+
+    def test_go_to_error(self, nammu):
+        '''
+        Check next and previous error move between the lines with errors
+        and wrap around the ends of the file.
+        '''
+        controller = nammu.atfAreaController
+        controller.clearAtfArea()
+        controller.edit_area.setText("a\nb\nc\nd\ne\n")
+        controller.set_validation_errors({'2': 'x', '4': 'y'})
+        controller.edit_area.setCaretPosition(0)
+        assert controller.go_to_error() == 2
+        assert controller.go_to_error() == 4
+        assert controller.go_to_error() == 2
+        assert controller.go_to_error(forward=False) == 4
+        assert controller.edit_area.getCaretPosition() == 6
+
+    def test_get_line_num(self, nammu):
+        '''
+        Check offsets are mapped to lines, which tooltips are looked up by.
+        '''
+        controller = nammu.atfAreaController
+        controller.clearAtfArea()
+        controller.edit_area.setText("a\nb\nc\n")
+        assert controller.edit_area.get_line_num(0) == 1
+        assert controller.edit_area.get_line_num(3) == 2
+        assert controller.edit_area.get_line_num(6) == 4
+
+    def test_update_model_lines(self):
+        '''
+        Check only the rows that changed are notified, with the row numbers
+        the table has before each change, when a row is inserted before a
+        modified one, and that only the rows displayed are described.
+        '''
+        described = []
+
+        def describe(line):
+            described.append(line)
+            return line, line, ''
+
+        table_model = LinesTableModel(['a', 'b', 'c'], describe)
+        assert table_model.getValueAt(2, 0) == 'c'
+        listener = TableEvents()
+        table_model.addTableModelListener(listener)
+        table_model.update_lines(['x', 'a', 'B', 'c'])
+        assert listener.events == [(TableModelEvent.UPDATE, 1, 1),
+                                   (TableModelEvent.INSERT, 0, 0)]
+        assert listener.row_counts == [3, 4]
+        assert described == ['c']
+        assert table_model.getRowCount() == 4
+        assert table_model.getValueAt(2, 0) == 'B'
+        assert table_model.getValueAt(3, 0) == 'c'
+        assert described == ['c', 'B']
+
+    def test_update_model_lines_removed(self):
+        '''
+        Check rows are removed from the table before the rows that replace
+        them are inserted, and that lines are compared by their key.
+        '''
+        table_model = LinesTableModel(['a', 'b', 'c', 'd'],
+                                      lambda line: (line, line, ''),
+                                      key=lambda line: line.lower())
+        listener = TableEvents()
+        table_model.addTableModelListener(listener)
+        table_model.update_lines(['A', 'x', 'y', 'z', 'D'])
+        assert listener.events == [(TableModelEvent.DELETE, 1, 2),
+                                   (TableModelEvent.INSERT, 1, 3)]
+        assert listener.row_counts == [2, 5]
+        assert table_model.getValueAt(0, 0) == 'A'
+        assert table_model.getValueAt(2, 1) == 'y'
+
+    def test_model_view_sync(self, nammu):
+        '''
+        Check a fragment edited in the ATF area replaces the rows of its tab
+        in the model view, and that outdated parses are discarded.
+        '''
+        header = (u"&X000001 = Test\n#project: cams/gkab\n"
+                  u"#atf: lang akk-x-stdbab\n#atf: use unicode\n"
+                  u"@tablet\n@obverse\n")
+        text = header + u"1. a-na\n2. be-li2\n"
+        nammu.atfAreaController.setAtfAreaText(text)
+        model = ModelController(nammu, nammu.parse(text), text)
+        try:
+            table_model = model.table_models[0]
+            assert table_model.getRowCount() == 2
+            new_text = header + u"1. a-na\n2. ARAD-ka\n3. be-li2\n"
+            model.revision += 1
+            parsed = nammu.parse(new_text).text
+            model._apply_changes(model.revision - 1, [new_text],
+                                 [(0, parsed)])
+            assert table_model.getRowCount() == 2
+            model._apply_changes(model.revision, [new_text], [(0, parsed)])
+            assert model.fragments == [new_text]
+            assert table_model.getRowCount() == 3
+            assert table_model.getValueAt(1, 1) == u"ARAD-ka"
+        finally:
+            model.close()
+            model.view.dispose()
+
     def test_undo_split_primary_pane(self, simpletext, nammu):
         '''
         Using Nammu's split pane mode, check undoing something on the primary
@@ -475,6 +669,22 @@ class TestNammu(object):
         assert (edit_area.getText() == "" and
                 arabic_area.getText() == "في شتة")
 
+    def test_undo_arabic_pane_highlights(self, monkeypatch, nammu):
+        '''
+        Check undoing an edit in the arabic pane still highlights the text
+        again.
+        '''
+        controller = nammu.atfAreaController
+        nammu.arabic()
+        controller.edit_area.setText("Hello primary edit area!")
+        controller.arabic_area.setText("في شتة")
+        highlighted = []
+        monkeypatch.setattr(controller, 'syntax_highlight',
+                            lambda *args: highlighted.append(args))
+        controller.undo()
+        assert controller.arabic_area.getText() == ""
+        assert highlighted
+
     def test_redo_arabic_pane(self, arabic, nammu):
         '''
         Using Nammu's arabic mode, check redoing something on the arabic
@@ -0,0 +1,83 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import re
+
+from javax.swing.text import PlainDocument
+
+from ..utils.SearchSession import SearchSession
+
+
+def make_document(text):
+    doc = PlainDocument()
+    doc.insertString(0, text, None)
+    return doc
+
+
+def get_spans(session):
+    return [(match.start(), match.end()) for match in session.matches]
+
+
+def find_spans(doc, pattern):
+    text = doc.getText(0, doc.getLength())
+    return [match.span() for match in pattern.finditer(text)]
+
+
+def test_rescan_after_replace():
+    """
+    Check the matches are kept up to date when they're replaced with text of
+    a different length, and when new matches are typed.
+    """
+    pattern = re.compile(u"na")
+    doc = make_document(u"1. a-na be-li2\n2. na-din\n3. ina\n")
+    session = SearchSession(doc, pattern)
+    assert get_spans(session) == find_spans(doc, pattern)
+    match = session.matches[0]
+    doc.remove(match.start(), match.end() - match.start())
+    doc.insertString(match.start(), u"nana", None)
+    assert get_spans(session) == find_spans(doc, pattern)
+    match = session.match_at(session.matches[-1].start())
+    doc.remove(match.start(), match.end() - match.start())
+    doc.insertString(match.start(), u"x", None)
+    assert get_spans(session) == find_spans(doc, pattern)
+    assert len(session.matches) == 3
+    session.close()
+
+
+def test_context_dependent_replacement():
+    """
+    Check replacements are expanded from the match found in its context, so
+    lookbehinds and anchors that can't match the matched text alone work.
+    """
+    doc = make_document(u"ab xb\nb ab\n")
+    session = SearchSession(doc, re.compile(u"(?<=a)(b)"))
+    assert get_spans(session) == [(1, 2), (9, 10)]
+    match = session.match_at(9)
+    assert match.match.expand(u"[\\1]") == u"[b]"
+    doc.remove(9, 1)
+    doc.insertString(9, match.match.expand(u"[\\1]"), None)
+    assert doc.getText(0, doc.getLength()) == u"ab xb\nb a[b]\n"
+    assert get_spans(session) == [(1, 2)]
+    assert session.match_at(9) is None
+    session.close()
+
+    session = SearchSession(doc, re.compile(u"b$", re.MULTILINE))
+    assert get_spans(session) == [(4, 5)]
+    assert session.match_at(4).match.expand(u"B") == u"B"
+    session.close()
@@ -22,8 +22,45 @@ import codecs
 import os
 import shutil
 import xml.dom.minidom
+import zipfile
+from StringIO import StringIO
 from requests.exceptions import ConnectionError
 from ..SOAPClient.SOAPClient import SOAPClient
+from ..SOAPClient.ServerPool import ServerPool
+from .oracc_server import OraccServer
+
+
+class FakeResponse(object):
+    '''
+    Just the parts of a requests response that SOAPClient reads.
+    '''
+    def __init__(self, content, headers=None):
+        self.content = content
+        self.headers = headers or {}
+
+
+def results_response(boundary, files):
+    '''
+    Returns the body of a response to a request for results, with the SOAP
+    envelope and a zip of the given files, stored so the Windows line endings
+    in them aren't compressed away.
+    '''
+    data = StringIO()
+    zip_file = zipfile.ZipFile(data, 'w', zipfile.ZIP_STORED)
+    for name, content in sorted(files.items()):
+        zip_file.writestr(name, content)
+    zip_file.close()
+    delimiter = '--' + boundary
+    return '\r\n'.join([delimiter,
+                        'Content-Type: application/xop+xml',
+                        '',
+                        '<SOAP-ENV:Envelope/>',
+                        delimiter,
+                        'Content-Type: */*',
+                        '',
+                        data.getvalue(),
+                        delimiter + '--',
+                        '']), data.getvalue()
 
 
 class TestSOAP(object):
@@ -155,6 +192,53 @@ class TestSOAP(object):
                 pretty_string += line
         return pretty_string
 
+    def test_attachment_boundary_from_header(self):
+        """
+        The boundary is read from a quoted Content-Type parameter, and zip
+        files with Windows line endings are returned whole.
+        """
+        files = {'oracc.log': 'line 1\r\nline 2\r\n',
+                 'request.log': 'Processing\r\nDone\r\n'}
+        content, zip_data = results_response('==b==', files)
+        assert '\r\n' in zip_data
+        client = SOAPClient('http://localhost', 8085, 'p', method='POST')
+        client.response = FakeResponse(content, {
+                    'Content-Type': 'multipart/related; '
+                                    'type="application/xop+xml"; '
+                                    'boundary="==b=="; start="<envelope>"'})
+        assert client.get_attachment() == zip_data
+        assert client.get_server_logs() == (files['oracc.log'],
+                                            files['request.log'], None)
+
+    def test_attachment_boundary_from_body(self):
+        """
+        Without a Content-Type header, the boundary is the first line of the
+        body.
+        """
+        files = {'oracc.log': '', 'request.log': 'a\r\nb',
+                 '00atf/file_autolem.atf': '&X001 = Test\r\n1. a\r\n'}
+        content, zip_data = results_response('==other==', files)
+        client = SOAPClient('http://localhost', 8085, 'p', method='POST')
+        client.response = FakeResponse(content)
+        assert client.get_attachment() == zip_data
+        assert client.get_server_logs() == ('', 'a\r\nb',
+                                            files['00atf/file_autolem.atf'])
+
+    def test_truncated_attachment(self):
+        """
+        A response cut short raises IndexError, like one without a zip.
+        """
+        content, zip_data = results_response('==b==', {'oracc.log': 'x',
+                                                       'request.log': 'y'})
+        client = SOAPClient('http://localhost', 8085, 'p', method='POST')
+        for length in (len(content) // 2, len(content) - len(zip_data) - 30):
+            client.response = FakeResponse(content[:length])
+            with pytest.raises(IndexError):
+                client.get_server_logs()
+        client.response = FakeResponse('<SOAP-ENV:Envelope/>')
+        with pytest.raises(IndexError):
+            client.get_server_logs()
+
     def test_soap_connection_error(self):
         """
         Requests library raises different exceptions, but we would need to
@@ -168,6 +252,81 @@ class TestSOAP(object):
             client.send()
         assert e.type == ConnectionError
 
+    def test_local_server_validation(self):
+        """
+        Run the whole submit, poll and fetch exchange against the local
+        stand-in for the ORACC server, which reports an error in every line
+        containing "IGI".
+        """
+        server = OraccServer(error_pattern='IGI').start()
+        try:
+            client = SOAPClient('http://127.0.0.1', server.port, 'p',
+                                method='POST', status_port=server.port)
+            text = codecs.open('resources/test/english.atf',
+                               encoding='utf-8').read()
+            oracc_log, request_log, autolem = client.run_command(
+                                                    'atf', 'ztcc',
+                                                    'english.atf',
+                                                    text.encode('utf-8'))
+        finally:
+            server.stop()
+        assert oracc_log.splitlines()[0] == (
+                        '00atf/english.atf:13:ztcc: unknown sign or word: IGI')
+        assert autolem is None
+        assert request_log.startswith('Processing 00atf/english.atf for '
+                                      'ztcc\r\n')
+        assert server.counts['submit'] == server.counts['fetch'] == 1
+
+    def test_local_server_failure(self):
+        """
+        The stand-in server can be told to fail every request.
+        """
+        server = OraccServer(failure_rate=1).start()
+        try:
+            client = SOAPClient('http://127.0.0.1', server.port, 'p',
+                                method='POST', status_port=server.port)
+            with pytest.raises(Exception):
+                client.run_command('atf', 'ztcc', 'english.atf', 'text')
+        finally:
+            server.stop()
+        assert server.counts['failed'] == 1
+
+    def test_server_pool_failover_and_hedging(self):
+        """
+        Commands go to the next server when one fails, and to a second server
+        too when the first is slower than the hedging delay.
+        """
+        servers = {'broken': OraccServer(failure_rate=1).start(),
+                   'slow': OraccServer(latency=2).start(),
+                   'fast': OraccServer().start()}
+
+        def attempt(name, settings):
+            client = SOAPClient(settings['url'], settings['port'],
+                                settings['dir'], method='POST',
+                                status_port=settings['port'])
+            return client.run_command('atf', 'ztcc', 'english.atf', 'text')
+
+        try:
+            pool = ServerPool(dict((name, {'url': 'http://127.0.0.1',
+                                           'port': server.port,
+                                           'dir': 'p'})
+                                   for name, server in servers.items()),
+                              default='broken', hedge_delay=0.5)
+            for latency, name in enumerate(['broken', 'slow', 'fast']):
+                pool.stats[name].latencies.append(latency)
+            assert pool.get_ranked() == ['broken', 'slow', 'fast']
+            name, results = pool.run(attempt)
+            assert name == 'fast'
+            assert pool.get_ranked()[-1] == 'broken'
+            assert servers['broken'].counts['failed'] == 1
+            assert len(pool.get_summary()) == 3
+        finally:
+            for server in servers.values():
+                server.stop()
+        with pytest.raises(Exception) as error:
+            ServerPool({}).run(attempt)
+        assert "no ORACC servers" in str(error.value)
+
     @pytest.mark.skip(reason=("takes too long and mvn test won't import "
                               "pyoracc"))
     def test_whole_corpus_validates(self):
@@ -190,6 +349,8 @@ class TestSOAP(object):
                                    encoding='utf-8').read()
                 nammu.atfAreaController.setAtfAreaText(text)
                 nammu.validate()
+                if nammu.command_thread:
+                    nammu.command_thread.join()
                 shutil.move(
                         nammu.currentFilename,
                         "/Users/raquel/workspace/ORACC/whole_corpus/validated")
@@ -0,0 +1,64 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import time
+
+from ..utils.ValidationCache import ValidationCache
+
+
+def test_validation_cache(tmpdir):
+    """
+    Check that results are found again only for the same text, project,
+    command and server, and that old and least recently used results are
+    evicted.
+    """
+    cache = ValidationCache(max_size=10000, max_age=3600,
+                            directory=str(tmpdir))
+    atf_text = open('resources/test/english.atf').read()
+    key = ValidationCache.get_key(atf_text, 'english.atf', 'ztcc', 'atf',
+                                  'http://localhost')
+    assert cache.get(key) is None
+    cache.put(key, 'oracc log \xc5\xa1', 'request log', None)
+    assert cache.get(key) == ('oracc log \xc5\xa1', 'request log', None)
+    for other_key in (ValidationCache.get_key(atf_text + '\n', 'english.atf',
+                                              'ztcc', 'atf',
+                                              'http://localhost'),
+                      ValidationCache.get_key(atf_text, 'english.atf',
+                                              'ztcc', 'lem',
+                                              'http://localhost')):
+        assert other_key != key
+        assert cache.get(other_key) is None
+
+    # Results older than the maximum age are gone
+    old_time = time.time() - 7200
+    os.utime(cache.get_path(key), (old_time, old_time))
+    assert cache.get(key) is None
+
+    # The least recently used results are evicted first
+    used_time = time.time() - 600
+    for name in 'abc':
+        cache.put(name, os.urandom(300).encode('hex'), name, None)
+        os.utime(cache.get_path(name), (used_time, used_time))
+        used_time += 1
+    cache.max_size = os.path.getsize(cache.get_path('a')) * 3.5
+    cache.get('a')
+    cache.put('d', os.urandom(300).encode('hex'), 'd', None)
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c') and cache.get('d')
@@ -0,0 +1,53 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from ..utils.ValidationReport import ValidationReport
+
+oracc_log = ("00atf/file.atf:9:cams/gkab: unknown sign: x\n"
+             "00atf/file.atf:4:cams/gkab: (warning) missing lemmatisation\n"
+             "00atf/file.atf:9:cams/gkab: bad grapheme\n"
+             "ATF processor ox issued 1 warning and 2 errors\n")
+
+
+def test_parse_report():
+    """
+    Check every error is parsed with its fields, and the summary is kept.
+    """
+    report = ValidationReport.parse(oracc_log)
+    assert len(report) == 3
+    error = report.errors[0]
+    assert error.filename == '00atf/file.atf'
+    assert error.line == 9
+    assert error.project == 'cams/gkab'
+    assert error.message == 'unknown sign: x'
+    assert error.severity == 'error'
+    assert report.errors[1].severity == 'warning'
+    assert report.count('error') == 2
+    assert report.summary.startswith('ATF processor')
+    assert ValidationReport.parse('').summary is None
+
+
+def test_report_tooltips():
+    """
+    Check the errors are grouped by line in plain text tooltips.
+    """
+    tooltips = ValidationReport.parse(oracc_log).get_tooltips()
+    assert sorted(tooltips) == ['4', '9']
+    assert tooltips['9'] == (u'00atf/file.atf:9:cams/gkab: unknown sign: x; '
+                             u'00atf/file.atf:9:cams/gkab: bad grapheme')
@@ -0,0 +1,209 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import hashlib
+import json
+import os
+import re
+import zlib
+
+from pyoracc.atf.atflex import AtfLexer
+
+from . import get_log_path
+
+
+class CorpusIndex(object):
+    '''
+    Inverted index of the lemmas, signs, words, line labels and text codes
+    (&P...) in all the ATF files of a directory, built from pyoracc's lexer
+    tokens.
+    The index is saved compressed in Nammu's config folder, and only files
+    whose size, modification time and contents have changed are lexed again
+    when updating it.
+    '''
+    version = 1
+    kinds = ('lemma', 'sign', 'word', 'label', 'text')
+    sign_separators = re.compile(r'[-.{}+:\s]+')
+    sign_flags = re.compile(r'[#?!*\[\]<>()]')
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.path = self.get_index_path(self.directory)
+        # Indexed contents by file, as saved to disk
+        self.files = {}
+        # Kind -> key -> list of (filename, line number) tuples
+        self.postings = {}
+        self.load()
+
+    def get_index_path(self, directory):
+        '''
+        Each indexed directory gets its own file, named after a hash of the
+        directory path.
+        '''
+        index_dir = get_log_path('corpus_index')
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        name = hashlib.sha1(directory.encode('utf-8')).hexdigest()
+        return os.path.join(index_dir, name + '.idx')
+
+    def load(self):
+        '''
+        Load the index previously saved for this directory, if any.
+        '''
+        try:
+            with open(self.path, 'rb') as index_file:
+                data = json.loads(zlib.decompress(index_file.read()))
+        except (IOError, ValueError, zlib.error):
+            return
+        if data.get('version') == self.version:
+            self.replace(data['files'], self.invert(data['files']))
+
+    def save(self, files):
+        data = json.dumps({'version': self.version, 'files': files},
+                          separators=(',', ':'))
+        with open(self.path, 'wb') as index_file:
+            index_file.write(zlib.compress(data))
+
+    def replace(self, files, postings):
+        '''
+        Start using the given indexed files and their postings (as returned by
+        update and invert).
+        '''
+        self.files = files
+        self.postings = postings
+
+    def update(self):
+        '''
+        Index the ATF files in the directory that are new or have changed
+        since the last update. Returns the indexed files and how many of them
+        had to be lexed.
+        This doesn't modify the index in use, so it can be run in the
+        background while the index is being queried.
+        '''
+        files = {}
+        lexer = None
+        lexed = 0
+        for path in self.find_atf_files():
+            filename = os.path.relpath(path, self.directory)
+            try:
+                stat = os.stat(path)
+                old = self.files.get(filename)
+                if (old and old['mtime'] == stat.st_mtime and
+                        old['size'] == stat.st_size):
+                    files[filename] = old
+                    continue
+                with open(path, 'rb') as atf_file:
+                    content = atf_file.read()
+                digest = hashlib.sha1(content).hexdigest()
+                if old and old['sha1'] == digest:
+                    entry = dict(old)
+                else:
+                    if lexer is None:
+                        lexer = AtfLexer(skipinvalid=True).lexer
+                    entry = {'sha1': digest,
+                             'entries': self.tokenize(lexer,
+                                                      content.decode('utf-8'))}
+                    lexed += 1
+            except (IOError, OSError, UnicodeDecodeError):
+                continue
+            entry['mtime'] = stat.st_mtime
+            entry['size'] = stat.st_size
+            files[filename] = entry
+        return files, lexed
+
+    def find_atf_files(self):
+        paths = []
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                if os.path.splitext(name)[1] == '.atf':
+                    paths.append(os.path.join(root, name))
+        return paths
+
+    @classmethod
+    def tokenize(cls, lexer, text):
+        '''
+        Returns a dictionary kind -> key -> list of line numbers with the
+        lemmas, signs, words, line labels and text codes in the given text.
+        It doesn't need an index, so it's also used to count them on their
+        own.
+        '''
+        entries = {}
+
+        def add(kind, key, line):
+            lines = entries.setdefault(kind, {}).setdefault(key, [])
+            if not lines or lines[-1] != line:
+                lines.append(line)
+
+        lexer.input(text)
+        lexer.lineno = 1
+        while lexer.current_state() != 'INITIAL':
+            lexer.pop_state()
+        previous = None
+        in_line = in_lemmas = False
+        for tok in lexer:
+            if tok.type == 'NEWLINE':
+                in_line = in_lemmas = False
+            elif tok.type == 'LINELABEL':
+                add('label', tok.value, tok.lineno)
+                in_line = True
+            elif tok.type == 'LEM':
+                in_lemmas = True
+            elif tok.type == 'ID':
+                value = tok.value.strip()
+                if previous == 'AMPERSAND':
+                    add('text', value, tok.lineno)
+                elif in_lemmas:
+                    add('lemma', value, tok.lineno)
+                elif in_line:
+                    add('word', value, tok.lineno)
+                    for sign in cls.sign_separators.split(value):
+                        sign = cls.sign_flags.sub('', sign)
+                        if sign:
+                            add('sign', sign, tok.lineno)
+            previous = tok.type
+        return entries
+
+    def invert(self, files):
+        '''
+        Build the postings lists of the given indexed files. Lemmas can also be
+        looked up by their citation form only (e.g. "ana" for "ana[to]PRP").
+        '''
+        postings = dict((kind, {}) for kind in self.kinds)
+        for filename, entry in files.iteritems():
+            for kind, keys in entry['entries'].iteritems():
+                kind_postings = postings[kind]
+                for key, lines in keys.iteritems():
+                    lookup_keys = [key]
+                    if kind == 'lemma' and '[' in key:
+                        lookup_keys.append(key.split('[')[0])
+                    for lookup_key in lookup_keys:
+                        kind_postings.setdefault(lookup_key, []).extend(
+                                        (filename, line) for line in lines)
+        return postings
+
+    def lookup(self, key, kind=None):
+        '''
+        Returns a sorted list of (filename, line number, kind) tuples where the
+        given key appears. Filenames are relative to the indexed directory.
+        '''
+        results = []
+        for kind in [kind] if kind else self.kinds:
+            for filename, line in self.postings.get(kind, {}).get(key, []):
+                results.append((filename, line, kind))
+        return sorted(results)
@@ -0,0 +1,143 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import hashlib
+
+from . import split_fragments
+
+
+def join_pieces(pieces):
+    '''
+    Join the (line number, text) tuples of parts of a text, e.g. some of its
+    fragments. Returns the joined text and a list with the line of the whole
+    text that each of its lines comes from.
+    '''
+    line_map = []
+    pieces = [(line_num, piece) for line_num, piece in pieces if piece]
+    for line_num, piece in pieces:
+        no_of_lines = piece.count('\n') + (not piece.endswith('\n'))
+        line_map.extend(range(line_num, line_num + no_of_lines))
+    return u''.join(piece for line_num, piece in pieces), line_map
+
+
+def remap_log_lines(oracc_log, line_map):
+    '''
+    Replace the line numbers of the errors in the server log, which refer to
+    the joined text sent, with the lines of the whole text in `line_map`.
+    Returns the new log, the set of line numbers with errors in the text
+    sent, and whether there were errors without a line number.
+    '''
+    error_lines = set()
+    unattributed = False
+    lines = []
+    for line in (oracc_log or '').splitlines():
+        parts = line.split(':', 2)
+        if len(parts) == 3 and parts[1].isdigit():
+            line_num = int(parts[1])
+            error_lines.add(line_num)
+            if 0 < line_num <= len(line_map):
+                parts[1] = str(line_map[line_num - 1])
+            line = ':'.join(parts)
+        elif ':' in line:
+            unattributed = True
+        lines.append(line)
+    return ('\n'.join(lines) if oracc_log else oracc_log, error_lines,
+            unattributed)
+
+
+class FragmentDelta(object):
+    '''
+    Keeps track of the fragments ("&" texts) of a file that passed validation,
+    so only the ones that changed since then are sent to the server again,
+    together with the text before the first fragment.
+    The line numbers of the errors returned by the server are mapped back to
+    the lines of the whole file.
+    '''
+    def __init__(self):
+        # Hashes of the fragments without validation errors
+        self.clean = set()
+        # File, project and server the clean fragments were validated with
+        self.context = None
+        # Line of the whole text for each line of the text sent
+        self.line_map = []
+        # (first line, last line + 1, hash) of each fragment in the text sent
+        self.sent = []
+
+    def build(self, text, context):
+        '''
+        Returns the part of the text that needs validating, or None if all
+        the fragments are unchanged since they were last validated without
+        errors. `context` is anything that invalidates the clean fragments
+        when it changes, e.g. the file name, project and server.
+        '''
+        if context != self.context:
+            self.clean = set()
+            self.context = context
+        preamble, fragments = split_fragments(text)
+        pieces = [(1, preamble, None)] if preamble else []
+        for line_num, fragment in fragments:
+            key = hashlib.sha1((preamble + u'\0' + fragment)
+                               .encode('utf-8')).hexdigest()
+            if key not in self.clean:
+                pieces.append((line_num, fragment, key))
+        if fragments and len(pieces) == (1 if preamble else 0):
+            return None
+        text, self.line_map = join_pieces([(line_num, piece)
+                                           for line_num, piece, key
+                                           in pieces])
+        # Lines of each fragment in the text sent
+        self.sent = []
+        for line_num, piece, key in pieces:
+            if key:
+                start = self.line_map.index(line_num) + 1
+                no_of_lines = piece.count('\n') + (not piece.endswith('\n'))
+                self.sent.append((start, start + no_of_lines, key))
+        return text
+
+    def get_fragment_count(self):
+        return len(self.sent)
+
+    def update(self, oracc_log, context=None):
+        '''
+        Remember which of the fragments sent had no errors, and return the
+        server log with line numbers of the whole text. `context` is the one
+        the results were actually validated with, if it can differ from the
+        one given to build, e.g. when another server answered. The fragments
+        that weren't sent are then no longer known to be clean.
+        '''
+        if context is not None and context != self.context:
+            self.clean = set()
+            self.context = context
+        oracc_log, error_lines, unattributed = remap_log_lines(oracc_log,
+                                                               self.line_map)
+        # Errors that can't be found in a fragment might be caused by any of
+        # them, so none can be trusted as clean
+        fragment_lines = set()
+        for start, end, key in self.sent:
+            fragment_lines.update(range(start, end))
+        if unattributed or error_lines - fragment_lines:
+            self.clean.difference_update(key for start, end, key
+                                         in self.sent)
+        else:
+            for start, end, key in self.sent:
+                if any(start <= line_num < end for line_num in error_lines):
+                    self.clean.discard(key)
+                else:
+                    self.clean.add(key)
+        return oracc_log
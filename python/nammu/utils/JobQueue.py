@@ -0,0 +1,216 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from . import get_log_path
+
+
+class JobQueue(object):
+    '''
+    Persistent queue of validation and lemmatisation requests that couldn't
+    reach the ORACC server. Each job holds a snapshot of the text sent, and
+    is saved in Nammu's config folder until it's done, so it survives
+    restarts.
+    Up to `max_workers` jobs are sent at the same time in background threads.
+    Failed jobs are retried after a delay that doubles with each attempt, up
+    to `max_backoff` seconds, or straight away when `wake` is called because
+    a server is reachable again. They're dropped after `max_attempts`.
+    `runner(job)` sends a job and returns its results, or raises an exception
+    if it fails. `on_result(job, results)` and `on_give_up(job, error)` are
+    called from the worker threads.
+    '''
+    def __init__(self, runner, on_result, on_give_up, max_workers=2,
+                 max_attempts=20, backoff=30, max_backoff=1800,
+                 directory=None):
+        self.runner = runner
+        self.on_result = on_result
+        self.on_give_up = on_give_up
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.directory = directory or get_log_path('jobs')
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.jobs = {}
+        self.in_flight = set()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.workers = []
+        self.logger = logging.getLogger("NammuController")
+        self.load()
+
+    @classmethod
+    def from_config(cls, config, runner, on_result, on_give_up):
+        '''
+        Returns a queue with the limits in the "job_queue" settings, or None
+        if queueing is disabled.
+        '''
+        settings = config.get('job_queue') or {}
+        if not settings.get('enabled', True):
+            return None
+        return cls(runner, on_result, on_give_up,
+                   max_workers=settings.get('max_workers', 2),
+                   max_attempts=settings.get('max_attempts', 20),
+                   backoff=settings.get('backoff', 30),
+                   max_backoff=settings.get('max_backoff', 1800))
+
+    @staticmethod
+    def get_revision(text):
+        '''
+        Identifies the contents of a text, to check whether it's changed
+        since it was queued.
+        '''
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get_path(self, job_id):
+        return os.path.join(self.directory, job_id + '.json')
+
+    def load(self):
+        '''
+        Load the jobs left in the queue by earlier sessions.
+        '''
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as job_file:
+                    job = json.load(job_file)
+                self.jobs[job['id']] = job
+            except (IOError, ValueError, KeyError):
+                self.logger.debug("Ignoring unreadable queued job %s.", name)
+
+    def save(self, job):
+        with open(self.get_path(job['id']), 'w') as job_file:
+            json.dump(job, job_file)
+
+    def remove(self, job):
+        with self.condition:
+            self.jobs.pop(job['id'], None)
+            self.in_flight.discard(job['id'])
+        try:
+            os.remove(self.get_path(job['id']))
+        except OSError:
+            pass
+
+    def add(self, command, project, filename, text):
+        '''
+        Queue a request to run `command` on a snapshot of `text`, which
+        belongs to `filename`.
+        '''
+        job = {'id': uuid.uuid4().hex,
+               'command': command,
+               'project': project,
+               'filename': filename,
+               'text': text,
+               'revision': self.get_revision(text),
+               'created': time.time(),
+               'attempts': 0,
+               'next_try': time.time() + self.backoff,
+               'last_error': None}
+        self.save(job)
+        with self.condition:
+            self.jobs[job['id']] = job
+            self.condition.notify_all()
+        return job
+
+    def __len__(self):
+        with self.condition:
+            return len(self.jobs)
+
+    def start(self):
+        for i in range(self.max_workers - len(self.workers)):
+            worker = threading.Thread(target=self.work,
+                                      name="JobQueue-{}".format(i))
+            worker.setDaemon(True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def wake(self):
+        '''
+        Retry all waiting jobs now, e.g. because the server is reachable
+        again.
+        '''
+        with self.condition:
+            now = time.time()
+            for job in self.jobs.values():
+                job['next_try'] = min(job['next_try'], now)
+            self.condition.notify_all()
+
+    def next_job(self):
+        '''
+        Wait until a job that isn't being sent is due, and return it. Returns
+        None once the queue is stopped.
+        '''
+        with self.condition:
+            while not self.stopped:
+                waiting = [job for job in self.jobs.values()
+                           if job['id'] not in self.in_flight]
+                now = time.time()
+                due = [job for job in waiting if job['next_try'] <= now]
+                if due:
+                    job = min(due, key=lambda job: job['created'])
+                    self.in_flight.add(job['id'])
+                    return job
+                timeout = None
+                if waiting:
+                    timeout = min(job['next_try'] for job in waiting) - now
+                self.condition.wait(timeout)
+
+    def work(self):
+        while True:
+            job = self.next_job()
+            if job is None:
+                return
+            try:
+                results = self.runner(job)
+            except Exception as e:
+                self.retry(job, e)
+            else:
+                self.remove(job)
+                self.on_result(job, results)
+
+    def retry(self, job, error):
+        job['attempts'] += 1
+        job['last_error'] = str(error)
+        if job['attempts'] >= self.max_attempts:
+            self.remove(job)
+            self.on_give_up(job, error)
+            return
+        delay = min(self.backoff * 2 ** (job['attempts'] - 1),
+                    self.max_backoff)
+        job['next_try'] = time.time() + delay
+        self.logger.debug("Queued %s of %s failed, retrying in %d seconds.",
+                          job['command'], job['filename'], delay)
+        self.save(job)
+        with self.condition:
+            self.in_flight.discard(job['id'])
+            self.condition.notify_all()
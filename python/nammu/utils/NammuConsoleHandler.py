@@ -19,6 +19,8 @@ along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
 from logging import StreamHandler
+from javax.swing import SwingUtilities
+from swingutils.threads.swing import runSwingLater
 
 
 class NammuConsoleHandler(StreamHandler):
@@ -41,4 +43,11 @@ class NammuConsoleHandler(StreamHandler):
         record and send to Nammu's console for the user to see.
         """
         msg = self.format(record)
-        self.nammu_console.addText(msg.decode('utf-8') + "\n")
+        # The console can only be updated from Swing's event dispatch
+        # thread, so messages logged from background threads (e.g. queued
+        # requests being retried) are added from there.
+        if SwingUtilities.isEventDispatchThread():
+            self.nammu_console.addText(msg.decode('utf-8') + "\n")
+        else:
+            runSwingLater(self.nammu_console.addText,
+                          msg.decode('utf-8') + "\n")
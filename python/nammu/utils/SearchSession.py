@@ -0,0 +1,158 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from javax.swing.event import DocumentListener
+
+
+class SearchMatch(object):
+    '''
+    A match found in a document. Its boundaries are stored as document
+    positions, so they follow the text around them when the document is
+    edited. `match` is the regular expression match object, which replacements
+    are expanded with.
+    '''
+    def __init__(self, doc, start, end, match=None):
+        self.start_position = doc.createPosition(start)
+        self.end_position = doc.createPosition(end)
+        self.match = match
+
+    def start(self):
+        return self.start_position.getOffset()
+
+    def end(self):
+        return self.end_position.getOffset()
+
+
+class SearchSession(DocumentListener):
+    '''
+    Keeps an up to date, sorted list of the matches of a compiled regular
+    expression in a document, or in a region of it.
+    The whole region is only scanned once. After that, every edit triggers a
+    rescan of the lines it touched only.
+    '''
+    def __init__(self, doc, pattern, start=0, end=None):
+        self.doc = doc
+        self.pattern = pattern
+        self.scope_start = doc.createPosition(start)
+        # No end means the search goes on until the end of the document
+        if end is None:
+            self.scope_end = None
+        else:
+            self.scope_end = doc.createPosition(end)
+        self.matches = []
+        scope_start, scope_end = self.get_scope()
+        self.rescan(scope_start, scope_end)
+        doc.addDocumentListener(self)
+
+    def close(self):
+        '''
+        Stop following the changes in the document.
+        '''
+        self.doc.removeDocumentListener(self)
+
+    def get_scope(self):
+        '''
+        Return the start and end caret positions of the searched region.
+        '''
+        if self.scope_end is None:
+            end = self.doc.getLength()
+        else:
+            end = self.scope_end.getOffset()
+        return self.scope_start.getOffset(), end
+
+    def next_match(self, offset):
+        '''
+        Return the first match starting at or after the given caret position,
+        wrapping around to the first match if there are none. Returns None if
+        there are no matches at all.
+        '''
+        if not self.matches:
+            return None
+        index = self._bisect(offset, SearchMatch.start)
+        if index == len(self.matches):
+            index = 0
+        return self.matches[index]
+
+    def match_at(self, offset):
+        '''
+        Return the match starting at the given caret position, or None if
+        there isn't one, e.g. because the text has been edited since.
+        '''
+        index = self._bisect(offset, SearchMatch.start)
+        if (index < len(self.matches) and
+                self.matches[index].start() == offset):
+            return self.matches[index]
+        return None
+
+    def rescan(self, start, end):
+        '''
+        Find again the matches in the lines between the given caret positions
+        and replace the ones previously found there.
+        '''
+        root = self.doc.getDefaultRootElement()
+        start = root.getElement(root.getElementIndex(start)).getStartOffset()
+        end = min(root.getElement(root.getElementIndex(end)).getEndOffset(),
+                  self.doc.getLength())
+
+        # Old matches overlapping the region have to go, and the region has to
+        # grow to include them in case they spanned several lines.
+        first = self._bisect(start, SearchMatch.end)
+        last = self._bisect(end + 1, SearchMatch.start)
+        if first < last:
+            start = min(start, self.matches[first].start())
+            end = max(end, self.matches[last - 1].end())
+
+        scope_start, scope_end = self.get_scope()
+        start = max(start, scope_start)
+        end = min(end, scope_end)
+        found = []
+        if start < end:
+            text = self.doc.getText(start, end - start)
+            for match in self.pattern.finditer(text):
+                found.append(SearchMatch(self.doc,
+                                         start + match.start(),
+                                         start + match.end(),
+                                         match))
+        self.matches[first:last] = found
+
+    def _bisect(self, offset, key):
+        '''
+        Return the index of the first match for which `key` (its start or end
+        caret position) is not smaller than the given offset.
+        '''
+        low, high = 0, len(self.matches)
+        while low < high:
+            middle = (low + high) // 2
+            if key(self.matches[middle]) < offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def insertUpdate(self, e):
+        self.rescan(e.getOffset(), e.getOffset() + e.getLength())
+
+    def removeUpdate(self, e):
+        self.rescan(e.getOffset(), e.getOffset())
+
+    def changedUpdate(self, e):
+        '''
+        Attribute changes (e.g. highlighting) don't affect the matches.
+        '''
+        pass
@@ -0,0 +1,148 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import hashlib
+import json
+import os
+import time
+import zlib
+
+from . import get_log_path
+
+
+class ValidationCache(object):
+    '''
+    Persistent cache of the results returned by the ORACC server, so
+    validating or lemmatising an unchanged file doesn't need a round trip to
+    the server.
+    Results are saved compressed in Nammu's config folder, one file per
+    request, named after a hash of the submitted ATF bytes, file name,
+    project, command and server. The oldest results are evicted when they
+    are older than `max_age` seconds or take more than `max_size` bytes.
+    '''
+    version = 1
+
+    def __init__(self, max_size=50 * 1024 * 1024, max_age=30 * 24 * 3600,
+                 directory=None):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.directory = directory or get_log_path('validation_cache')
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    @classmethod
+    def from_config(cls, config):
+        '''
+        Returns a cache with the limits in the "validation_cache" settings,
+        or None if caching is disabled.
+        '''
+        settings = config.get('validation_cache') or {}
+        if not settings.get('enabled', True):
+            return None
+        return cls(max_size=int(settings.get('max_size_mb', 50)) * 1024 * 1024,
+                   max_age=int(settings.get('max_age_days', 30)) * 24 * 3600)
+
+    @staticmethod
+    def get_key(atf_text, atf_basename, project, command, server):
+        '''
+        Hash everything that can change the server's answer. `atf_text` is
+        the encoded text as sent to the server.
+        '''
+        digest = hashlib.sha1()
+        for value in (command, server, project, atf_basename):
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+            digest.update(value + '\0')
+        digest.update(atf_text)
+        return digest.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key + '.json.z')
+
+    def get(self, key):
+        '''
+        Returns the (oracc_log, request_log, autolem) tuple saved for this
+        key, or None if there isn't one or it's too old.
+        '''
+        path = self.get_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as cache_file:
+                data = json.loads(zlib.decompress(cache_file.read()))
+        except (OSError, IOError, ValueError, zlib.error):
+            return None
+        if data.get('version') != self.version:
+            return None
+        # Recently used results are evicted last
+        os.utime(path, None)
+        return tuple(value.encode('utf-8') if value is not None else None
+                     for value in data['results'])
+
+    def put(self, key, oracc_log, request_log, autolem):
+        '''
+        Save the logs and lemmatised file returned by the server, then evict
+        old results if needed.
+        '''
+        try:
+            results = [value.decode('utf-8') if value is not None else None
+                       for value in (oracc_log, request_log, autolem)]
+        except UnicodeDecodeError:
+            # Can't be saved as JSON, and the server should always send UTF-8
+            return
+        data = json.dumps({'version': self.version, 'results': results},
+                          separators=(',', ':'))
+        with open(self.get_path(key), 'wb') as cache_file:
+            cache_file.write(zlib.compress(data))
+        self.evict()
+
+    def evict(self):
+        '''
+        Remove results older than the maximum age, then the least recently
+        used ones until the cache fits in its maximum size.
+        '''
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.path.getmtime(path)
+                if now - mtime > self.max_age:
+                    os.remove(path)
+                else:
+                    entries.append((mtime, os.path.getsize(path), path))
+            except OSError:
+                continue
+        total_size = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
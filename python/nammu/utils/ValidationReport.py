@@ -0,0 +1,102 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import collections
+import re
+
+
+class ValidationError(collections.namedtuple(
+                'ValidationError',
+                ['filename', 'line', 'project', 'message', 'severity'])):
+    '''
+    One line of the oracc.log returned by the server, e.g.
+    "00atf/file.atf:6:cams/gkab: unknown sign: x".
+    '''
+    __slots__ = ()
+
+    def to_html(self):
+        '''
+        Console message with a link to the line of the error.
+        '''
+        return '<a href={0}>{1}:{0}</a>:{2}: {3}'.format(
+                        self.line, self.filename, self.project, self.message)
+
+    def to_text(self):
+        '''
+        Plain text message, as shown in the tooltip of the line.
+        '''
+        text = '{0}:{1}:{2}: {3}'.format(self.filename, self.line,
+                                         self.project, self.message)
+        if isinstance(text, str):
+            text = text.decode('utf-8')
+        return text
+
+    def to_dict(self):
+        return dict(self._asdict())
+
+
+class ValidationReport(object):
+    '''
+    The errors in the validation log returned by the ORACC server, parsed in
+    one pass, and the summary line the server adds at the end.
+    '''
+    warning = re.compile(r'\(?warning\b', re.IGNORECASE)
+
+    def __init__(self, errors=(), summary=None):
+        self.errors = list(errors)
+        self.summary = summary
+        # Line number -> errors in that line
+        self.by_line = collections.OrderedDict()
+        for error in self.errors:
+            self.by_line.setdefault(error.line, []).append(error)
+
+    @classmethod
+    def parse(cls, oracc_log):
+        errors = []
+        summary = None
+        for line in (oracc_log or '').splitlines():
+            parts = line.split(':', 3)
+            if len(parts) == 4 and parts[1].strip().isdigit():
+                message = parts[3].strip()
+                severity = ('warning' if cls.warning.match(message)
+                            else 'error')
+                errors.append(ValidationError(parts[0], int(parts[1]),
+                                              parts[2], message, severity))
+            elif line.strip():
+                summary = line
+        return cls(errors, summary)
+
+    def __len__(self):
+        return len(self.errors)
+
+    def __iter__(self):
+        return iter(self.errors)
+
+    def count(self, severity):
+        return sum(1 for error in self.errors if error.severity == severity)
+
+    def get_tooltips(self):
+        '''
+        Returns the plain text tooltip with the errors in each line, keyed by
+        line number as a string, as the ATF area expects them. They're built
+        once here so hovering over a line only needs a lookup.
+        '''
+        return dict((str(line), u'; '.join(error.to_text()
+                                           for error in errors))
+                    for line, errors in self.by_line.items())
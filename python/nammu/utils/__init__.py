@@ -393,3 +393,45 @@ def find_image_resource(name):
     loader = ClassLoader.getSystemClassLoader()
     # Load image
     return loader.getResource("resources/images/" + name.lower() + ".png")
+
+
+def split_fragments(text):
+    '''
+    Split an ATF text in the fragments starting with a "&" line. Returns the
+    text before the first fragment and a list of (line number, text) tuples,
+    one per fragment, where line number is the line the fragment starts at
+    in the whole text. Joining the texts back gives the original text.
+    '''
+    preamble = []
+    fragments = []
+    current = preamble
+    # Only "\n" counts as a line break, like in the ATF area
+    lines = [line + '\n' for line in text.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    for line_num, line in enumerate(lines, start=1):
+        if line.startswith('&'):
+            current = [line]
+            fragments.append((line_num, current))
+        else:
+            current.append(line)
+    return (''.join(preamble),
+            [(line_num, ''.join(lines)) for line_num, lines in fragments])
+
+
+def select_fragments(text, first_line, last_line):
+    '''
+    Returns the text before the first fragment and the (line number, text)
+    tuples of the fragments (see split_fragments) that have any of the lines
+    between `first_line` and `last_line`, both included.
+    '''
+    preamble, fragments = split_fragments(text)
+    selected = []
+    for index, (line_num, fragment) in enumerate(fragments):
+        if index + 1 < len(fragments):
+            next_line_num = fragments[index + 1][0]
+        else:
+            next_line_num = None
+        if line_num <= last_line and (next_line_num is None or
+                                      first_line < next_line_num):
+            selected.append((line_num, fragment))
+    return preamble, selected
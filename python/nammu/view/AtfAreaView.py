@@ -17,6 +17,8 @@ You should have received a copy of the GNU General Public License
 along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import time
+
 from java.awt import BorderLayout, Dimension, Point
 from java.awt.event import KeyListener, AdjustmentListener
 from java.awt.ComponentOrientation import RIGHT_TO_LEFT, LEFT_TO_RIGHT
@@ -24,6 +26,7 @@ from javax.swing import JScrollPane, JPanel, JSplitPane, UIManager
 from javax.swing.text import StyleConstants
 from javax.swing.undo import UndoManager, CompoundEdit
 from javax.swing.event import UndoableEditListener, DocumentListener
+from javax.swing.event.DocumentEvent import EventType
 
 from swingutils.threads.swing import runSwingLater
 
@@ -77,15 +80,19 @@ class AtfAreaView(JPanel):
         self.container.setRowHeaderView(self.line_numbers_area)
         self.add(self.container, BorderLayout.CENTER)
 
+        # The panes share one scroll listener, so scrolling both panes of a
+        # split editor only highlights once.
+        self.adjustment_listener = atfAreaAdjustmentListener(self)
         self.vert_scroll = self.container.getVerticalScrollBar()
-        self.vert_scroll.addAdjustmentListener(atfAreaAdjustmentListener(self))
+        self.vert_scroll.addAdjustmentListener(self.adjustment_listener)
 
         # Key listener that triggers syntax highlighting, etc. upon key release
-        self.edit_area.addKeyListener(AtfAreaKeyListener(self))
-        # Also needed in secondary area:
-        self.secondary_area.addKeyListener(AtfAreaKeyListener(self))
-        # Also needed in arabic translation area:
-        self.arabic_area.addKeyListener(AtfAreaKeyListener(self))
+        # It's shared by the edit area, the secondary area and the arabic
+        # translation area.
+        self.key_listener = AtfAreaKeyListener(self)
+        self.edit_area.addKeyListener(self.key_listener)
+        self.secondary_area.addKeyListener(self.key_listener)
+        self.arabic_area.addKeyListener(self.key_listener)
         self.arabic_area.setComponentOrientation(RIGHT_TO_LEFT)
 
         # Add a document listener to track changes to files
@@ -132,8 +139,7 @@ class AtfAreaView(JPanel):
 
         # Reset the scroll listener
         self.vert_scroll = self.container.getVerticalScrollBar()
-        listener = atfAreaAdjustmentListener(self)
-        self.vert_scroll.addAdjustmentListener(listener)
+        self.vert_scroll.addAdjustmentListener(self.adjustment_listener)
         self.controller.controller.menuController.enable_split_options(
             horizontal=True, vertical=True, arabic=True)
 
@@ -182,8 +188,8 @@ class AtfAreaView(JPanel):
         # Need to add scroll listeners to the scrollbars in the two panes
         topscroll = self.container.leftComponent.getVerticalScrollBar()
         bottomscroll = self.container.rightComponent.getVerticalScrollBar()
-        topscroll.addAdjustmentListener(atfAreaAdjustmentListener(self))
-        bottomscroll.addAdjustmentListener(atfAreaAdjustmentListener(self))
+        topscroll.addAdjustmentListener(self.adjustment_listener)
+        bottomscroll.addAdjustmentListener(self.adjustment_listener)
 
         # Revalitate is needed in order to repaint the components
         self.revalidate()
@@ -215,16 +221,19 @@ class AtfAreaView(JPanel):
             # If there is not a split pane, create both panels and setup view
             self.setup_edit_area_split(split_orientation, arabic)
 
-    def get_viewport_top_bottom(self, viewport):
+    def get_viewport_top_bottom(self, viewport, text=None):
         '''
         returns the top and bottom caret positions for a given viewport
         '''
+        # Each pane wraps lines at its own width, so positions have to be
+        # worked out in the text area shown in the viewport.
+        area = viewport.getView()
         extent = viewport.getExtentSize()
         top_left_position = viewport.getViewPosition()
-        top_left_char = self.edit_area.viewToModel(top_left_position)
+        top_left_char = area.viewToModel(top_left_position)
         bottom_left_position = Point(top_left_position.x,
                                      top_left_position.y + extent.height)
-        bottom_left_char = self.edit_area.viewToModel(bottom_left_position)
+        bottom_left_char = area.viewToModel(bottom_left_position)
 
         # Something has gone wrong. Assume that top_left should be at the start
         # of the file
@@ -232,7 +241,8 @@ class AtfAreaView(JPanel):
             top_left_char = 0
 
         # Get the text in the full edit area
-        text = self.controller.edit_area.getText()
+        if text is None:
+            text = self.controller.edit_area.getText()
 
         # Pad the top of the viewport to capture up to the nearest header and
         # the bottom by 2 lines
@@ -242,29 +252,36 @@ class AtfAreaView(JPanel):
 
         return top_ch, bottom_ch
 
-    def get_viewport_carets(self):
+    def get_viewport_ranges(self):
         '''
-        Get the top left and bottom left caret position of the viewports on
-        screen. If we have a split window, the carets will span both viewports
-        and will give the range from the top of the file block to the lower
-        extent of the two viewports.
+        Get the top left and bottom left caret positions of each viewport
+        showing the ATF text on screen, as a sorted list of (top, bottom)
+        tuples. If we have a split window, each pane gets its own range, and
+        they are only merged when the two panes show overlapping parts of the
+        file, so the text between two distant viewports isn't highlighted.
         '''
         if isinstance(self.container, JScrollPane):
             # This is a single edit pane
-            viewport = self.container.getViewport()
-            top_ch, bottom_ch = self.get_viewport_top_bottom(viewport)
-
+            viewports = [self.container.getViewport()]
         else:
-            # Otherwise we have a split pane
-            viewport_l = self.container.leftComponent.getViewport()
-            viewport = self.container.rightComponent.getViewport()
-            top_ch, bottom_ch = self.get_viewport_top_bottom(viewport)
-            top_ch_l, bottom_ch_l = self.get_viewport_top_bottom(viewport_l)
-
-            if bottom_ch_l > bottom_ch:
-                bottom_ch = bottom_ch_l
+            # Otherwise we have a split pane. The arabic translation pane has
+            # its own document, so it's not included.
+            viewports = [component.getViewport() for component
+                         in (self.container.leftComponent,
+                             self.container.rightComponent)
+                         if component.getViewport().getView()
+                         is not self.arabic_area]
 
-        return top_ch, bottom_ch
+        text = self.controller.edit_area.getText()
+        ranges = []
+        for top_ch, bottom_ch in sorted(
+                                self.get_viewport_top_bottom(viewport, text)
+                                for viewport in viewports):
+            if ranges and top_ch <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], max(bottom_ch, ranges[-1][1]))
+            else:
+                ranges.append((top_ch, bottom_ch))
+        return ranges
 
     def refresh(self):
         '''
@@ -338,6 +355,9 @@ class atfAreaDocumentListener(DocumentListener):
         Listen for an insertion to the document.
         '''
         self.areaviewcontroller.controller.view.set_title(unsaved=True)
+        # Batches of edits update the error lines by themselves
+        if self.areaviewcontroller.applying_edits:
+            return
         text = self.areaviewcontroller.edit_area.getText()
         self.errorUpdate(e, text, 'insert')
 
@@ -346,6 +366,8 @@ class atfAreaDocumentListener(DocumentListener):
         Listen for a removal from the document
         '''
         self.areaviewcontroller.controller.view.set_title(unsaved=True)
+        if self.areaviewcontroller.applying_edits:
+            return
         # Get the text prior to this edit event
         text = self.areaview.oldtext
         self.errorUpdate(e, text, 'remove')
@@ -355,10 +377,18 @@ class atfAreaAdjustmentListener(AdjustmentListener):
     def __init__(self, areaview):
         self.areaviewcontroller = areaview.controller
         self.areaview = areaview
+        self.pending = False
 
     def adjustmentValueChanged(self, e):
-        if not e.getValueIsAdjusting():
-            runSwingLater(self.areaviewcontroller.controller.initHighlighting)
+        # Scroll events that arrive before the pending highlighting has run
+        # (e.g. from both panes of a split editor) don't queue another one.
+        if not e.getValueIsAdjusting() and not self.pending:
+            self.pending = True
+            runSwingLater(self.highlight)
+
+    def highlight(self):
+        self.pending = False
+        self.areaviewcontroller.controller.initHighlighting()
 
 
 class AtfAreaKeyListener(KeyListener):
@@ -377,8 +407,7 @@ class AtfAreaKeyListener(KeyListener):
         # lock or cmd.
         if ((not ke.isActionKey()) and
                 (ke.getKeyCode() not in (16, 17, 18, 20, 157))):
-            top_l_char, bottom_l_char = self.areaview.get_viewport_carets()
-            self.areaviewcontroller.syntax_highlight(top_l_char, bottom_l_char)
+            self.areaviewcontroller.highlight_viewports()
 
     # We have to implement these since the baseclass versions
     # raise non implemented errors when called by the event.
@@ -399,9 +428,14 @@ class AtfUndoableEditListener(UndoableEditListener):
     Overrides the undoableEditHappened functionality to group INSERT/REMOVE
     edit events with their associated CHANGE events (these correspond to
     highlighting only at the moment).
-    TODO: Make compounds save whole words so undoing is not so much of a pain
-          for the user.
+    Consecutive single character insertions or deletions are also grouped
+    together until a word boundary is crossed or the user pauses typing for
+    longer than `coalesce_window` seconds, so that undoing works on whole
+    words instead of on single characters.
     '''
+    # Maximum pause (in seconds) between keystrokes of the same undo step
+    coalesce_window = 1.0
+
     def __init__(self, panel):
         self.panel = panel
         self.undo_manager = self.panel.undo_manager
@@ -409,6 +443,25 @@ class AtfUndoableEditListener(UndoableEditListener):
         self.must_compound = False
         self.deletion = UIManager.getString('AbstractDocument.deletionText')
         self.addition = UIManager.getString('AbstractDocument.additionText')
+        self.forget_last_edit()
+
+    def forget_last_edit(self):
+        """
+        Forget about the last significant edit, so that the next one starts a
+        new compound instead of being merged into the current one.
+        """
+        self.last_type = None
+        self.last_document = None
+        self.last_offset = None
+        self.last_char = None
+        self.last_time = 0
+
+    def end_compound(self):
+        """
+        Explicitly end the current compound edit, e.g. before undoing it.
+        """
+        self.current_compound.end()
+        self.forget_last_edit()
 
     def force_start_compound(self):
         """
@@ -417,6 +470,7 @@ class AtfUndoableEditListener(UndoableEditListener):
         edit.
         """
         empty_compound = AtfCompoundEdit()
+        self.forget_last_edit()
         if not self.must_compound:
             self.must_compound = True
             if not self.current_compound.equals(empty_compound):
@@ -429,20 +483,61 @@ class AtfUndoableEditListener(UndoableEditListener):
         self.undo_manager.addEdit(self.current_compound)
         self.must_compound = False
 
+    def continues_word(self, edit, edit_type):
+        """
+        Check whether the given significant edit is typing (or deleting) the
+        same word as the previous one, and therefore belongs to the current
+        compound edit.
+        """
+        if (not self.current_compound.isInProgress() or
+                edit_type != self.last_type or
+                edit.getLength() != 1 or
+                edit.getDocument() != self.last_document or
+                time.time() - self.last_time > self.coalesce_window):
+            return False
+        offset = edit.getOffset()
+        if edit_type == self.addition:
+            char = edit.getDocument().getText(offset, 1)
+            # A new line always starts a new step and so does the first
+            # character of a word typed after some white space.
+            return (offset == self.last_offset + 1 and char != '\n' and
+                    not (self.last_char.isspace() and not char.isspace()))
+        # Deletions with backspace move backwards, with delete they stay put
+        return offset in (self.last_offset - 1, self.last_offset)
+
+    def remember_edit(self, edit, edit_type):
+        """
+        Keep track of the last significant edit to decide whether the next one
+        can be coalesced with it.
+        """
+        if edit.getLength() != 1:
+            # Pasting or deleting a selection is an undo step on its own
+            self.forget_last_edit()
+            return
+        self.last_type = edit_type
+        self.last_document = edit.getDocument()
+        self.last_offset = edit.getOffset()
+        self.last_time = time.time()
+        if edit_type == self.addition:
+            self.last_char = self.last_document.getText(self.last_offset, 1)
+
     def undoableEditHappened(self, event):
         edit = event.getEdit()
         edit_type = edit.getPresentationName()
 
-        # If significant INSERT/REMOVE event happen, end and add current
-        # edit compound to undo_manager and start a new one.
+        # If significant INSERT/REMOVE event happen and they are not part of
+        # the word being typed, end and add current edit compound to
+        # undo_manager and start a new one.
         if ((edit_type == self.addition or edit_type == self.deletion) and
                 not self.must_compound):
-            # Explicitly end compound edits so their inProgress flag goes
-            # to false. Note undo() only undoes compound edits when they
-            # are not in progress.
-            self.current_compound.end()
-            self.current_compound = AtfCompoundEdit()
-            self.undo_manager.addEdit(self.current_compound)
+            if not self.continues_word(edit, edit_type):
+                # Explicitly end compound edits so their inProgress flag goes
+                # to false. Note undo() only undoes compound edits when they
+                # are not in progress.
+                self.current_compound.end()
+                self.current_compound = AtfCompoundEdit()
+                self.undo_manager.addEdit(self.current_compound)
+            self.remember_edit(edit, edit_type)
 
         # Always add current edit to current compound
         self.current_compound.addEdit(edit)
@@ -469,6 +564,25 @@ class AtfCompoundEdit(CompoundEdit):
         """
         return self.getEdits()[0]
 
+    def affected_range(self):
+        """
+        Return the (start, end) caret positions spanned by the insertions and
+        removals in the compound, ignoring attribute changes.
+        Returns None if the compound doesn't modify the text.
+        """
+        start = end = None
+        for edit in self.getEdits():
+            if edit.getType() == EventType.CHANGE:
+                continue
+            offset = edit.getOffset()
+            if start is None or offset < start:
+                start = offset
+            if end is None or offset + edit.getLength() > end:
+                end = offset + edit.getLength()
+        if start is None:
+            return None
+        return start, end
+
 
 class AtfUndoManager(UndoManager):
     """
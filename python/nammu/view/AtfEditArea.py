@@ -17,7 +17,6 @@ You should have received a copy of the GNU General Public License
 along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
-import re
 from swingutils.threads.swing import runSwingLater
 
 from javax.swing import JTextPane, BorderFactory
@@ -47,27 +46,17 @@ class AtfEditArea(JTextPane):
         if event:
             position = self.viewToModel(event.getPoint())
             line_num = str(self.get_line_num(position))
-            # Check if line_num has an error message assigned
-            if self.controller.validation_errors:
-                try:
-                    err_msg = self.controller.validation_errors[line_num]
-                except KeyError:
-                    # Current line has no error messages assigned
-                    # Returning None also switches off tooltips from previous
-                    # validation errors.
-                    return None
-                else:
-                    # Use this regex to strip the hyperlink tags before
-                    # displaying the tooltip
-                    err_msg = re.sub('<.+?>', '', err_msg)
-                    return err_msg.decode('utf-8')
+            # Each line with errors has its tooltip ready to display.
+            # Returning None for the other lines also switches off tooltips
+            # from previous validation errors.
+            return self.controller.validation_errors.get(line_num)
 
     def get_line_num(self, position):
         '''
         Returns line number given mouse position in text area.
         '''
-        text = self.text[0:position]
-        return text.count('\n') + 1
+        root = self.getDocument().getDefaultRootElement()
+        return root.getElementIndex(max(position, 0)) + 1
 
     def setText(self, text):
         '''
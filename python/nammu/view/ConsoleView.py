@@ -117,19 +117,7 @@ class ConsoleView(JPanel):
 
             atfCont = self.controller.controller.atfAreaController
 
+            # Links point to the line of the error, which is looked up in the
+            # document's line index and scrolled into view
             error_line = int(event.getDescription())
-            text = atfCont.getAtfAreaText()
-            pos = atfCont.getPositionFromLine(text, error_line)
-
-            # pos gives the position of the final character on the previous
-            # line, so add 1 char to move the caret to the start of error_line
-            # The method is called twice to catch the edge case where the user
-            # has the caret in the correct location prior to the click
-            # resulting in the screen not scrolling to the error line.
-            # This would be done with some logic around getCaretPosition(), but
-            # this would need a caret listener to be constructed.
-            for i in xrange(2):
-                atfCont.setCaretPosition(pos + i)
-
-            # Return focus to the editor window
-            atfCont.edit_area.requestFocusInWindow()
+            atfCont.go_to_line(error_line)
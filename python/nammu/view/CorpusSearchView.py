@@ -0,0 +1,109 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from java.awt import BorderLayout, Dimension, FlowLayout
+from javax.swing import DefaultListModel, JButton, JComboBox, JDialog
+from javax.swing import JFrame, JLabel, JList, JPanel, JScrollPane
+from javax.swing import JTextField, ListSelectionModel
+from .FindInFilesView import ResultsMouseListener
+
+
+class CorpusSearchView(JDialog):
+    '''
+    Prompt user for a lemma, sign, word, line label or text to look up in the
+    corpus index and list where it appears.
+    '''
+    def __init__(self, controller):
+        self.controller = controller
+
+    def display(self):
+        '''
+        Displays window.
+        '''
+        self.build()
+        self.setDefaultCloseOperation(JFrame.DISPOSE_ON_CLOSE)
+        self.setTitle("Search Corpus")
+        self.pack()
+        self.setLocationRelativeTo(None)
+        self.visible = 1
+
+    def build(self):
+        self.setLayout(BorderLayout())
+        self.add(self.build_search_row(), BorderLayout.NORTH)
+        self.add(self.build_results_list(), BorderLayout.CENTER)
+        self.add(self.build_status_row(), BorderLayout.SOUTH)
+
+    def build_search_row(self):
+        '''
+        Builds the row with the search field, the kind of key to look up and
+        the buttons.
+        '''
+        panel = JPanel(FlowLayout())
+        label = JLabel("Search: ")
+        panel.add(label)
+        self.search_field = JTextField(25, actionPerformed=self.search)
+        label.setLabelFor(self.search_field)
+        panel.add(self.search_field)
+        self.kind_box = JComboBox([name for name, kind
+                                   in self.controller.kinds])
+        panel.add(self.kind_box)
+        panel.add(JButton('Search', actionPerformed=self.search))
+        panel.add(JButton('Done', actionPerformed=self.done))
+        return panel
+
+    def build_results_list(self):
+        '''
+        Builds the results list. Double clicking on a result opens its file at
+        the line where the key appears.
+        '''
+        self.results_model = DefaultListModel()
+        self.results_list = JList(self.results_model)
+        self.results_list.setSelectionMode(
+                                        ListSelectionModel.SINGLE_SELECTION)
+        self.results_list.addMouseListener(ResultsMouseListener(self))
+        scroll_pane = JScrollPane(self.results_list)
+        scroll_pane.setPreferredSize(Dimension(600, 300))
+        return scroll_pane
+
+    def build_status_row(self):
+        panel = JPanel(FlowLayout(FlowLayout.LEFT))
+        self.status_label = JLabel(" ")
+        panel.add(self.status_label)
+        return panel
+
+    def show_results(self, results):
+        self.results_model.clear()
+        for result in results:
+            self.results_model.addElement(result)
+
+    def set_status(self, text):
+        self.status_label.setText(text)
+
+    def search(self, event=None):
+        kind = self.controller.kinds[self.kind_box.getSelectedIndex()][1]
+        self.controller.search(self.search_field.getText(), kind)
+
+    def open_selected(self):
+        index = self.results_list.getSelectedIndex()
+        if index >= 0:
+            self.controller.open_result(index)
+
+    def done(self, event=None):
+        self.controller.controller.corpus_search_controller = None
+        self.dispose()
@@ -0,0 +1,159 @@
+'''
+Copyright 2015 - 2020 University College London.
+
+This file is part of Nammu.
+
+Nammu is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Nammu is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from java.awt import BorderLayout, Dimension, FlowLayout
+from java.awt.event import MouseAdapter, WindowAdapter
+from javax.swing import BoxLayout, DefaultListModel, JButton, JCheckBox
+from javax.swing import JDialog, JFrame, JLabel, JList, JPanel, JScrollPane
+from javax.swing import JTextField, ListSelectionModel
+
+
+class FindInFilesView(JDialog):
+    '''
+    Prompt user for some text to find in all the ATF files of the working
+    directory and list the matching lines.
+    '''
+    def __init__(self, controller):
+        self.controller = controller
+
+    def display(self):
+        '''
+        Displays window.
+        '''
+        self.build()
+        self.setDefaultCloseOperation(JFrame.DISPOSE_ON_CLOSE)
+        self.addWindowListener(FindInFilesWindowListener(self))
+        self.setTitle("Find in Files")
+        self.pack()
+        self.setLocationRelativeTo(None)
+        self.visible = 1
+
+    def build(self):
+        self.setLayout(BorderLayout())
+        top_panel = JPanel()
+        top_panel.setLayout(BoxLayout(top_panel, BoxLayout.Y_AXIS))
+        top_panel.add(self.build_find_row())
+        top_panel.add(self.build_options_row())
+        self.add(top_panel, BorderLayout.NORTH)
+        self.add(self.build_results_list(), BorderLayout.CENTER)
+        self.add(self.build_status_row(), BorderLayout.SOUTH)
+
+    def build_find_row(self):
+        '''
+        Builds the find row.
+        '''
+        panel = JPanel(FlowLayout())
+        label = JLabel("Find: ")
+        panel.add(label)
+        self.find_field = JTextField(30, actionPerformed=self.find)
+        label.setLabelFor(self.find_field)
+        panel.add(self.find_field)
+        return panel
+
+    def build_options_row(self):
+        '''
+        Builds the panel with ignore case and regex options and the buttons.
+        '''
+        panel = JPanel(FlowLayout())
+        self.ignore_case_box = JCheckBox('Ignore Case')
+        self.regex_box = JCheckBox('Regular Expression')
+        panel.add(self.ignore_case_box)
+        panel.add(self.regex_box)
+        panel.add(JButton('Find', actionPerformed=self.find))
+        panel.add(JButton('Stop', actionPerformed=self.stop))
+        panel.add(JButton('Done', actionPerformed=self.done))
+        return panel
+
+    def build_results_list(self):
+        '''
+        Builds the list where matching lines are shown as they are found.
+        Double clicking on a result opens its file at the matching line.
+        '''
+        self.results_model = DefaultListModel()
+        self.results_list = JList(self.results_model)
+        self.results_list.setSelectionMode(
+                                        ListSelectionModel.SINGLE_SELECTION)
+        self.results_list.addMouseListener(ResultsMouseListener(self))
+        scroll_pane = JScrollPane(self.results_list)
+        scroll_pane.setPreferredSize(Dimension(600, 300))
+        return scroll_pane
+
+    def build_status_row(self):
+        '''
+        Builds the row showing the progress of the search.
+        '''
+        panel = JPanel(FlowLayout(FlowLayout.LEFT))
+        self.status_label = JLabel(" ")
+        panel.add(self.status_label)
+        return panel
+
+    def add_results(self, results):
+        for result in results:
+            self.results_model.addElement(
+                                    self.controller.format_result(result))
+
+    def clear_results(self):
+        self.results_model.clear()
+
+    def set_status(self, text):
+        self.status_label.setText(text)
+
+    def find(self, event=None):
+        self.controller.find(self.find_field.getText(),
+                             self.ignore_case_box.isSelected(),
+                             self.regex_box.isSelected())
+
+    def stop(self, event=None):
+        self.controller.cancel()
+
+    def open_selected(self):
+        index = self.results_list.getSelectedIndex()
+        if index >= 0:
+            self.controller.open_result(index)
+
+    def done(self, event=None):
+        '''
+        Cancel any search still running and close window.
+        '''
+        self.controller.cancel()
+        self.controller.controller.find_in_files_controller = None
+        self.dispose()
+
+
+class ResultsMouseListener(MouseAdapter):
+    '''
+    Opens the file of a result when it is double clicked.
+    '''
+    def __init__(self, view):
+        self.view = view
+
+    def mouseClicked(self, event):
+        if event.getClickCount() == 2:
+            self.view.open_selected()
+
+
+class FindInFilesWindowListener(WindowAdapter):
+    '''
+    Makes sure the search is cancelled when the window is closed.
+    '''
+    def __init__(self, view):
+        self.view = view
+
+    def windowClosing(self, event):
+        self.view.done()
@@ -235,8 +235,7 @@ class FindView(JDialog):
         '''
         Reset list of matches and close window.
         '''
-        self.controller.matches = None
-        self.controller.text = None
+        self.controller.close()
         self.controller.controller.find_controller = None
         self.controller.atfAreaController.restore_highlight()
         self.dispose()
@@ -69,12 +69,20 @@ class MenuView(JMenuBar):
         menuItems["Edit"]["Cut"] = [KeyEvent.VK_X, "cut"]
         menuItems["Edit"]["Paste"] = [KeyEvent.VK_V, "paste"]
         menuItems["Edit"]["Find/Replace"] = [KeyEvent.VK_G, "find"]
+        menuItems["Edit"]["Find in Files"] = [KeyEvent.VK_I, "findInFiles"]
+        menuItems["Edit"]["Search Corpus"] = [KeyEvent.VK_S, "searchCorpus"]
         menuItems["Edit"]["Settings"] = [KeyEvent.VK_E, "editSettings"]
 
         menuItems["ATF"] = {}
         menuItems["ATF"] = collections.OrderedDict()
         menuItems["ATF"]["Validate"] = [KeyEvent.VK_D, "validate"]
         menuItems["ATF"]["Lemmatise"] = [KeyEvent.VK_L, "lemmatise"]
+        menuItems["ATF"]["Lemmatise Selection"] = [KeyEvent.VK_E,
+                                                   "lemmatiseSelection"]
+        menuItems["ATF"]["Next Error"] = [KeyEvent.VK_N, "nextError"]
+        menuItems["ATF"]["Previous Error"] = [KeyEvent.VK_P, "previousError"]
+        menuItems["ATF"]["Server Statistics"] = [KeyEvent.VK_S,
+                                                 "showServerStats"]
 
         menuItems["Window"] = {}
         menuItems["Window"] = collections.OrderedDict()
@@ -102,8 +110,8 @@ class MenuView(JMenuBar):
 
         # Menu Items after which there is a menu separator
         separators = {"File": ["Close", "Print"],
-                      "Edit": ["Redo", "Paste", "Find/Replace"],
-                      "ATF": [],
+                      "Edit": ["Redo", "Paste", "Search Corpus"],
+                      "ATF": ["Lemmatise Selection", "Previous Error"],
                       "Window": ["Display Model View"],
                       "Help": ["Help"]}
 
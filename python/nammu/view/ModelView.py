@@ -17,9 +17,13 @@ You should have received a copy of the GNU General Public License
 along with Nammu.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import difflib
 from java.awt import BorderLayout, GridLayout, Color, Dimension
+from java.awt.event import WindowAdapter
 from javax.swing import JScrollPane, JPanel, JFrame, JComboBox, JTabbedPane
-from javax.swing import JLabel, BoxLayout, JButton
+from javax.swing import JLabel, JTable
+from javax.swing.event import ChangeListener
+from javax.swing.table import AbstractTableModel
 
 
 class ModelView(JFrame):
@@ -46,85 +50,82 @@ class ModelView(JFrame):
 
         self.mainPanel = JTabbedPane()
         self.mainPanel.setTabLayoutPolicy(JTabbedPane.SCROLL_TAB_LAYOUT)
-        self.add(self.mainPanel, BorderLayout.CENTER)
-
-        # Set empty dictionary of tab panels
-        self.objectTabs = {}
+        self.mainPanel.addChangeListener(ObjectTabListener(self))
+        self.addWindowListener(ModelWindowListener(self))
 
-        # Will need scrolling controls
-        scrollingArea = JScrollPane(self.mainPanel)
+        # Tab panels in the order of the objects in the ATF file, and whether
+        # their contents have been built yet
+        self.objectTabs = []
+        self.builtTabs = set()
 
         # Add notice panel
         self.add(self.addNotice(), BorderLayout.NORTH)
 
         # Add to parent panel
-        self.add(scrollingArea, BorderLayout.CENTER)
+        self.add(self.mainPanel, BorderLayout.CENTER)
 
     def addObject(self, objectID):
         """
-        Creates new empty JPanel that'll contain the model for one object in
-        the ATF file.
+        Creates a new empty tab that'll contain the model for one object in
+        the ATF file. Its contents are only built when the tab is first
+        selected (see buildTab).
         """
         objectPanel = JPanel()
-        objectPanel.setLayout(BoxLayout(objectPanel, BoxLayout.PAGE_AXIS))
+        objectPanel.setLayout(BorderLayout())
+        self.objectTabs.append(objectPanel)
+        self.mainPanel.addTab(objectID, objectPanel)
 
-        self.objectTabs[objectID] = objectPanel
+    def clearObjects(self):
+        """
+        Remove all object tabs.
+        """
+        self.objectTabs = []
+        self.builtTabs = set()
+        self.mainPanel.removeAll()
+
+    def setObjectTitle(self, index, objectID):
+        self.mainPanel.setTitleAt(index, objectID)
 
     def display(self):
         """
-        Put together all elements in main panel and display.
+        Build the selected tab and display.
         """
-        # Add all object tabs to window
-        for objectID, tabPanel in self.objectTabs.iteritems():
-            self.mainPanel.add(objectID, tabPanel)
+        self.buildTab(self.mainPanel.getSelectedIndex())
 
         # Set up main model window
         self.setDefaultCloseOperation(JFrame.DISPOSE_ON_CLOSE)
         self.setTitle("ATF Model View")
+        self.setPreferredSize(Dimension(900, 600))
         self.pack()
         self.setLocationRelativeTo(None)
 
         # Display model window
         self.visible = 1
 
-    def addLine(self, objectID, category, text):
+    def buildTab(self, index):
         """
-        Add a new panel containing the text corresponding to one line in the
-        ATF file.
-        This panel will show the line type (ruling, comment, text,
-        translation...), followed by the line content and a group of icons to
-        add, edit or remove the line.
+        Ask the controller for the contents of the given tab if they haven't
+        been built yet.
         """
-        linePanel = JPanel()
-        linePanel.setLayout(BorderLayout())
-
-        label = JLabel(category)
-
-        combo = JComboBox(text)
-        combo.setEditable(True)
-        combo.setPreferredSize(Dimension(500, 20))
-        combo.setSize(combo.getPreferredSize())
-        combo.setMinimumSize(combo.getPreferredSize())
-        combo.setMaximumSize(combo.getPreferredSize())
-
-        buttonsPanel = JPanel()
-        addButton = JButton("Add")
-        editButton = JButton("Edit")
-        deleteButton = JButton("Delete")
-        buttonsPanel.add(addButton)
-        buttonsPanel.add(editButton)
-        buttonsPanel.add(deleteButton)
+        if index < 0 or index in self.builtTabs:
+            return
+        self.builtTabs.add(index)
+        self.controller.buildObject(index)
 
-        linePanel.add(label, BorderLayout.WEST)
-        linePanel.add(combo, BorderLayout.CENTER)
-        linePanel.add(buttonsPanel, BorderLayout.EAST)
-
-        # Add metadataPanel to object tab in main panel
-        self.objectTabs[objectID].add(linePanel)
+    def addLines(self, index, tableModel):
+        """
+        Add a table with the lines of the object in the given tab. Only the
+        rows scrolled into view are ever rendered.
+        """
+        table = JTable(tableModel)
+        table.setFillsViewportHeight(True)
+        table.getColumnModel().getColumn(0).setMaxWidth(120)
+        self.objectTabs[index].add(JScrollPane(table), BorderLayout.CENTER)
+        self.objectTabs[index].revalidate()
 
     # Protocols not yet in model parsed object
     # def addMetadata(self, project, language, protocols):
-    def addMetadata(self, objectID, project, language):
+    def addMetadata(self, index, project, language):
         """
         Add a JTable at the top of the object tab containing the metadata of
         the object presented in that tab.
@@ -156,7 +157,7 @@ class ModelView(JFrame):
         metadataPanel.add(protocolsBox)
 
         # Add metadataPanel to object tab in main panel
-        self.objectTabs[objectID].add(metadataPanel)
+        self.objectTabs[index].add(metadataPanel, BorderLayout.NORTH)
 
     def addNotice(self):
         """
@@ -169,3 +170,91 @@ class ModelView(JFrame):
                        "construction.")
         panel.add(label)
         return panel
+
+
+class ObjectTabListener(ChangeListener):
+    '''
+    Builds the contents of object tabs the first time they are selected.
+    '''
+    def __init__(self, view):
+        self.view = view
+
+    def stateChanged(self, event):
+        self.view.buildTab(self.view.mainPanel.getSelectedIndex())
+
+
+class ModelWindowListener(WindowAdapter):
+    '''
+    Lets the controller know when the window is closed.
+    '''
+    def __init__(self, view):
+        self.view = view
+
+    def windowClosed(self, event):
+        self.view.controller.close()
+
+
+class LinesTableModel(AbstractTableModel):
+    '''
+    Table model for the lines of an ATF object. The text shown in each row is
+    worked out by the controller the first time the row is displayed. Lines
+    are compared by the given key when they're updated, so parsed lines that
+    would be displayed the same way aren't described again.
+    '''
+    columns = ["Label", "Content", "Lemmas"]
+
+    def __init__(self, lines, describe, key=None):
+        self.lines = list(lines)
+        self.describe = describe
+        self.key = key or (lambda line: line)
+        # Row values, or None until a row is first displayed
+        self.rows = [None] * len(self.lines)
+
+    def getRowCount(self):
+        return len(self.lines)
+
+    def getColumnCount(self):
+        return len(self.columns)
+
+    def getColumnName(self, column):
+        return self.columns[column]
+
+    def getValueAt(self, row, column):
+        values = self.rows[row]
+        if values is None:
+            values = self.rows[row] = self.describe(self.lines[row])
+        return values[column]
+
+    def update_lines(self, lines):
+        """
+        Replace the lines shown, notifying the table only about the rows that
+        changed. Each change is applied to the model just before its event is
+        fired, so the table always sees the row count the event refers to.
+        The rows that changed are only described when they're displayed.
+        """
+        lines = list(lines)
+        matcher = difflib.SequenceMatcher(None,
+                                          [self.key(line)
+                                           for line in self.lines],
+                                          [self.key(line) for line in lines],
+                                          autojunk=False)
+        # Going backwards so the row numbers of the pending changes are still
+        # valid
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == 'equal':
+                # Same display, but keep the new line objects
+                self.lines[i1:i2] = lines[j1:j2]
+                continue
+            if i2 - i1 == j2 - j1:
+                self.lines[i1:i2] = lines[j1:j2]
+                self.rows[i1:i2] = [None] * (i2 - i1)
+                self.fireTableRowsUpdated(i1, i2 - 1)
+                continue
+            if i2 > i1:
+                del self.lines[i1:i2]
+                del self.rows[i1:i2]
+                self.fireTableRowsDeleted(i1, i2 - 1)
+            if j2 > j1:
+                self.lines[i1:i1] = lines[j1:j2]
+                self.rows[i1:i1] = [None] * (j2 - j1)
+                self.fireTableRowsInserted(i1, i1 + j2 - j1 - 1)
@@ -39,7 +39,14 @@ class SyntaxHighlighter:
         self.lexer = AtfLexer(skipinvalid=True).lexer
         self.syntax_highlight_on = True
         # This helps with access to the text area that needs to be highlighted
-        self.viewport_extent = (1, 1, 1, 1)
+        self.viewport_extents = [(1, 1, 1, 1)]
+        # Find/replace matches, sorted by position. Only the ones in the
+        # highlighted part of the text are painted, and the ones painted are
+        # remembered so their background can be cleared afterwards.
+        self.matches = None
+        self.match_offset = 0
+        self.current_match = None
+        self.painted_matches = set()
 
     def setup_attribs(self):
         '''
@@ -156,25 +163,50 @@ class SyntaxHighlighter:
         '''
 
         if top_line is not None and bottom_line is not None:
-            self.viewport_extent = (top_line, bottom_line,
-                                    top_caret, bottom_caret)
+            self.viewport_extents = [(top_line, bottom_line,
+                                      top_caret, bottom_caret)]
+        self._highlight_extents()
 
-        error_lines = self.controller.validation_errors.keys()
+    def syntax_highlight_extents(self, extents):
+        '''
+        Syntax highlight each of the given (top line, bottom line, top caret,
+        bottom caret) extents, one per viewport on screen, and remember them
+        for subsequent calls to syntax_highlight.
+        '''
+        self.viewport_extents = extents
+        self._highlight_extents()
 
-        # Check that syntax highlight is on and that there is text to highlight
-        no_of_chars = self.viewport_extent[3] - self.viewport_extent[2]
-        if not self.syntax_highlight_on or no_of_chars < 1:
+    def _highlight_extents(self):
+        if not self.syntax_highlight_on:
             return
+        for top_line, bottom_line, top_caret, bottom_caret in \
+                self.viewport_extents:
+            # Check that there is text to highlight
+            no_of_chars = bottom_caret - top_caret
+            if no_of_chars > 0:
+                self._highlight_text(top_line, top_caret, no_of_chars)
+
+    def highlight_range(self, top_line, bottom_line, top_caret, bottom_caret):
+        '''
+        Syntax highlight the given lines without changing the viewport extent
+        used by subsequent calls to syntax_highlight.
+        '''
+        no_of_chars = bottom_caret - top_caret
+        if self.syntax_highlight_on and no_of_chars > 0:
+            self._highlight_text(top_line, top_caret, no_of_chars)
 
-        # When we have arabic text, use the length of the main edit area.
-        if self.controller.controller.arabic_edition_on:
-            no_of_chars = self.styledoc.getLength()
+    def _highlight_text(self, start_line_no, start_caret, no_of_chars):
+        '''
+        Restyle `no_of_chars` characters starting at caret `start_caret`,
+        which is the start of line number `start_line_no`.
+        '''
+        error_lines = set(self.controller.validation_errors.keys())
 
         # Get only the text on the screen
         # TODO: This exception can probably be understood and worked around
         #       in a nicer way
         try:
-            text = self.styledoc.getText(self.viewport_extent[2], no_of_chars)
+            text = self.styledoc.getText(start_caret, no_of_chars)
         except BadLocationException:
             logger = self.controller.controller.logger
             logger.debug("BadLocation error when syntax highlighting.")
@@ -194,19 +226,17 @@ class SyntaxHighlighter:
 
         # Keep background style from validation errors
         # Only process lines that are on the screen
-        start_line_no = self.viewport_extent[0]
+        pos = start_caret
         for line_num, line in enumerate(splittext, start=start_line_no):
             if str(line_num) in error_lines:
                 attribs = self.error_attribs[defaultcolor]
             else:
                 attribs = self.attribs[defaultcolor]
-            atfCont = self.controller.controller.atfAreaController
-            pos = atfCont.getPositionFromLine(text,
-                                              line_num - start_line_no + 1)
-            self.styledoc.setCharacterAttributes(pos + self.viewport_extent[2],
+            self.styledoc.setCharacterAttributes(pos,
                                                  len(line) + 1,
                                                  attribs,
                                                  True)
+            pos += len(line) + 1
 
         # Go through each token in the text, check which type it is to assign
         # a colour to it, check which position it is to set up default or
@@ -254,26 +284,116 @@ class SyntaxHighlighter:
                         logger.debug('Color not found in attribute table.')
 
                 self.styledoc.setCharacterAttributes(tok.lexpos +
-                                                     self.viewport_extent[2],
+                                                     start_caret,
                                                      mylength,
                                                      attribs,
                                                      True)
 
+        # Restyling has removed the background of the matches in the text
+        self._paint_matches(start_caret, start_caret + no_of_chars)
+
     def highlight_matches(self, matches, offset=0, current_match=None):
         '''
         Highlight text and apply highlight background for matches, taking
         the offset into account in case we are only searching on a selection.
+        Only matches in the highlighted part of the text around the viewport
+        are painted, the rest are painted when scrolled into view.
+        If only the current match has changed, just the previous and the new
+        current matches are repainted.
         '''
+        if matches is self.matches and offset == self.match_offset:
+            previous = self.current_match
+            self.current_match = current_match
+            if previous is not None and previous is not current_match:
+                if self._is_match(previous):
+                    self._paint_match(previous)
+            if current_match is not None:
+                self._paint_match(current_match)
+            return
+        self.clear_matches()
+        self.matches = matches
+        self.match_offset = offset
+        self.current_match = current_match
         self.syntax_highlight()
-        for match in matches:
-            start = match.start() + offset
+
+    def clear_matches(self):
+        '''
+        Forget about the matches and remove the background of the ones that
+        were painted. Their text will get its colour back next time it's syntax
+        highlighted.
+        '''
+        error_lines = self.controller.validation_errors
+        root = self.styledoc.getDefaultRootElement()
+        for match in self.painted_matches:
+            start = match.start() + self.match_offset
             length = match.end() - match.start()
-            # Check if this match is the current match in the find next
-            # iteration
-            if match == current_match:
-                self._highlight_match(start, length, Color.cyan)
+            if str(root.getElementIndex(start) + 1) in error_lines:
+                color = Color.yellow
+            else:
+                color = Color.white
+            attribs = SimpleAttributeSet()
+            StyleConstants.setBackground(attribs, color)
+            self.styledoc.setCharacterAttributes(start, length, attribs, False)
+        self.painted_matches = set()
+        self.matches = None
+        self.current_match = None
+
+    def _paint_matches(self, start, end):
+        '''
+        Paint the background of the matches between the given caret positions.
+        '''
+        if not self.matches:
+            return
+        index = self._match_index(start)
+        while index < len(self.matches):
+            match = self.matches[index]
+            if match.start() + self.match_offset >= end:
+                break
+            self._paint_match(match)
+            index += 1
+
+    def _paint_match(self, match):
+        '''
+        Paint the background of a match, in a different colour if it is the
+        current match in the find next iteration.
+        '''
+        if match is self.current_match:
+            color = Color.cyan
+        else:
+            color = Color.lightGray
+        self._highlight_match(match.start() + self.match_offset,
+                              match.end() - match.start(),
+                              color)
+        self.painted_matches.add(match)
+
+    def _match_index(self, offset):
+        '''
+        Return the index of the first match ending after the given caret
+        position.
+        '''
+        low, high = 0, len(self.matches)
+        while low < high:
+            middle = (low + high) // 2
+            if self.matches[middle].end() + self.match_offset <= offset:
+                low = middle + 1
             else:
-                self._highlight_match(start, length, Color.lightGray)
+                high = middle
+        return low
+
+    def _is_match(self, match):
+        '''
+        Check whether the given match is still in the list of matches.
+        '''
+        if not self.matches:
+            return False
+        start = match.start()
+        index = self._match_index(start + self.match_offset)
+        while (index < len(self.matches) and
+               self.matches[index].start() <= start):
+            if self.matches[index] is match:
+                return True
+            index += 1
+        return False
 
     def _highlight_match(self, position, length, color):
         '''
@@ -9,12 +9,15 @@ import java.awt.*;
 public class MyLabelView extends LabelView {
 
     boolean isResetBreakSpots=false;
+    // Set when the text of the paragraph has changed since the break spots
+    // were last worked out, so they have to be reset before breaking again.
+    boolean isBreakSpotsDirty=true;
 
     public MyLabelView(Element elem) {
         super(elem);
     }
     public View breakView(int axis, int p0, float pos, float len) {
-        if (axis == View.X_AXIS) {
+        if (axis == View.X_AXIS && isBreakSpotsDirty) {
             resetBreakSpots();
         }
         return super.breakView(axis, p0, pos, len);
@@ -24,12 +27,50 @@ public class MyLabelView extends LabelView {
         isResetBreakSpots=true;
         removeUpdate(null, null, null);
         isResetBreakSpots=false;
+        isBreakSpotsDirty=false;
    }
 
+    public void invalidateBreakSpots() {
+        isBreakSpotsDirty=true;
+    }
+
     public void removeUpdate(DocumentEvent e, Shape a, ViewFactory f) {
         super.removeUpdate(e, a, f);
     }
 
+    /**
+     * Attribute changes that don't change the size of the text (e.g. the
+     * colours set by the syntax highlighter) only need the cached colours
+     * to be refreshed, not a new layout.
+     */
+    public void changedUpdate(DocumentEvent e, Shape a, ViewFactory f) {
+        if (changesLayout()) {
+            isBreakSpotsDirty=true;
+            super.changedUpdate(e, a, f);
+        } else {
+            updateAttributes();
+        }
+    }
+
+    /**
+     * Returns true if the font or vertical alignment of the element differ
+     * from the ones this view was laid out with.
+     */
+    public boolean changesLayout() {
+        Document doc = getDocument();
+        if (!(doc instanceof StyledDocument)) {
+            return true;
+        }
+        AttributeSet attr = getAttributes();
+        return !getFont().equals(((StyledDocument) doc).getFont(attr))
+            || isSuperscript() != StyleConstants.isSuperscript(attr)
+            || isSubscript() != StyleConstants.isSubscript(attr);
+    }
+
+    public void updateAttributes() {
+        setPropertiesFromAttributes();
+    }
+
     public void preferenceChanged(View child, boolean width, boolean height) {
         if (!isResetBreakSpots) {
             super.preferenceChanged(child, width, height);
@@ -7,8 +7,12 @@ import java.awt.*;
 
 public class MyParagraphView extends ParagraphView {
 
+    // Paragraph attributes the current rows were laid out with
+    private AttributeSet layoutAttributes;
+
     public MyParagraphView(Element elem) {
         super(elem);
+        layoutAttributes = elem.getAttributes().copyAttributes();
     }
 public void removeUpdate(DocumentEvent e, Shape a, ViewFactory f) {
     super.removeUpdate(e, a, f);
@@ -19,11 +23,62 @@ public void insertUpdate(DocumentEvent e, Shape a, ViewFactory f) {
     resetBreakSpots();
 }
 
+/**
+ * ParagraphView throws away its rows on every attribute change. When the
+ * runs of text are the same and only their colours changed, keep the rows,
+ * refresh the colours of the views in them and repaint the paragraph.
+ */
+public void changedUpdate(DocumentEvent e, Shape a, ViewFactory f) {
+    if (e.getChange(getElement()) != null
+            || !layoutAttributes.isEqual(getAttributes())
+            || changesLayout(e)) {
+        layoutAttributes = getAttributes().copyAttributes();
+        super.changedUpdate(e, a, f);
+        return;
+    }
+    updateAttributes(layoutPool, e);
+    for (int i=0; i<getViewCount(); i++) {
+        updateAttributes(getView(i), e);
+    }
+    Container host = getContainer();
+    if (host != null && a != null) {
+        Rectangle alloc = a.getBounds();
+        host.repaint(alloc.x, alloc.y, alloc.width, alloc.height);
+    }
+}
+
+private boolean changesLayout(DocumentEvent e) {
+    int start = e.getOffset();
+    int end = start + e.getLength();
+    for (int i=0; i<layoutPool.getViewCount(); i++) {
+        View v=layoutPool.getView(i);
+        if (v.getStartOffset() < end && v.getEndOffset() > start) {
+            if (!(v instanceof MyLabelView)
+                    || ((MyLabelView)v).changesLayout()) {
+                return true;
+            }
+        }
+    }
+    return false;
+}
+
+private void updateAttributes(View parent, DocumentEvent e) {
+    int start = e.getOffset();
+    int end = start + e.getLength();
+    for (int i=0; i<parent.getViewCount(); i++) {
+        View v=parent.getView(i);
+        if (v instanceof MyLabelView && v.getStartOffset() < end
+                && v.getEndOffset() > start) {
+            ((MyLabelView)v).updateAttributes();
+        }
+    }
+}
+
 private void resetBreakSpots() {
     for (int i=0; i<layoutPool.getViewCount(); i++) {
         View v=layoutPool.getView(i);
         if (v instanceof MyLabelView) {
-            ((MyLabelView)v).resetBreakSpots();
+            ((MyLabelView)v).invalidateBreakSpots();
         }
     }
 }
@@ -37,6 +37,11 @@ public class TextLineNumber extends JPanel
 
 	private JTextComponent component;
 
+	//  Document being listened to, only set while this component is
+	//  displayed
+
+	private Document document;
+
 	// Other properties that will be set by constructor
 
 	private static Border OUTER;
@@ -58,6 +63,13 @@ public class TextLineNumber extends JPanel
 
 	private HashMap<String, FontMetrics> fonts;
 
+	//  Font metrics of the text component and widths of the digits, cached
+	//  so painting doesn't need to measure strings
+
+	private Font metricsFont;
+	private FontMetrics metrics;
+	private int[] digitWidths = new int[10];
+
 	/**
 	 *	Create a line number component for a text component. This minimum
 	 *  display width will be based on 3 digits.
@@ -103,9 +115,43 @@ public class TextLineNumber extends JPanel
 		setCurrentLineForeground( Color.RED );
 		setMinimumDisplayDigits( minimumDisplayDigits );
 
-		component.getDocument().addDocumentListener(this);
-		component.addCaretListener( this );
 		component.addPropertyChangeListener("font", this);
+		component.addPropertyChangeListener("document", this);
+	}
+
+	/*
+	 *  Only listen to the document and caret while the line numbers are
+	 *  displayed, so the gutters of panes that aren't on screen (e.g. the
+	 *  secondary pane when the editor isn't split) don't do any work on
+	 *  every edit of the shared document.
+	 */
+	@Override
+	public void addNotify()
+	{
+		super.addNotify();
+
+		if (document == null)
+		{
+			document = component.getDocument();
+			document.addDocumentListener(this);
+			component.addCaretListener( this );
+			lastHeight = 0;
+			lastLine = -1;
+			setPreferredWidth();
+		}
+	}
+
+	@Override
+	public void removeNotify()
+	{
+		if (document != null)
+		{
+			document.removeDocumentListener(this);
+			component.removeCaretListener( this );
+			document = null;
+		}
+
+		super.removeNotify();
 	}
 
 	/**
@@ -251,7 +297,8 @@ public class TextLineNumber extends JPanel
 	}
 
 	/**
-	 *  Draw the line numbers
+	 *  Draw the line numbers of the lines within the clipped bounds. Only
+	 *  the first row of a wrapped line gets a number.
 	 */
 	@Override
 	public void paintComponent(Graphics g)
@@ -260,74 +307,79 @@ public class TextLineNumber extends JPanel
 
 		//	Determine the width of the space available to draw the line number
 
-		FontMetrics fontMetrics = component.getFontMetrics( component.getFont() );
+		FontMetrics fontMetrics = getComponentMetrics();
 		Insets insets = getInsets();
 		int availableWidth = getSize().width - insets.left - insets.right;
 
-		//  Determine the rows to draw within the clipped bounds.
+		//  Determine the lines to draw within the clipped bounds.
 
 		Rectangle clip = g.getClipBounds();
-		int rowStartOffset = component.viewToModel( new Point(0, clip.y) );
+		int startOffset = component.viewToModel( new Point(0, clip.y) );
 		int endOffset = component.viewToModel( new Point(0, clip.y + clip.height) );
+		Element root = component.getDocument().getDefaultRootElement();
+		int firstLine = root.getElementIndex( Math.min(startOffset, endOffset) );
+		int lastLine = root.getElementIndex( Math.max(startOffset, endOffset) );
+		int currentLine = root.getElementIndex( component.getCaretPosition() );
 
-		while (rowStartOffset <= endOffset)
+		for (int line = firstLine; line <= lastLine; line++)
 		{
 			try
 			{
-    			if (isCurrentLine(rowStartOffset))
-    				g.setColor( getCurrentLineForeground() );
-    			else
-    				g.setColor( getForeground() );
+				Element element = root.getElement( line );
+				Rectangle r = component.modelToView( element.getStartOffset() );
 
-    			//  Get the line number as a string and then determine the
-    			//  "X" and "Y" offsets for drawing the string.
+				if (r == null)
+					break;
 
-    			String lineNumber = getTextLineNumber(rowStartOffset);
-    			int stringWidth = fontMetrics.stringWidth( lineNumber );
-    			int x = getOffsetX(availableWidth, stringWidth) + insets.left;
-			int y = getOffsetY(rowStartOffset, fontMetrics);
-			g.drawString(lineNumber, x, y);
+				if (line == currentLine)
+					g.setColor( getCurrentLineForeground() );
+				else
+					g.setColor( getForeground() );
 
-    			//  Move to the next row
+				//  Get the line number as a string and then determine the
+				//  "X" and "Y" offsets for drawing the string.
 
-    			rowStartOffset = Utilities.getRowEnd(component, rowStartOffset) + 1;
+				String lineNumber = String.valueOf(line + 1);
+				int stringWidth = getLineNumberWidth( lineNumber );
+				int x = getOffsetX(availableWidth, stringWidth) + insets.left;
+				int y = getOffsetY(element, r, fontMetrics);
+				g.drawString(lineNumber, x, y);
 			}
-			catch(Exception e) {break;}
+			catch(BadLocationException e) {break;}
 		}
 	}
 
 	/*
-	 *  We need to know if the caret is currently positioned on the line we
-	 *  are about to paint so the line number can be highlighted.
+	 *  Get the font metrics of the text component, measuring the digits
+	 *  again only when its font has changed.
 	 */
-	private boolean isCurrentLine(int rowStartOffset)
+	private FontMetrics getComponentMetrics()
 	{
-		int caretPosition = component.getCaretPosition();
-		Element root = component.getDocument().getDefaultRootElement();
+		Font font = component.getFont();
 
-		if (root.getElementIndex( rowStartOffset ) == root.getElementIndex(caretPosition))
-			return true;
-		else
-			return false;
+		if (metrics == null || !font.equals(metricsFont))
+		{
+			metricsFont = font;
+			metrics = component.getFontMetrics( font );
+
+			for (int i = 0; i < digitWidths.length; i++)
+				digitWidths[i] = metrics.charWidth( (char)('0' + i) );
+		}
+
+		return metrics;
 	}
 
 	/*
-	 *	Get the line number to be drawn. The empty string will be returned
-	 *  when a line of text has wrapped.
+	 *  Width of a line number, added up from the cached digit widths
 	 */
-	protected String getTextLineNumber(int rowStartOffset)
+	private int getLineNumberWidth(String lineNumber)
 	{
-		Element root = component.getDocument().getDefaultRootElement();
-		int index = root.getElementIndex( rowStartOffset );
-		Element line = root.getElement( index );
-
-		if (line.getStartOffset() == rowStartOffset)
-			return String.valueOf(index + 1);
-		// Need this clause to deal with right to left text encoding
-		else if (line.getEndOffset() == rowStartOffset + 1)
-			return String.valueOf(index + 1);
-		else
-			return "";
+		int width = 0;
+
+		for (int i = 0; i < lineNumber.length(); i++)
+			width += digitWidths[lineNumber.charAt(i) - '0'];
+
+		return width;
 	}
 
 	/*
@@ -339,14 +391,11 @@ public class TextLineNumber extends JPanel
 	}
 
 	/*
-	 *  Determine the Y offset for the current row
+	 *  Determine the Y offset for the first row of a line, given its
+	 *  bounding rectangle
 	 */
-	private int getOffsetY(int rowStartOffset, FontMetrics fontMetrics)
-		throws BadLocationException
+	private int getOffsetY(Element line, Rectangle r, FontMetrics fontMetrics)
 	{
-		//  Get the bounding rectangle of the row
-
-		Rectangle r = component.modelToView( rowStartOffset );
 		int lineHeight = fontMetrics.getHeight();
 		int y = r.y + r.height;
 		int descent = 0;
@@ -363,10 +412,6 @@ public class TextLineNumber extends JPanel
 			if (fonts == null)
 				fonts = new HashMap<String, FontMetrics>();
 
-			Element root = component.getDocument().getDefaultRootElement();
-			int index = root.getElementIndex( rowStartOffset );
-			Element line = root.getElement( index );
-
 			for (int i = 0; i < line.getElementCount(); i++)
 			{
 				Element child = line.getElement(i);
@@ -403,41 +448,65 @@ public class TextLineNumber extends JPanel
 		Element root = component.getDocument().getDefaultRootElement();
 		int currentLine = root.getElementIndex( caretPosition );
 
-		//  Need to repaint so the correct line number can be highlighted
+		//  Need to repaint so the correct line number can be highlighted.
+		//  Only the numbers of the previous and the new current line change.
 
 		if (lastLine != currentLine)
 		{
-			repaint();
+			repaintLine( lastLine );
+			repaintLine( currentLine );
 			lastLine = currentLine;
 		}
 	}
 
+	/*
+	 *  Repaint the number of the given line only
+	 */
+	private void repaintLine(int line)
+	{
+		Element root = component.getDocument().getDefaultRootElement();
+
+		if (line < 0 || line >= root.getElementCount())
+			return;
+
+		try
+		{
+			Rectangle r = component.modelToView( root.getElement(line).getStartOffset() );
+
+			if (r != null)
+				repaint(0, r.y, getWidth(), r.height);
+		}
+		catch (BadLocationException ex) { repaint(); }
+	}
+
 //
 //  Implement DocumentListener interface
 //
 	@Override
 	public void changedUpdate(DocumentEvent e)
 	{
-		documentChanged();
+		//  Attribute changes (e.g. syntax highlighting) don't change the
+		//  lines, so there's nothing to repaint
 	}
 
 	@Override
 	public void insertUpdate(DocumentEvent e)
 	{
-		documentChanged();
+		documentChanged( e.getOffset() );
 	}
 
 	@Override
 	public void removeUpdate(DocumentEvent e)
 	{
-		documentChanged();
+		documentChanged( e.getOffset() );
 	}
 
 	/*
 	 *  A document change may affect the number of displayed lines of text.
-	 *  Therefore the lines numbers will also change.
+	 *  Therefore the lines numbers from the changed line downwards will also
+	 *  change.
 	 */
-	private void documentChanged()
+	private void documentChanged(final int offset)
 	{
 		//  View of the component has not been updated at the time
 		//  the DocumentEvent is fired
@@ -455,7 +524,7 @@ public class TextLineNumber extends JPanel
 					if (rect != null && rect.y != lastHeight)
 					{
 						setPreferredWidth();
-						repaint();
+						repaintFrom( Math.min(offset, endPos) );
 						lastHeight = rect.y;
 					}
 				}
@@ -464,13 +533,44 @@ public class TextLineNumber extends JPanel
 		});
 	}
 
+	/*
+	 *  Repaint the numbers from the line containing the given offset down to
+	 *  the bottom of the component
+	 */
+	private void repaintFrom(int offset) throws BadLocationException
+	{
+		Element root = component.getDocument().getDefaultRootElement();
+		Element line = root.getElement( root.getElementIndex(offset) );
+		Rectangle r = component.modelToView( line.getStartOffset() );
+
+		if (r == null)
+			repaint();
+		else
+			repaint(0, r.y, getWidth(), getHeight() - r.y);
+	}
+
 //
 //  Implement PropertyChangeListener interface
 //
 	@Override
 	public void propertyChange(PropertyChangeEvent evt)
 	{
-		if (evt.getNewValue() instanceof Font)
+		if ("document".equals(evt.getPropertyName()))
+		{
+			//  Follow the component when it is given a new document, e.g.
+			//  when a split pane starts sharing the main pane's document
+
+			if (document != null)
+			{
+				document.removeDocumentListener(this);
+				document = component.getDocument();
+				document.addDocumentListener(this);
+				lastDigits = 0;
+				setPreferredWidth();
+				repaint();
+			}
+		}
+		else if (evt.getNewValue() instanceof Font)
 		{
 			if (updateFont)
 			{
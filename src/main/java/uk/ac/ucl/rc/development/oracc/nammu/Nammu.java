@@ -21,6 +21,7 @@
 package uk.ac.ucl.rc.development.oracc.nammu;
 
 import org.python.core.Py;
+import org.python.core.PyObject;
 import org.python.core.PyException;
 import org.python.core.PySystemState;
 import org.python.util.PythonInterpreter;
@@ -32,19 +33,35 @@ import org.python.util.PythonInterpreter;
  * external libraries.
  * It calls Python's entry point nammu.main.main()
  *
+ * When given arguments (e.g. "validate file.atf") Nammu runs headless from
+ * the command line and exits with the status returned by the Python side.
+ *
  */
 public class Nammu {
 
     public static void main(final String[] args) throws PyException {
 
+        boolean headless = args.length > 0;
+        if (headless) {
+            System.setProperty("java.awt.headless", "true");
+        }
         PySystemState systemState = Py.getSystemState();
         PythonInterpreter interpreter = new PythonInterpreter();
         systemState.__setattr__("_jy_interpreter", Py.java2py(interpreter));
-        String command = "try:\n "
+        interpreter.set("args", args);
+        String command = "status = None\n"
+                       + "try:\n "
                        + "  import nammu.main\n "
-                       + "  nammu.main.main()\n"
+                       + "  status = nammu.main.main(list(args))\n"
                        + "except "
-                       + "  SystemExit: pass";
+                       + "  SystemExit as e:\n"
+                       + "  status = e.code if isinstance(e.code, int) "
+                       + "else int(e.code is not None)";
         interpreter.exec(command);
+        if (headless) {
+            PyObject status = interpreter.get("status");
+            System.exit(status == null || status == Py.None ?
+                        0 : status.asInt());
+        }
     }
 }